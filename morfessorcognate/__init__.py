@@ -40,8 +40,19 @@ from .evaluation import MorfessorEvaluation, MorfessorEvaluationResult
 from .constructions.base import BaseConstructionMethods
 from .constructions.parallel import ParallelConstructionMethods
 
-try:
-    from .cognate import CognateModel, CognateCost
-    from .constructions.cognate import CognateConstructionMethods, WILDCARD
-except ImportError:
-    _logger.warn('To use cognate morfessor, install python-Levenshtein')
+from .constructions.cognate import CognateConstructionMethods, WILDCARD
+
+
+def __getattr__(name):
+    # The cognate model needs python-Levenshtein, so it is only imported
+    # when it is used
+    if name in ('CognateModel', 'CognateCost'):
+        try:
+            from . import cognate
+        except ImportError:
+            _logger.warning(
+                'To use cognate morfessor, install python-Levenshtein')
+            raise
+        return getattr(cognate, name)
+    raise AttributeError("module '%s' has no attribute '%s'"
+                         % (__name__, name))
@@ -1,7 +1,8 @@
 from __future__ import unicode_literals
+import array
 import collections
+import collections.abc
 import heapq
-import itertools
 import logging
 import math
 import numbers
@@ -11,8 +12,9 @@ from .cost import Cost
 from .constructions.base import BaseConstructionMethods
 from .corpus import LexiconEncoding, CorpusEncoding, \
     AnnotatedCorpusEncoding, FixedCorpusWeight
-from .utils import _progress, tail
+from .utils import _progress, _is_string, make_trie, SegmentationCache
 from .exception import MorfessorException, SegmentOnlyModelException
+from .parallel import ShardedTrainer, segment_many
 
 _logger = logging.getLogger(__name__)
 
@@ -25,6 +27,186 @@ ConstrNode = collections.namedtuple('ConstrNode',
                                     ['rcount', 'count', 'splitloc'])
 
 
+def _viterbi_known_morphs(word, trie, get_count, maxlen, logtokens,
+                          badlikelihood):
+    """Find the optimal segmentation of word without smoothing.
+
+    Only the morphs found in the prefix trie of known morphs, and single
+    atoms, are considered, which gives the same result as going through
+    all substrings. get_count(morph) returns the count of a known morph.
+
+    Returns the boundary positions (including 0 and len(word)) and the
+    cost of the segmentation.
+
+    """
+    n = len(word)
+    costs = [0.0] + [None] * n
+    paths = [0] * (n + 1)
+    for pt in range(n):
+        if costs[pt] is None:
+            continue
+        node = trie
+        for t in range(pt + 1, min(n, pt + maxlen) + 1):
+            node = node.get(word[t - 1])
+            if node is not None and None in node:
+                count = get_count(word[pt:t])
+            else:
+                count = 0
+            if count > 0:
+                cost = costs[pt] + (logtokens - math.log(count))
+            elif t == pt + 1:
+                cost = costs[pt] + badlikelihood
+            else:
+                cost = None
+            # compared to the path from an earlier position
+            if cost is not None and (costs[t] is None or cost < costs[t]):
+                costs[t] = cost
+                paths[t] = pt
+            if node is None:
+                break
+
+    bounds = [n]
+    while bounds[-1] > 0:
+        bounds.append(paths[bounds[-1]])
+    bounds.reverse()
+    return bounds, costs[n]
+
+
+class AnalysisTable(collections.abc.MutableMapping):
+    """Analyses of the constructions stored in parallel arrays.
+
+    A drop-in replacement of the dict from constructions to ConstrNodes.
+    Each construction is interned to an integer id, and its rcount, count
+    and split location are stored at that index of two integer arrays and
+    a list, which are updated in place. The ids of removed constructions
+    are reused. Iteration follows the insertion order, as for a dict.
+
+    """
+    def __init__(self, items=()):
+        self._ids = {}
+        self._rcounts = array.array('q')
+        self._counts = array.array('q')
+        self._splitlocs = []
+        self._free = []
+        for construction, node in items:
+            self[construction] = node
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __contains__(self, construction):
+        return construction in self._ids
+
+    def __getitem__(self, construction):
+        i = self._ids[construction]
+        return ConstrNode(self._rcounts[i], self._counts[i],
+                          self._splitlocs[i])
+
+    def get(self, construction, default=None):
+        i = self._ids.get(construction)
+        if i is None:
+            return default
+        return ConstrNode(self._rcounts[i], self._counts[i],
+                          self._splitlocs[i])
+
+    def __setitem__(self, construction, node):
+        rcount, count, splitloc = node
+        i = self._ids.get(construction)
+        if i is None:
+            i = self._intern(construction)
+        self._rcounts[i] = rcount
+        self._counts[i] = count
+        self._splitlocs[i] = splitloc
+
+    def __delitem__(self, construction):
+        i = self._ids.pop(construction)
+        self._splitlocs[i] = None
+        self._free.append(i)
+
+    def _intern(self, construction):
+        if self._free:
+            i = self._free.pop()
+        else:
+            i = len(self._splitlocs)
+            self._rcounts.append(0)
+            self._counts.append(0)
+            self._splitlocs.append(None)
+        self._ids[construction] = i
+        return i
+
+    def items(self):
+        rcounts, counts, splitlocs = \
+            self._rcounts, self._counts, self._splitlocs
+        return [(c, ConstrNode(rcounts[i], counts[i], splitlocs[i]))
+                for c, i in self._ids.items()]
+
+    def values(self):
+        return [node for _, node in self.items()]
+
+    def add_rcount(self, construction, dcount):
+        """Add dcount to the rcount of a stored construction."""
+        self._rcounts[self._ids[construction]] += dcount
+
+    def add_count(self, construction, dcount):
+        """Add dcount to the count of the construction in place.
+
+        The construction is added if it is missing and removed if its
+        count becomes zero. Returns (old count, new count, splitloc).
+
+        """
+        i = self._ids.get(construction)
+        if i is None:
+            if dcount == 0:
+                return 0, 0, None
+            i = self._intern(construction)
+            self._rcounts[i] = 0
+            self._counts[i] = dcount
+            return 0, dcount, None
+        count = self._counts[i]
+        newcount = count + dcount
+        splitloc = self._splitlocs[i]
+        if newcount == 0:
+            del self[construction]
+        else:
+            self._counts[i] = newcount
+        return count, newcount, splitloc
+
+    def __eq__(self, other):
+        if not isinstance(other, collections.abc.Mapping):
+            return NotImplemented
+        return len(self) == len(other) and dict(self.items()) == dict(
+            other.items())
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self.items())
+
+    def __getstate__(self):
+        # the table is compacted, so that removed ids are not pickled
+        ids = list(self._ids.values())
+        return {'constructions': list(self._ids),
+                'rcounts': array.array('q', (self._rcounts[i] for i in ids)),
+                'counts': array.array('q', (self._counts[i] for i in ids)),
+                'splitlocs': [self._splitlocs[i] for i in ids]}
+
+    def __setstate__(self, state):
+        self._ids = {c: i for i, c in enumerate(state['constructions'])}
+        self._rcounts = state['rcounts']
+        self._counts = state['counts']
+        self._splitlocs = state['splitlocs']
+        self._free = []
+
+
+# Storage backends of the analyses of a model
+ANALYSIS_TABLES = {'dict': dict, 'array': AnalysisTable}
+
+
 class BaselineModel(object):
     """Morfessor Baseline model class.
 
@@ -36,7 +218,18 @@ class BaselineModel(object):
 
     penalty = -9999.9
 
-    def __init__(self, corpusweight=None, use_skips=False, constr_class=None):
+    # Prefix trie of the real constructions for the Viterbi search,
+    # built when needed and reset when the set of constructions changes
+    _lexicon_trie = None
+
+    # Optional SegmentationCache of viterbi_segment results
+    _segmentation_cache = None
+
+    # Storage backend of the analyses, a key of ANALYSIS_TABLES
+    analysis_table = 'dict'
+
+    def __init__(self, corpusweight=None, use_skips=False, constr_class=None,
+                 analysis_table='dict'):
         """Initialize a new model instance.
 
         Arguments:
@@ -47,6 +240,8 @@ class BaselineModel(object):
                          to speed up training
             nosplit_re: regular expression string for preventing splitting
                           in certain contexts
+            analysis_table: storage of the analyses, 'dict' for a dict of
+                              ConstrNodes or 'array' for an AnalysisTable
 
         """
 
@@ -55,7 +250,7 @@ class BaselineModel(object):
         # In analyses for each construction a ConstrNode is stored. All
         # training data has a rcount (real count) > 0. All real morphemes
         # have no split locations.
-        self._analyses = {}
+        self._analyses = self._new_analyses(analysis_table)
 
         # Flag to indicate the model is only useful for segmentation
         self._segment_only = False
@@ -70,6 +265,25 @@ class BaselineModel(object):
         #Set corpus weight updater
         self.set_corpus_weight_updater(corpusweight)
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_lexicon_trie', None)
+        return state
+
+    def _new_analyses(self, analysis_table=None, items=()):
+        """Return a new, empty storage for the analyses.
+
+        If analysis_table is given, it is also set as the backend of the
+        model.
+
+        """
+        if analysis_table is not None:
+            if analysis_table not in ANALYSIS_TABLES:
+                raise MorfessorException(
+                    "unknown analysis table '%s'" % analysis_table)
+            self.analysis_table = analysis_table
+        return ANALYSIS_TABLES[self.analysis_table](items)
+
     def set_corpus_weight_updater(self, corpus_weight):
         if corpus_weight is None:
             self._corpus_weight_updater = FixedCorpusWeight(1.0)
@@ -118,6 +332,7 @@ class BaselineModel(object):
         if self._corpus_weight_updater is not None:
             if self._corpus_weight_updater.update(self, epoch_num):
                 forced_epochs += 2
+        self._invalidate_segmentations()
 
         # if self._use_skips:
         #     self._counter = collections.Counter()
@@ -175,7 +390,11 @@ class BaselineModel(object):
     def _add_compound(self, compound, c):
         """Add compound with count c to data."""
         self.cost.update_boundaries(compound, c)
+        self._invalidate_segmentations()
         self._modify_construction_count(compound, c)
+        if isinstance(self._analyses, AnalysisTable):
+            self._analyses.add_rcount(compound, c)
+            return
         oldrc = self._analyses[compound].rcount
         self._analyses[compound] = \
             self._analyses[compound]._replace(rcount=oldrc + c)
@@ -211,11 +430,25 @@ class BaselineModel(object):
             for constr in parts:
                 self._modify_construction_count(constr, count)
 
+    def _set_construction_analysis(self, construction, splitloc):
+        """Set the split locations of a construction in the model.
+
+        The count of the construction is moved from its old children to
+        the new ones. Constructions not in the model are ignored.
+
+        """
+        node = self._analyses.get(construction)
+        if node is None or (node.splitloc or None) == (splitloc or None):
+            return
+        rcount, count = self._remove(construction)
+        self._analyses[construction] = ConstrNode(rcount, 0, splitloc)
+        self._modify_construction_count(construction, count)
+
     def get_construction_count(self, construction):
         """Return (real) count of the construction."""
-        if (construction in self._analyses and
-            not self._analyses[construction].splitloc):
-            count = self._analyses[construction].count
+        node = self._analyses.get(construction)
+        if node is not None and not node.splitloc:
+            count = node.count
             if count <= 0:
                 raise MorfessorException("Construction count of '%s' is %s"
                                          % (construction, count))
@@ -277,27 +510,57 @@ class BaselineModel(object):
     def _recursive_split(self, construction):
         """Optimize segmentation of the construction by recursive splitting.
 
+        The recursion is driven by an explicit stack: the prefix of an
+        accepted split is optimized completely before the suffix.
+
         Returns list of segments.
 
+        """
+        segments = []
+        # (construction, None) to optimize a construction, or
+        # (None, start) to repeat the segments from start onwards
+        stack = [(construction, None)]
+        while stack:
+            construction, start = stack.pop()
+            if construction is None:
+                segments.extend(segments[start:])
+                continue
+            split = self._split_once(construction)
+            if split is None:
+                segments.append(construction)
+                continue
+            prefix, suffix = split
+            if suffix != prefix:
+                stack.append((suffix, None))
+            else:
+                stack.append((None, len(segments)))
+            stack.append((prefix, None))
+        return segments
+
+    def _split_once(self, construction):
+        """Choose the best binary split (or no split) of the construction
+        and update the model accordingly.
+
+        Returns the (prefix, suffix) pair, or None if not split.
+
         """
         # if self._use_skips and self._test_skip(construction):
-        #     return self.segment(construction)
+        #     return None
         rcount, count = self._remove(construction)
 
         # Check all binary splits and no split
-        self._modify_construction_count(construction, count)
-        mincost = self.get_cost()
-        self._modify_construction_count(construction, -count)
+        deltas = collections.Counter()
+        self._collect_count_deltas(construction, count, deltas)
+        mincost = self.get_cost(deltas)
 
         best_splitloc = None
 
         for loc in self.cc.split_locations(construction):
             prefix, suffix = self.cc.split(construction, loc)
-            self._modify_construction_count(prefix, count)
-            self._modify_construction_count(suffix, count)
-            cost = self.get_cost()
-            self._modify_construction_count(prefix, -count)
-            self._modify_construction_count(suffix, -count)
+            deltas = collections.Counter()
+            self._collect_count_deltas(prefix, count, deltas)
+            self._collect_count_deltas(suffix, count, deltas)
+            cost = self.get_cost(deltas)
             if cost <= mincost:
                 mincost = cost
                 best_splitloc = loc
@@ -308,47 +571,81 @@ class BaselineModel(object):
             prefix, suffix = self.cc.split(construction, best_splitloc)
             self._modify_construction_count(prefix, count)
             self._modify_construction_count(suffix, count)
-            lp = self._recursive_split(prefix)
-            if suffix != prefix:
-                return lp + self._recursive_split(suffix)
-            else:
-                return lp + lp
+            return prefix, suffix
         else:
             # Real construction
             self._analyses[construction] = ConstrNode(rcount, 0, None)
             self._modify_construction_count(construction, count)
-            return [construction]
+            return None
 
     def _modify_construction_count(self, construction, dcount):
         """Modify the count of construction by dcount.
 
-        For virtual constructions, recurses to child nodes in the
-        tree. For real constructions, adds/removes construction
-        to/from the lexicon whenever necessary.
+        For virtual constructions, the change is propagated to the child
+        nodes in the tree. For real constructions, adds/removes
+        construction to/from the lexicon whenever necessary.
 
         """
         if dcount == 0 or construction is None:
             return
-        if construction in self._analyses:
-            rcount, count, splitloc = self._analyses[construction]
-        else:
-            rcount, count, splitloc = 0, 0, None
-        newcount = count + dcount
-        # observe that this comparison will not work correctly if counts
-        # are floats rather than ints
-        if newcount == 0:
-            if construction in self._analyses:
-                del self._analyses[construction]
-        else:
-            self._analyses[construction] = ConstrNode(rcount, newcount,
-                                                      splitloc)
-        if splitloc:
-            # Virtual construction
-            for child in self.cc.splitn(construction, splitloc):
-                self._modify_construction_count(child, dcount)
-        else:
-            self.cost.update(construction, newcount-count)
-            # Real construction
+        analyses = self._analyses
+        in_place = isinstance(analyses, AnalysisTable)
+        stack = [construction]
+        while stack:
+            construction = stack.pop()
+            if in_place:
+                count, newcount, splitloc = analyses.add_count(construction,
+                                                               dcount)
+            else:
+                node = analyses.get(construction)
+                if node is not None:
+                    rcount, count, splitloc = node
+                else:
+                    rcount, count, splitloc = 0, 0, None
+                newcount = count + dcount
+                # observe that this comparison will not work correctly if
+                # counts are floats rather than ints
+                if newcount == 0:
+                    if node is not None:
+                        del analyses[construction]
+                else:
+                    analyses[construction] = ConstrNode(rcount, newcount,
+                                                        splitloc)
+            if splitloc:
+                # Virtual construction, children are visited in order
+                children = list(self.cc.splitn(construction, splitloc))
+                children.reverse()
+                stack.extend(children)
+            else:
+                # Real construction
+                self.cost.update(construction, newcount-count)
+                if count == 0 or newcount == 0:
+                    self._lexicon_trie = None
+                self._invalidate_segmentations()
+
+    def _collect_count_deltas(self, construction, dcount, deltas):
+        """Collect the count changes to real constructions that
+        _modify_construction_count(construction, dcount) would cause.
+
+        The changes are added to the deltas Counter. The model is not
+        modified.
+
+        """
+        if dcount == 0 or construction is None:
+            return
+        analyses = self._analyses
+        stack = [construction]
+        while stack:
+            construction = stack.pop()
+            node = analyses.get(construction)
+            if node is not None and node.splitloc:
+                # Virtual construction
+                children = list(self.cc.splitn(construction, node.splitloc))
+                children.reverse()
+                stack.extend(children)
+            else:
+                # Real construction
+                deltas[construction] += dcount
 
     def get_compounds(self):
         """Return the compound types stored by the model."""
@@ -361,9 +658,14 @@ class BaselineModel(object):
         return sorted((c, node.count) for c, node in self._analyses.items()
                       if not node.splitloc)
 
-    def get_cost(self):
-        """Return current model encoding cost."""
-        return self.cost.cost()
+    def get_cost(self, deltas=None):
+        """Return current model encoding cost.
+
+        If deltas (a mapping from real constructions to count changes)
+        is given, return the cost the model would have after the change.
+
+        """
+        return self.cost.cost(deltas)
         cost = self.cost.cost()
         if self._supervised:
             return cost + self._annot_coding.get_cost()
@@ -413,18 +715,69 @@ class BaselineModel(object):
 
         """
         self._check_segment_only()
-        _, _, splitloc = self._analyses[compound]
         constructions = []
-        if splitloc:
-            for part in self.cc.splitn(compound, splitloc):
-                constructions += self.segment(part)
-        else:
-            constructions.append(compound)
+        stack = [compound]
+        while stack:
+            construction = stack.pop()
+            _, _, splitloc = self._analyses[construction]
+            if splitloc:
+                parts = list(self.cc.splitn(construction, splitloc))
+                parts.reverse()
+                stack.extend(parts)
+            else:
+                constructions.append(construction)
 
         return constructions
 
+    def _count_items(self):
+        """Yield (key, count) pairs of the counts that determine the cost
+        of the constructions, for tracking changes between epochs."""
+        return self.cost.counts.items()
+
+    def _count_keys(self, construction):
+        """Return the keys of _count_items that affect the splitting of
+        the construction: those of the construction and of its prefixes
+        and suffixes."""
+        n = len(construction)
+        return ([self.cc.slice(construction, 0, i) for i in range(1, n + 1)] +
+                [self.cc.slice(construction, i, n) for i in range(1, n)])
+
+    def _active_compounds(self, compounds, old_counts, threshold):
+        """Return the compounds whose analysis contains constructions (or
+        prefixes or suffixes of them) with counts that have changed by more
+        than threshold (relative to the old count) since old_counts was
+        taken."""
+        new_counts = dict(self._count_items())
+        changed = set()
+        for key in set(old_counts) | set(new_counts):
+            old = old_counts.get(key, 0)
+            if abs(new_counts.get(key, 0) - old) > threshold * max(old, 1):
+                changed.add(key)
+        active = []
+        for compound in compounds:
+            for construction in self.segment(compound):
+                if any(key in changed
+                       for key in self._count_keys(construction)):
+                    active.append(compound)
+                    break
+        return active
+
+    def _optimize_serial(self, compounds, algorithm, algorithm_params):
+        """Optimize the compounds one by one, yielding (compound, segments)."""
+        for w in _progress(compounds):
+            if algorithm == 'recursive':
+                segments = self._recursive_optimize(w, *algorithm_params)
+            elif algorithm == 'viterbi':
+                segments = self._viterbi_optimize(w, *algorithm_params)
+            else:
+                raise MorfessorException("unknown algorithm '%s'" %
+                                         algorithm)
+            yield w, segments
+
     def train_batch(self, algorithm='recursive', algorithm_params=(),
-                    finish_threshold=0.005, max_epochs=None):
+                    finish_threshold=0.005, max_epochs=None,
+                    active_threshold=None, full_sweep_interval=5,
+                    jobs=1, sync_mode='sync', sync_interval=None):
         """Train the model in batch fashion.
 
         The model is trained with the data already loaded into the model (by
@@ -435,6 +788,16 @@ class BaselineModel(object):
         annotation cost, and random split counters are recalculated after
         each iteration.
 
+        If active_threshold is given, only the compounds whose analysis
+        contains a construction with a count that changed by more than
+        active_threshold (relative to its count) during the previous epoch
+        are optimized. All compounds are optimized in the first epoch,
+        every full_sweep_interval epochs, and before training is stopped.
+
+        If jobs is larger than one, the compounds of each epoch are
+        optimized in parallel by that many worker processes (see
+        parallel.ShardedTrainer).
+
         Arguments:
             algorithm: string in ('recursive', 'viterbi', 'flatten') 
                          that indicates the splitting algorithm used.
@@ -443,6 +806,16 @@ class BaselineModel(object):
                                 the improvement of the last iteration is
                                 smaller then finish_threshold * #boundaries
             max_epochs: maximum number of epochs to train
+            active_threshold: relative count change threshold for the
+                                active set, or None to optimize all
+                                compounds in every epoch
+            full_sweep_interval: interval of epochs optimizing all
+                                   compounds in active set training
+            jobs: number of worker processes
+            sync_mode: how the workers are reconciled, 'sync' or 'hogwild'
+            sync_interval: number of compounds each worker optimizes
+                             between reconciliations, or None for once
+                             per epoch
 
         """
         epochs = 0
@@ -464,39 +837,62 @@ class BaselineModel(object):
         _logger.info("Starting batch training")
         _logger.info("Epochs: %s\tCost: %s" % (epochs, newcost))
 
-        while True:
-            # One epoch
-            random.shuffle(compounds)
-
-            for w in _progress(compounds):
-                if algorithm == 'recursive':
-                    segments = self._recursive_optimize(w, *algorithm_params)
-                elif algorithm == 'viterbi':
-                    segments = self._viterbi_optimize(w, *algorithm_params)
+        trainer = None
+        if jobs > 1:
+            _logger.info("Training with %s worker processes (%s mode)" %
+                         (jobs, sync_mode))
+            trainer = ShardedTrainer(jobs, sync_mode, sync_interval)
+
+        try:
+            full_sweep = True
+            epoch_compounds = compounds
+            while True:
+                # One epoch
+                if active_threshold is not None:
+                    if full_sweep:
+                        epoch_compounds = compounds
+                    _logger.info("Active set: %s / %s compounds" %
+                                 (len(epoch_compounds), len(compounds)))
+                    old_counts = dict(self._count_items())
+                random.shuffle(epoch_compounds)
+
+                if trainer is not None:
+                    optimized = trainer.optimize(
+                        self, epoch_compounds, algorithm, algorithm_params)
                 else:
-                    raise MorfessorException("unknown algorithm '%s'" %
-                                             algorithm)
-                _logger.debug("#%s -> %s" %
-                              (w, " + ".join(self.cc.to_string(s) for s in segments)))
-            epochs += 1
-
-            _logger.debug("Cost before epoch update: %s" % self.get_cost())
-            forced_epochs = max(forced_epochs, self._epoch_update(epochs))
-            oldcost = newcost
-            newcost = self.get_cost()
-
-            self._epoch_checks()
-
-            _logger.info("Epochs: %s\tCost: %s" % (epochs, newcost))
-            if (forced_epochs == 0 and
-                    newcost >= oldcost - finish_threshold *
-                    self.cost.compound_tokens()):
-                break
-            if forced_epochs > 0:
-                forced_epochs -= 1
-            if max_epochs is not None and epochs >= max_epochs:
-                _logger.info("Max number of epochs reached, stop training")
-                break
+                    optimized = self._optimize_serial(
+                        epoch_compounds, algorithm, algorithm_params)
+                for w, segments in optimized:
+                    _logger.debug("#%s -> %s" %
+                                  (w, " + ".join(self.cc.to_string(s) for s in segments)))
+                epochs += 1
+
+                _logger.debug("Cost before epoch update: %s" % self.get_cost())
+                forced_epochs = max(forced_epochs, self._epoch_update(epochs))
+                oldcost = newcost
+                newcost = self.get_cost()
+
+                self._epoch_checks()
+
+                _logger.info("Epochs: %s\tCost: %s" % (epochs, newcost))
+                converged = (newcost >= oldcost - finish_threshold *
+                             self.cost.compound_tokens())
+                if forced_epochs == 0 and converged and full_sweep:
+                    break
+                if forced_epochs > 0:
+                    forced_epochs -= 1
+                if max_epochs is not None and epochs >= max_epochs:
+                    _logger.info("Max number of epochs reached, stop training")
+                    break
+                if active_threshold is not None:
+                    epoch_compounds = self._active_compounds(
+                        compounds, old_counts, active_threshold)
+                    # Convergence is only checked after a full sweep
+                    full_sweep = (converged or len(epoch_compounds) == 0 or
+                                  epochs % full_sweep_interval == 0)
+        finally:
+            if trainer is not None:
+                trainer.close()
         _logger.info("Done.")
         return epochs, newcost
 
@@ -579,6 +975,25 @@ class BaselineModel(object):
         _logger.info("Tokens processed: %s\tCost: %s" % (i, newcost))
         return epochs, newcost
 
+    def _use_lexicon_trie(self, compound):
+        """Return true if the Viterbi search without smoothing can be
+        restricted to the known morphs of the lexicon trie."""
+        return (type(self.cc) is BaseConstructionMethods and
+                self.cc._nosplit is None and _is_string(compound))
+
+    def _get_lexicon_trie(self):
+        """Return the prefix trie of the real constructions."""
+        if self._lexicon_trie is None:
+            self._lexicon_trie = make_trie(
+                c for c, node in self._analyses.items()
+                if not node.splitloc and node.count > 0)
+        return self._lexicon_trie
+
+    def _boundary_cost(self):
+        """Return the cost of the compound boundary in Viterbi search."""
+        return (math.log(self.cost.tokens() + self.cost.compound_tokens()) -
+                math.log(self.cost.compound_tokens()))
+
     def viterbi_segment(self, compound, addcount=1.0, maxlen=30,
                         allow_longer_unk_splits=False):
         """Find optimal segmentation using the Viterbi algorithm.
@@ -590,34 +1005,72 @@ class BaselineModel(object):
 
         If additive smoothing is applied, new complex construction types can
         be selected during the search. Without smoothing, only new
-        single-atom constructions can be selected.
+        single-atom constructions can be selected, so the search only
+        needs to go through the known constructions found in the lexicon
+        trie.
+
+        The results are looked up from the segmentation cache, if one has
+        been set with set_segmentation_cache.
 
         Returns the most probable segmentation and its log-probability.
 
         """
+        cache = self._segmentation_cache
+        if cache is None or allow_longer_unk_splits:
+            return self._viterbi_segment(compound, addcount, maxlen,
+                                         allow_longer_unk_splits)
+        key = (compound, addcount, maxlen)
+        result = cache.get(key)
+        if result is None:
+            result = self._viterbi_segment(compound, addcount, maxlen)
+            cache.put(key, result)
+        constructions, cost = result
+        return list(constructions), cost
+
+    def _viterbi_segment(self, compound, addcount=1.0, maxlen=30,
+                         allow_longer_unk_splits=False):
+        """Find optimal segmentation using the Viterbi algorithm, without
+        the segmentation cache. See viterbi_segment."""
         #clen = len(compound)
         # indices = range(1, clen+1) if allowed_boundaries is None \
         #           else allowed_boundaries+[clen]
 
-        grid = {None: (0.0, None)}
         tokens = self.cost.all_tokens() + addcount
         logtokens = math.log(tokens) if tokens > 0 else 0
 
+        badlikelihood = self.cost.bad_likelihood(compound,addcount)
+
+        if (addcount == 0 and not allow_longer_unk_splits and
+                self._use_lexicon_trie(compound)):
+            bounds, cost = _viterbi_known_morphs(
+                compound, self._get_lexicon_trie(),
+                self.get_construction_count, maxlen, logtokens,
+                badlikelihood)
+            constructions = list(self.cc.splitn(compound, bounds[1:-1]))
+            return constructions, cost + self._boundary_cost()
+
         newboundcost = self.cost.newbound_cost(addcount) if addcount > 0 else 0
 
-        badlikelihood = self.cost.bad_likelihood(compound,addcount)
+        # The grid is indexed by the positions of the locations in the
+        # lattice, the start and the end of the compound being the first
+        # and the last one
+        locations, predecessors = self.cc.split_lattice(compound, maxlen)
+        costs = [0.0] + [None] * (len(locations) - 1)
+        paths = [None] * len(locations)
 
-        for t in itertools.chain(self.cc.split_locations(compound), [None]):
+        for i in range(1, len(locations)):
             # Select the best path to current node.
             # Note that we can come from any node in history.
+            t = locations[i]
             bestpath = None
             bestcost = None
 
-            for pt in tail(maxlen, itertools.chain([None], self.cc.split_locations(compound, stop=t))):
-                if grid[pt][0] is None:
+            for prev in (prev for lo, hi in predecessors[i]
+                         for prev in range(lo, hi)):
+                if costs[prev] is None:
                     continue
-                cost = grid[pt][0]
-                construction = self.cc.slice(compound, pt, t)
+                cost = costs[prev]
+                construction = self.cc.slice(compound, locations[prev], t)
                 count = self.get_construction_count(construction)
                 if count > 0:
                     cost += (logtokens - math.log(count + addcount))
@@ -640,15 +1093,17 @@ class BaselineModel(object):
                 #_logger.debug("cost(%s)=%.2f", construction, cost)
                 if bestcost is None or cost < bestcost:
                     bestcost = cost
-                    bestpath = pt
-            grid[t] = (bestcost, bestpath)
+                    bestpath = prev
+            costs[i] = bestcost
+            paths[i] = bestpath
 
         splitlocs = []
 
-        cost, path = grid[None]
-        while path is not None:
-            splitlocs.append(path)
-            path = grid[path][1]
+        cost = costs[-1]
+        path = paths[-1]
+        while path:
+            splitlocs.append(locations[path])
+            path = paths[path]
 
         constructions = list(self.cc.splitn(compound, list(reversed(splitlocs))))
 
@@ -658,6 +1113,20 @@ class BaselineModel(object):
                  math.log(self.cost.compound_tokens()))
         return constructions, cost
 
+    def segment_many(self, compounds, addcount=1.0, maxlen=30, jobs=1,
+                     chunk_size=1000, cache_size=100000):
+        """Segment compounds using the Viterbi algorithm.
+
+        Yields the most probable segmentation and its log-probability for
+        each compound, in input order. Compounds repeated within
+        cache_size recently segmented ones are segmented only once, and
+        with jobs > 1 the segmentation is done by a pool of worker
+        processes.
+
+        """
+        return segment_many(self, compounds, addcount, maxlen, jobs,
+                            chunk_size, cache_size)
+
     #TODO project lambda
     def forward_logprob(self, compound):
         """Find log-probability of a compound using the forward algorithm.
@@ -809,6 +1278,32 @@ class BaselineModel(object):
     def set_corpus_coding_weight(self, weight):
         self._check_segment_only()
         self.cost.set_corpus_coding_weight(weight)
+        self._invalidate_segmentations()
+
+    def set_segmentation_cache(self, capacity, persist=False):
+        """Cache the results of viterbi_segment.
+
+        At most capacity results are kept, evicting the least recently
+        used ones. The cache is cleared whenever the counts of the model
+        change. If persist is true, the cached results are saved with the
+        model. A capacity of None or 0 disables the cache.
+
+        """
+        if capacity:
+            self._segmentation_cache = SegmentationCache(capacity, persist)
+        else:
+            self._segmentation_cache = None
+
+    def get_segmentation_cache_stats(self):
+        """Return (hits, misses, evictions, size) of the segmentation
+        cache, or None if it is not in use."""
+        if self._segmentation_cache is None:
+            return None
+        return self._segmentation_cache.stats()
+
+    def _invalidate_segmentations(self):
+        if self._segmentation_cache is not None:
+            self._segmentation_cache.clear()
 
     def make_segment_only(self):
         """Reduce the size of this model by removing all non-morphs from the
@@ -820,8 +1315,9 @@ class BaselineModel(object):
         self._num_compounds = len(self.get_compounds())
         self._segment_only = True
 
-        self._analyses = {k: v for (k, v) in self._analyses.items()
-                          if not v.splitloc}
+        self._analyses = self._new_analyses(
+            items=[(k, v) for (k, v) in self._analyses.items()
+                   if not v.splitloc])
 
     def clear_segmentation(self):
         for compound in self.get_compounds():
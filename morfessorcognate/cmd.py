@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import itertools
 import locale
 import logging
 import math
@@ -8,13 +9,14 @@ import sys
 import time
 import string
 
-from .data import freq_threshold, count_modifier, DataPoint, merge_counts, rand_split
+from .data import freq_threshold, count_modifier, DataPoint, merge_counts, \
+    external_merge_counts, rand_split
 
 from . import get_version
 from . import utils
 from .corpus import AnnotationCorpusWeight, MorphLengthCorpusWeight, \
     NumMorphCorpusWeight, FixedCorpusWeight, AlignedTokenCountCorpusWeight
-from .baseline import BaselineModel
+from .baseline import BaselineModel, ANALYSIS_TABLES
 from .constructions.base import BaseConstructionMethods
 from .exception import ArgumentException
 from .io import MorfessorIO
@@ -94,14 +96,24 @@ Interactive use (read corpus from user):
                  "file (Morfessor 1.0 format)")
     add_arg('-t', '--traindata', dest='trainfiles', action='append',
             default=[], metavar='<file>',
-            help="input corpus file(s) for training (text or bz2/gzipped text;"
-                 " use '-' for standard input; add several times in order to "
-                 "append multiple files)")
+            help="input corpus file(s) for training (text, or text "
+                 "compressed with gzip, bz2 or xz; use '-' for standard "
+                 "input; add several times in order to append multiple "
+                 "files)")
     add_arg('-T', '--testdata', dest='testfiles', action='append',
             default=[], metavar='<file>',
-            help="input corpus file(s) to analyze (text or bz2/gzipped text;  "
-                 "use '-' for standard input; add several times in order to "
-                 "append multiple files)")
+            help="input corpus file(s) to analyze (text, or text "
+                 "compressed with gzip, bz2 or xz; use '-' for standard "
+                 "input; add several times in order to append multiple "
+                 "files)")
+    add_arg('--count-memory', dest="countmemory", default=None, type=int,
+            metavar='<int>',
+            help="count at most this many compound types of the training "
+                 "data in memory, and spill the rest to temporary files "
+                 "(default: count all in memory)")
+    add_arg('--temp-dir', dest="tempdir", default=None, metavar='<dir>',
+            help="directory for the temporary files of --count-memory "
+                 "(default: the system temporary directory)")
 
     # Options for output data files
     add_arg = parser.add_argument_group('output data files').add_argument
@@ -118,6 +130,13 @@ Interactive use (read corpus from user):
             help="save final model to file in reduced form (pickled model "
             "object). A model in reduced form can only be used for "
             "segmentation of new words.")
+    add_arg('--save-segment-only', dest="savesegmentonly", default=None,
+            metavar='<file>',
+            help="compile the final model into a segment-only model file, "
+                 "which holds only what segmentation of new words needs")
+    add_arg('--compact', dest="compact", default=False, action='store_true',
+            help="save the models of --save and --save-reduced in the "
+                 "compact binary format instead of as pickles")
     add_arg('-x', '--lexicon', dest="lexfile", default=None, metavar='<file>',
             help="output final lexicon to given file")
     add_arg('--save-parameters', dest='saveparamsfile', default=None,
@@ -214,6 +233,20 @@ Interactive use (read corpus from user):
     add_arg('--max-epochs', dest='maxepochs', type=int, default=None,
             metavar='<int>',
             help='hard maximum of epochs in training')
+    add_arg('--active-threshold', dest='activethreshold', type=float,
+            default=None, metavar='<float>',
+            help="in batch training, only resegment compounds containing "
+                 "constructions whose count changed by more than this "
+                 "fraction in the previous epoch (default: resegment all)")
+    add_arg('--full-sweep-interval', dest='fullsweepinterval', type=int,
+            default=5, metavar='<int>',
+            help="with --active-threshold, resegment all compounds every "
+                 "this many epochs (default %(default)s)")
+    add_arg('--analysis-table', dest="analysistable",
+            choices=sorted(ANALYSIS_TABLES), default='dict',
+            help="storage of the analyses of a new model: a dict of nodes, "
+                 "or interned ids with counts in arrays, which takes less "
+                 "memory (default %(default)s)")
     add_arg('--nosplit-re', dest="nosplit", type=_str, default=None,
             metavar='<regexp>',
             help="if the expression matches the two surrounding characters, "
@@ -229,6 +262,20 @@ Interactive use (read corpus from user):
             type=int, metavar='<int>',
             help="maximum construction length in Viterbi training "
                  "and segmentation (default %(default)s)")
+    add_arg('-j', '--jobs', dest="jobs", default=1, type=int,
+            metavar='<int>',
+            help="number of worker processes for reading and counting "
+                 "training data (several files, or parts of uncompressed "
+                 "files, in parallel) and for segmenting test data and "
+                 "gold standard samples (default %(default)s)")
+    add_arg('--segmentation-cache', dest="segcache", default=0, type=int,
+            metavar='<int>',
+            help="cache up to N segmentations of the final model "
+                 "(default %(default)s, i.e. no cache)")
+    add_arg('--persist-segmentation-cache', dest="persistsegcache",
+            default=False, action='store_true',
+            help="save the segmentation cache with the reduced model "
+                 "after segmenting the test data (see --save-reduced)")
 
     # Options for corpusweight tuning
     add_arg = parser.add_mutually_exclusive_group().add_argument
@@ -390,7 +437,8 @@ def main(args):
             else RestrictedBaseline
         model = modelclass(corpusweight=args.corpusweight,
                            use_skips=args.skips,
-                           constr_class=constr_class
+                           constr_class=constr_class,
+                           analysis_table=args.analysistable
                            )
 
     if args.loadsegfile is not None:
@@ -466,12 +514,24 @@ def main(args):
     # Prep data
     if args.trainmode not in ('none', 'batch'):
         onlinedata = 'online' in args.trainmode
-        if args.list:
+        if args.jobs > 1 and args.countmemory is None:
+            # Read and count the files in parallel
+            if args.list:
+                counts = io.count_corpus_list_files(args.trainfiles,
+                                                    args.jobs)
+            else:
+                counts = io.count_corpus_files(args.trainfiles, args.jobs)
+            data = ((count, compound) for compound, count in counts.items())
+        elif args.list:
             data = io.read_corpus_list_files(args.trainfiles)
         else:
             data = io.read_corpus_files(args.trainfiles, retain_newlines=False)
-        data = [DataPoint(d[0], d[1], ()) for d in data]
-        data = merge_counts(data)
+        data = (DataPoint(d[0], d[1], ()) for d in data)
+        if args.countmemory is not None:
+            data = external_merge_counts(data, args.countmemory,
+                                         args.tempdir, args.jobs)
+        else:
+            data = merge_counts(data)
 
         if args.freqthreshold > 1:
             data = freq_threshold(data, args.freqthreshold, onlinedata)
@@ -497,7 +557,9 @@ def main(args):
             for alg, algp in zip(args.algorithms, algparams):
                 _logger.info("Batch training with %s algorithm", alg)
                 e, c = model.train_batch(
-                    alg, algp, args.finish_threshold, args.maxepochs)
+                    alg, algp, args.finish_threshold, args.maxepochs,
+                    active_threshold=args.activethreshold,
+                    full_sweep_interval=args.fullsweepinterval)
                 _logger.info("Epochs: %s", e)
                 _logger.info("Current cost: %s", c)
             te = time.time()
@@ -512,7 +574,9 @@ def main(args):
             for alg, algp in zip(args.algorithms, algparams):
                 _logger.info("Batch training with %s algorithm", alg)
                 e, c = model.train_batch(
-                    alg, algp, args.finish_threshold, args.maxepochs)
+                    alg, algp, args.finish_threshold, args.maxepochs,
+                    active_threshold=args.activethreshold,
+                    full_sweep_interval=args.fullsweepinterval)
                 _logger.info("Epochs: %s", e)
                 _logger.info("Current cost: %s", c)
             if args.fullretrain:
@@ -524,7 +588,9 @@ def main(args):
                     for alg, algp in zip(args.algorithms, algparams):
                         _logger.info("Batch retraining with %s algorithm", alg)
                         e, c = model.train_batch(
-                            alg, algp, args.finish_threshold, args.maxepochs)
+                            alg, algp, args.finish_threshold, args.maxepochs,
+                            active_threshold=args.activethreshold,
+                            full_sweep_interval=args.fullsweepinterval)
                         _logger.info("Retrain Epochs: %s", e)
                         _logger.info("Current cost: %s", c)
         elif args.trainmode == 'online':
@@ -554,7 +620,9 @@ def main(args):
                     _logger.info("Batch training with %s algorithm", alg)
                     e, c = model.train_batch(
                         alg, algp, args.finish_threshold,
-                        (args.maxepochs - e) if args.maxepochs else None)
+                        (args.maxepochs - e) if args.maxepochs else None,
+                        active_threshold=args.activethreshold,
+                        full_sweep_interval=args.fullsweepinterval)
                     _logger.info("Epochs: %s", e)
                     _logger.info("Current cost: %s", c)
         else:
@@ -567,13 +635,25 @@ def main(args):
     else:
         _logger.warning("No training data files specified.")
 
+    if args.segcache > 0:
+        model.set_segmentation_cache(args.segcache,
+                                     persist=args.persistsegcache)
+
+    if args.compact:
+        write_model_file = io.write_compact_model_file
+    else:
+        write_model_file = io.write_binary_model_file
+
     # Save model
     if args.savefile is not None:
-        io.write_binary_model_file(args.savefile, model)
+        write_model_file(args.savefile, model)
 
     if args.savesegfile is not None:
         io.write_segmentation_file(args.savesegfile, model.get_segmentations())
 
+    if args.savesegmentonly is not None:
+        io.write_segment_only_model_file(args.savesegmentonly, model)
+
     # Output lexicon
     if args.lexfile is not None:
         io.write_lexicon_file(args.lexfile, model.get_constructions())
@@ -583,9 +663,12 @@ def main(args):
         io.write_parameter_file(args.saveparamsfile,
                                 model.get_params())
 
-    if args.savereduced is not None:
+    # With a persistent cache, the reduced model is saved after the test
+    # data has been segmented
+    save_reduced_later = args.segcache > 0 and args.persistsegcache
+    if args.savereduced is not None and not save_reduced_later:
         model.make_segment_only()
-        io.write_binary_model_file(args.savereduced, model)
+        write_model_file(args.savereduced, model)
 
     # Segment test data
     if len(args.testfiles) > 0:
@@ -597,6 +680,12 @@ def main(args):
         keywords = [x[1] for x in string.Formatter().parse(outformat)]
         with io._open_text_file_write(args.outfile) as fobj:
             testdata = io.read_corpus_files(args.testfiles)
+            if args.nbest <= 1:
+                # Segment the compounds as they are read
+                testdata, segdata = itertools.tee(testdata)
+                segmentations = model.segment_many(
+                    (atoms for _, atoms in segdata if len(atoms) > 0),
+                    args.viterbismooth, args.viterbimaxlen, jobs=args.jobs)
             i = 0
             for count, atoms in testdata:
                 if io.atom_separator is None:
@@ -624,8 +713,7 @@ def main(args):
                                                     count=count, logprob=logp,
                                                     clogprob=clogprob))
                 else:
-                    constructions, logp = model.viterbi_segment(
-                        atoms, args.viterbismooth, args.viterbimaxlen)
+                    constructions, logp = next(segmentations)
                     analysis = io.format_constructions(constructions, csep=csep)
                     fobj.write(outformat.format(analysis=analysis,
                                                 compound=compound,
@@ -637,10 +725,20 @@ def main(args):
             sys.stderr.write("\n")
         _logger.info("Done.")
 
+    if args.segcache > 0:
+        _logger.info("Segmentation cache: %s hits, %s misses, "
+                     "%s evictions, %s entries",
+                     *model.get_segmentation_cache_stats())
+
+    if args.savereduced is not None and save_reduced_later:
+        model.make_segment_only()
+        write_model_file(args.savereduced, model)
+
     if args.goldstandard is not None:
         _logger.info("Evaluating Model")
         e = MorfessorEvaluation(io.read_annotations_file(args.goldstandard))
-        result = e.evaluate_model(model, meta_data={'name': 'MODEL'})
+        result = e.evaluate_model(model, meta_data={'name': 'MODEL'},
+                                  jobs=args.jobs)
         print(result.format(FORMAT_STRINGS['default']))
         _logger.info("Done")
 
@@ -665,6 +763,9 @@ def get_evaluation_argparser():
             default=10, help='number of samples to take for testing')
     add_arg('--sample-size', dest='samplesize', type=int, metavar='<int>',
             default=1000, help='size of each testing samples')
+    add_arg('-j', '--jobs', dest='jobs', type=int, metavar='<int>',
+            default=1, help='number of worker processes for segmenting the '
+                            'sampled compounds (default %(default)s)')
 
     add_arg = parser.add_argument_group('formatting options').add_argument
     add_arg('--format-string', dest='formatstring', metavar='<format>',
@@ -743,7 +844,8 @@ def main_evaluation(args):
         result = ev.evaluate_model(io.read_any_model(f),
                                    configuration=EvaluationConfig(num_samples,
                                                                   sample_size),
-                                   meta_data={'name': os.path.basename(f)})
+                                   meta_data={'name': os.path.basename(f)},
+                                   jobs=args.jobs)
         results.append(result)
         print(result.format(f_string))
 
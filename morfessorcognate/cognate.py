@@ -1,5 +1,7 @@
 from __future__ import unicode_literals
+import array
 import collections
+import functools
 import heapq
 import itertools
 import logging
@@ -8,11 +10,13 @@ import numbers
 import random
 import Levenshtein
 
-from .baseline import BaselineModel, ConstrNode
+from .baseline import BaselineModel, ConstrNode, _viterbi_known_morphs
 from .cost import Cost
 from .constructions.cognate import CognateConstructionMethods, WILDCARD
 from .corpus import LexiconEncoding, CorpusEncoding, \
-    AnnotatedCorpusEncoding, FixedCorpusWeight
+    AnnotatedCorpusEncoding, FixedCorpusWeight, IndexedLexiconEncoding
+from .exception import MorfessorException
+from .utils import grow_array, make_trie, picklable_array
 
 _logger = logging.getLogger(__name__)
 
@@ -28,7 +32,13 @@ class CognateModel(BaselineModel):
 
     penalty = -9999.9
 
-    def __init__(self, corpusweight=None, use_skips=False, constr_class=None):
+    # Distance from the alignment of a cognate pair within which it is
+    # split, or None to try all split locations
+    align_band = None
+
+    def __init__(self, corpusweight=None, use_skips=False, constr_class=None,
+                 align_band=None, edit_cache_size=None,
+                 analysis_table='dict'):
         """Initialize a new model instance.
 
         Arguments:
@@ -39,15 +49,23 @@ class CognateModel(BaselineModel):
                          to speed up training
             nosplit_re: regular expression string for preventing splitting
                           in certain contexts
+            align_band: if not None, only split cognate pairs at locations
+                          within this distance of the Levenshtein alignment
+                          of the pair during recursive training
+            edit_cache_size: maximum number of cognate pairs for which
+                               the edit operations are cached
+            analysis_table: storage of the analyses, 'dict' for a dict of
+                              ConstrNodes or 'array' for an AnalysisTable
 
         """
 
         self.cc = CognateConstructionMethods()
+        self.align_band = align_band
 
         # In analyses for each construction a ConstrNode is stored. All
         # training data has a rcount (real count) > 0. All real morphemes
         # have no split locations.
-        self._analyses = {}
+        self._analyses = self._new_analyses(analysis_table)
 
         # Flag to indicate the model is only useful for segmentation
         self._segment_only = False
@@ -61,18 +79,26 @@ class CognateModel(BaselineModel):
         # self.set_corpus_weight_updater(corpusweight)
         self._corpus_weight_updater = None
 
-        self.cost = CognateCost(self.cc, corpusweight)
+        self.cost = CognateCost(self.cc, corpusweight, edit_cache_size)
+
+    def _epoch_update(self, epoch_num):
+        forced_epochs = super(CognateModel, self)._epoch_update(epoch_num)
+        hits, misses, size = self.cost.edit_cache.stats()
+        _logger.debug("Edit cache: %s hits, %s misses, %s entries" %
+                      (hits, misses, size))
+        return forced_epochs
 
-    def _recursive_split(self, construction):
-        """Optimize segmentation of the construction by recursive splitting.
+    def _split_once(self, construction):
+        """Choose the best binary split (or no split) of the construction
+        and update the model accordingly.
 
-        Returns list of segments.
+        Returns the (prefix, suffix) pair, or None if not split.
 
         """
         # contains cognate-morfessor specific hacks!
 
         # if self._use_skips and self._test_skip(construction):
-        #     return self.segment(construction)
+        #     return None
         rcount, count = self._remove(construction)
         src, trg = construction
         src_rcount = 0
@@ -96,37 +122,28 @@ class CognateModel(BaselineModel):
                 wild_trg = None
 
         # Check all binary splits and no split
-        self._modify_construction_count(construction, count)
-        self._modify_construction_count(wild_src, src_count)
-        self._modify_construction_count(wild_trg, trg_count)
-        mincost = self.get_cost()
-        self._modify_construction_count(construction, -count)
-        self._modify_construction_count(wild_src, -src_count)
-        self._modify_construction_count(wild_trg, -trg_count)
+        deltas = collections.Counter()
+        self._collect_count_deltas(construction, count, deltas)
+        self._collect_count_deltas(wild_src, src_count, deltas)
+        self._collect_count_deltas(wild_trg, trg_count, deltas)
+        mincost = self.get_cost(deltas)
 
         best_splitloc = None
 
-        for loc in self.cc.split_locations(construction):
+        for loc in self._split_locations(construction):
             prefix, suffix = self.cc.split(construction, loc)
-            self._modify_construction_count(prefix, count)
-            self._modify_construction_count(suffix, count)
+            deltas = collections.Counter()
+            self._collect_count_deltas(prefix, count, deltas)
+            self._collect_count_deltas(suffix, count, deltas)
             if wild_src is not None:
                 src_prefix, src_suffix = self.cc.split(wild_src, loc)
-                self._modify_construction_count(src_prefix, src_count)
-                self._modify_construction_count(src_suffix, src_count)
+                self._collect_count_deltas(src_prefix, src_count, deltas)
+                self._collect_count_deltas(src_suffix, src_count, deltas)
             if wild_trg is not None:
                 trg_prefix, trg_suffix = self.cc.split(wild_trg, loc)
-                self._modify_construction_count(trg_prefix, trg_count)
-                self._modify_construction_count(trg_suffix, trg_count)
-            cost = self.get_cost()
-            self._modify_construction_count(prefix, -count)
-            self._modify_construction_count(suffix, -count)
-            if wild_src is not None:
-                self._modify_construction_count(src_prefix, -src_count)
-                self._modify_construction_count(src_suffix, -src_count)
-            if wild_trg is not None:
-                self._modify_construction_count(trg_prefix, -trg_count)
-                self._modify_construction_count(trg_suffix, -trg_count)
+                self._collect_count_deltas(trg_prefix, trg_count, deltas)
+                self._collect_count_deltas(trg_suffix, trg_count, deltas)
+            cost = self.get_cost(deltas)
             if cost <= mincost:
                 mincost = cost
                 best_splitloc = loc
@@ -150,11 +167,7 @@ class CognateModel(BaselineModel):
                 trg_prefix, trg_suffix = self.cc.split(wild_trg, best_splitloc)
                 self._modify_construction_count(trg_prefix, trg_count)
                 self._modify_construction_count(trg_suffix, trg_count)
-            lp = self._recursive_split(prefix)
-            if suffix != prefix:
-                return lp + self._recursive_split(suffix)
-            else:
-                return lp + lp
+            return prefix, suffix
         else:
             # Real construction
             self._analyses[construction] = ConstrNode(rcount, 0, None)
@@ -165,27 +178,197 @@ class CognateModel(BaselineModel):
             if wild_trg is not None:
                 self._analyses[wild_trg] = ConstrNode(trg_rcount, 0, None)
                 self._modify_construction_count(wild_trg, trg_count)
-            return [construction]
+            return None
+
+    def _count_items(self):
+        for side, cost in enumerate((self.cost.src_cost, self.cost.trg_cost)):
+            for substring_id, count in enumerate(cost.counts):
+                if count != 0:
+                    yield (side, substring_id), count
+
+    def _count_keys(self, construction):
+        lookup = self.cost.substrings.lookup
+        keys = []
+        for side, field in enumerate(construction):
+            if field == WILDCARD:
+                continue
+            n = len(field)
+            substrings = ([field[:i] for i in range(1, n + 1)] +
+                          [field[i:] for i in range(1, n)])
+            # substrings that are not interned have never been counted
+            keys.extend((side, substring_id) for substring_id in
+                        map(lookup, substrings) if substring_id is not None)
+        return keys
+
+    def _split_locations(self, construction):
+        """Return the split locations to try in recursive splitting.
+
+        If align_band is set, locations of cognate pairs are restricted to
+        the neighbourhood of the alignment given by the edit operations.
+
+        """
+        if (self.align_band is None or
+                construction.src == WILDCARD or
+                construction.trg == WILDCARD):
+            return self.cc.split_locations(construction)
+        return alignment_split_locations(
+            construction.src, construction.trg, self.align_band)
+
+    def _viterbi_segment(self, compound, addcount=1.0, maxlen=30,
+                         allow_longer_unk_splits=False):
+        """Find optimal segmentation using the Viterbi algorithm.
+
+        Compounds with only one side (the other being WILDCARD) are
+        segmented with a one-dimensional search over the positions of
+        that side, which gives the same result as the generic search.
+
+        """
+        if compound.src != WILDCARD and compound.trg == WILDCARD:
+            return self._viterbi_segment_side(
+                compound, 0, addcount, maxlen, allow_longer_unk_splits)
+        if compound.src == WILDCARD and compound.trg != WILDCARD:
+            return self._viterbi_segment_side(
+                compound, 1, addcount, maxlen, allow_longer_unk_splits)
+        return super(CognateModel, self)._viterbi_segment(
+            compound, addcount, maxlen, allow_longer_unk_splits)
+
+    def _viterbi_segment_side(self, compound, side, addcount, maxlen,
+                              allow_longer_unk_splits):
+        """Viterbi segmentation of a single-side compound.
+
+        The search runs over integer positions of the side given by the
+        index side (0 for src, 1 for trg), and the morph counts are looked
+        up directly in the counts of the cost of that side, by the ids of
+        the shared substring table.
+
+        """
+        word = compound[side]
+        if side == 0:
+            side_cost = self.cost.src_cost
+            make = lambda morph: self.cc.type(morph, WILDCARD)
+        else:
+            side_cost = self.cost.trg_cost
+            make = lambda morph: self.cc.type(WILDCARD, morph)
+        counts = side_cost.counts
+        size = len(counts)
+        lookup = self.cost.substrings.ids.get
+
+        tokens = self.cost.all_tokens() + addcount
+        logtokens = math.log(tokens) if tokens > 0 else 0
+        newboundcost = self.cost.newbound_cost(addcount) if addcount > 0 else 0
+        badlikelihood = self.cost.bad_likelihood(compound, addcount)
+        # cost of longer unknown constructions, as in the generic search
+        longunkcost = len(self.cc.corpus_key(compound)) * badlikelihood
+        notokens = self.cost.tokens() == 0
+
+        if addcount == 0 and not allow_longer_unk_splits:
+            bounds, cost = _viterbi_known_morphs(
+                word, self._get_lexicon_trie()[side], side_cost.count, maxlen,
+                logtokens, badlikelihood)
+            return (self._side_constructions(word, bounds, make),
+                    cost + self._boundary_cost())
+
+        # best cost and previous position of the paths to each position
+        n = len(word)
+        costs = [0.0] + [None] * n
+        paths = [0] * (n + 1)
+        for t in range(1, n + 1):
+            bestcost = None
+            bestpath = 0
+            for pt in range(max(0, t - maxlen), t):
+                cost = costs[pt]
+                if cost is None:
+                    continue
+                morph = word[pt:t]
+                morph_id = lookup(morph)
+                count = (counts[morph_id] if morph_id is not None and
+                         morph_id < size else 0)
+                if count > 0:
+                    cost += (logtokens - math.log(count + addcount))
+                elif addcount > 0:
+                    codingcost = self.cost.get_coding_cost(make(morph))
+                    if notokens:
+                        cost += (addcount * math.log(addcount) +
+                                 newboundcost + codingcost)
+                    else:
+                        cost += (logtokens - math.log(addcount) +
+                                 newboundcost + codingcost)
+                elif t - pt == 1:
+                    cost += badlikelihood
+                elif allow_longer_unk_splits:
+                    cost += longunkcost
+                else:
+                    continue
+                if bestcost is None or cost < bestcost:
+                    bestcost = cost
+                    bestpath = pt
+            costs[t] = bestcost
+            paths[t] = bestpath
+
+        bounds = [n]
+        while bounds[-1] > 0:
+            bounds.append(paths[bounds[-1]])
+        bounds.reverse()
+        return (self._side_constructions(word, bounds, make),
+                costs[n] + self._boundary_cost())
+
+    def segment_many(self, words, side=None, addcount=1.0, maxlen=30,
+                     jobs=1, chunk_size=1000, cache_size=100000):
+        """Segment compounds using the Viterbi algorithm.
+
+        If side is 'src' or 'trg', the words are strings of that side,
+        which are segmented as compounds with a wildcard on the other
+        side. See BaselineModel.segment_many.
+
+        """
+        if side == 'src':
+            words = (self.cc.type(word, WILDCARD) for word in words)
+        elif side == 'trg':
+            words = (self.cc.type(WILDCARD, word) for word in words)
+        elif side is not None:
+            raise MorfessorException("unknown side '%s'" % side)
+        return super(CognateModel, self).segment_many(
+            words, addcount, maxlen, jobs, chunk_size, cache_size)
+
+    @staticmethod
+    def _side_constructions(word, bounds, make):
+        return [make(word[bounds[i]:bounds[i + 1]])
+                for i in range(len(bounds) - 1)]
+
+    def _get_lexicon_trie(self):
+        """Return the prefix tries of the src and trg morphs."""
+        if self._lexicon_trie is None:
+            self._lexicon_trie = tuple(
+                make_trie(morph for morph, count
+                          in side.substring_counts().items() if count > 0)
+                for side in (self.cost.src_cost, self.cost.trg_cost))
+        return self._lexicon_trie
 
     def get_construction_count(self, construction):
         if construction.src == WILDCARD:
-            return self.cost.trg_cost.counts[construction.trg]
+            return self.cost.trg_cost.count(construction.trg)
         if construction.trg == WILDCARD:
-            return self.cost.src_cost.counts[construction.src]
+            return self.cost.src_cost.count(construction.src)
         # else
         return super().get_construction_count(construction)
 
 class CognateCost(object):
-    def __init__(self, contr_class, corpusweight=1.0):
+    def __init__(self, contr_class, corpusweight=1.0, edit_cache_size=None):
         try:
             corpusweight_src, corpusweight_trg = corpusweight
         except TypeError:
             corpusweight_src = corpusweight
             corpusweight_trg = corpusweight
-        self.src_cost = Cost(contr_class, corpusweight=corpusweight_src)
-        self.trg_cost = Cost(contr_class, corpusweight=corpusweight_trg)
-        self.edit_cost = Cost(contr_class, corpusweight=1.0)
+        # the src and trg costs count ids of the shared substring table
+        self.substrings = SubstringTable()
+        self.src_cost = SubstringCost(self.substrings,
+                                      corpusweight=corpusweight_src)
+        self.trg_cost = SubstringCost(self.substrings,
+                                      corpusweight=corpusweight_trg)
+        self.edit_cost = EditCost(corpusweight=1.0)
         self.edit_weight = 1.0
+        # shared by all updates of the src, trg and edit costs
+        self.edit_cache = EditCache(edit_cache_size, self.edit_cost.intern)
 
         self.cc = contr_class
         self._corpus_weight_updater = None
@@ -193,6 +376,26 @@ class CognateCost(object):
         #Set corpus weight updater
         #self.set_corpus_weight_updater(corpusweight)
 
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if 'substrings' not in state:
+            # pickled before the substrings were interned
+            self.substrings = SubstringTable()
+            self.src_cost = _intern_cost(self.src_cost,
+                                         SubstringCost(self.substrings))
+            self.trg_cost = _intern_cost(self.trg_cost,
+                                         SubstringCost(self.substrings))
+        if not isinstance(self.edit_cost, EditCost):
+            # pickled before the edit operations were interned
+            self.edit_cost = _intern_cost(self.edit_cost, EditCost())
+        if 'edit_cache' not in state:
+            # pickled before the edit operations were cached
+            self.edit_cache = EditCache(None, self.edit_cost.intern)
+        elif self.edit_cache.intern is None:
+            # the cached edit operations were strings
+            self.edit_cache = EditCache(self.edit_cache.capacity,
+                                        self.edit_cost.intern)
+
     def set_corpus_weight_updater(self, corpus_weight):
         if corpus_weight is None:
             self._corpus_weight_updater = FixedCorpusWeight(1.0)
@@ -211,9 +414,36 @@ class CognateCost(object):
     def set_edit_weight(self, weight):
         self.edit_weight = weight
 
-    def cost(self):
-        return self.src_cost.cost() + self.trg_cost.cost() + \
-            self.edit_weight * self.edit_cost.cost()
+    def cost(self, deltas=None):
+        """Return the total cost of the src, trg and edit lexicons and
+        corpora.
+
+        If deltas is given, it should be a mapping from cognate
+        constructions to count changes. The cost is then calculated
+        without modifying the model, see Cost.cost.
+
+        """
+        if not deltas:
+            return self.src_cost.cost() + self.trg_cost.cost() + \
+                self.edit_weight * self.edit_cost.cost()
+
+        src_deltas = collections.Counter()
+        trg_deltas = collections.Counter()
+        edit_deltas = collections.Counter()
+        for construction, delta in deltas.items():
+            if delta == 0:
+                continue
+            src, trg = self.cc.lex_key(construction)
+            if src != WILDCARD:
+                src_deltas[src] += delta
+            if trg != WILDCARD:
+                trg_deltas[trg] += delta
+            if src != WILDCARD and trg != WILDCARD:
+                for edit in self.edit_cache.lookup(src, trg):
+                    edit_deltas[edit] += delta
+        return self.src_cost.cost(src_deltas) + \
+            self.trg_cost.cost(trg_deltas) + \
+            self.edit_weight * self.edit_cost.cost(edit_deltas)
 
     def update(self, construction, delta):
         if delta == 0:
@@ -221,11 +451,11 @@ class CognateCost(object):
 
         src, trg = self.cc.lex_key(construction)
         if src != WILDCARD:
-            self.src_cost.update(src, delta)
+            self.src_cost.update(self.src_cost.intern(src), delta)
         if trg != WILDCARD:
-            self.trg_cost.update(trg, delta)
+            self.trg_cost.update(self.trg_cost.intern(trg), delta)
         if src != WILDCARD and trg != WILDCARD:
-            for edit in edits(src, trg):
+            for edit in self.edit_cache(src, trg):
                 self.edit_cost.update(edit, delta)
 
     def update_boundaries(self, compound, delta):
@@ -235,7 +465,7 @@ class CognateCost(object):
         if trg != WILDCARD:
             self.trg_cost.update_boundaries(trg, delta)
         if src != WILDCARD and trg != WILDCARD:
-            for edit in edits(src, trg):
+            for edit in self.edit_cache(src, trg):
                 self.edit_cost.update_boundaries(edit, delta)
 
     def coding_length(self, construction):
@@ -273,6 +503,276 @@ class CognateCost(object):
             self.trg_cost.get_coding_cost(trg)
 
 
+class EditLexicon(object):
+    """Interning table for edit operations.
+
+    Each edit operation string is given a dense integer id when it is
+    first seen, and its atoms are interned in the same way. The table
+    works as the construction methods of an EditCost, so that the
+    constructions of the edit cost are edit ids.
+
+    """
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+        self._atom_ids = {}
+        self._atoms = []
+
+    def intern(self, edit):
+        """Return the id of the edit operation string."""
+        try:
+            return self.ids[edit]
+        except KeyError:
+            edit_id = len(self.strings)
+            self.ids[edit] = edit_id
+            self.strings.append(edit)
+            self._atoms.append(tuple(self.intern_atom(atom)
+                                     for atom in edit))
+            return edit_id
+
+    def intern_atom(self, atom):
+        """Return the id of the atom."""
+        atom_id = self._atom_ids.get(atom)
+        if atom_id is None:
+            atom_id = self._atom_ids[atom] = len(self._atom_ids)
+        return atom_id
+
+    def interned_atom_key(self, string):
+        """Return the atom ids of any string, interning new atoms."""
+        try:
+            return tuple(map(self._atom_ids.__getitem__, string))
+        except KeyError:
+            return tuple(map(self.intern_atom, string))
+
+    def to_string(self, edit_id):
+        return self.strings[edit_id]
+
+    def corpus_key(self, edit_id):
+        return edit_id
+
+    def lex_key(self, edit_id):
+        return self._atoms[edit_id]
+
+    def atoms(self, edit_id):
+        return self._atoms[edit_id]
+
+
+class SubstringTable(EditLexicon):
+    """Interning table for the src and trg substrings of a CognateModel.
+
+    The table is shared by the src and trg costs, so each distinct
+    substring (and atom) gets one id, whichever side it is seen on.
+    Unlike intern, lookup and atom_key do not add to the table.
+
+    """
+    def lookup(self, substring):
+        """Return the id of the substring, or None if it is not known."""
+        return self.ids.get(substring)
+
+    def atom_key(self, substring):
+        """Return the atom ids of any substring. Unknown atoms get the
+        id -1, which is never in a lexicon."""
+        atom_ids = self._atom_ids
+        return tuple(atom_ids.get(atom, -1) for atom in substring)
+
+    def atom_strings(self):
+        """Return the atoms in the order of their ids."""
+        return sorted(self._atom_ids, key=self._atom_ids.get)
+
+
+class IndexedCost(Cost):
+    """Cost of constructions that are ids of an interning table.
+
+    The counts are stored in an array indexed by the id, and the lexicon
+    coding counts interned atoms, so updates do not hash or iterate over
+    strings. The ids must be taken from intern of the cost. cost takes
+    strings, which do not need to be in the table.
+
+    The counts of a model read from a compact model file are a memoryview
+    of the file, which is copied when it grows.
+
+    """
+    def __init__(self, lexicon, corpusweight=1.0):
+        super(IndexedCost, self).__init__(lexicon, corpusweight)
+        self._lexicon_coding = IndexedLexiconEncoding()
+        self._corpus_coding = CorpusEncoding(self._lexicon_coding)
+        self.set_corpus_weight_updater(corpusweight)
+        self.counts = array.array('q')
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['counts'] = picklable_array(self.counts)
+        return state
+
+    def intern(self, string):
+        """Return the id of the string."""
+        string_id = self.cc.intern(string)
+        if string_id >= len(self.counts):
+            self.counts = grow_array(self.counts, string_id + 1, 0)
+        return string_id
+
+    def cost(self, deltas=None):
+        """Return the total cost of the lexicon and corpus.
+
+        Unlike in Cost.cost, deltas maps strings (rather than ids) to
+        count changes, so that the candidate strings of a split do not
+        need to be interned.
+
+        """
+        if not deltas:
+            return super(IndexedCost, self).cost()
+        lookup = self.cc.ids.get
+        counts = self.counts
+        size = len(counts)
+        changes = []
+        for string, delta in deltas.items():
+            if delta != 0:
+                string_id = lookup(string)
+                changes.append((string, counts[string_id]
+                                if string_id is not None and
+                                string_id < size else 0, delta))
+        return self._delta_cost(changes, self.cc.interned_atom_key)
+
+
+class EditCost(IndexedCost):
+    """Cost of the edit operations of cognate pairs.
+
+    The constructions are edit ids from an EditLexicon. cost takes edit
+    strings, e.g. from EditCache.lookup.
+
+    """
+    def __init__(self, corpusweight=1.0):
+        super(EditCost, self).__init__(EditLexicon(), corpusweight)
+
+    def most_common(self):
+        """Return (edit, count) pairs of the edit operations, ordered from
+        the most common to the least common."""
+        return sorted(((self.cc.to_string(edit_id), count)
+                       for edit_id, count in enumerate(self.counts)),
+                      key=lambda pair: -pair[1])
+
+
+class SubstringCost(IndexedCost):
+    """Cost of the src or trg side of a CognateModel.
+
+    The constructions are substring ids from a SubstringTable shared by
+    both sides. cost, count, bad_likelihood and get_coding_cost take
+    substrings, which do not need to be in the table.
+
+    """
+    def count(self, substring):
+        """Return the count of a substring."""
+        substring_id = self.cc.lookup(substring)
+        if substring_id is None or substring_id >= len(self.counts):
+            return 0
+        return self.counts[substring_id]
+
+    def substring_counts(self):
+        """Return a dict of the substrings with non-zero counts."""
+        strings = self.cc.strings
+        return {strings[i]: count for i, count in enumerate(self.counts)
+                if count != 0}
+
+    def atom_counts(self):
+        """Return a dict of the counts of the atoms in the lexicon."""
+        atoms = self._lexicon_coding.atoms
+        return {atom: atoms[i]
+                for i, atom in enumerate(self.cc.atom_strings())
+                if i < len(atoms) and atoms[i] >= 0}
+
+    def bad_likelihood(self, substring, addcount):
+        lt = math.log(self.all_tokens() + addcount) if addcount > 0 else 0
+        nb = self.newbound_cost(addcount) if addcount > 0 else 0
+        return 1.0 + len(substring) * lt + nb + \
+            self.get_coding_cost(substring)
+
+    def get_coding_cost(self, substring):
+        return self._lexicon_coding.get_codelength(
+            self.cc.atom_key(substring), len(substring)) / \
+            self._corpus_coding.weight
+
+
+def _intern_cost(cost, interned):
+    """Copy the state of a Cost whose constructions are strings to the
+    empty IndexedCost interned, and return interned."""
+    for string, count in cost.counts.items():
+        interned.counts[interned.intern(string)] = count
+    lexicon = interned._lexicon_coding
+    for name in ('tokens', 'boundaries', 'logtokensum', 'weight'):
+        setattr(lexicon, name, getattr(cost._lexicon_coding, name))
+    for atom, count in cost._lexicon_coding.atoms.items():
+        atom_id = interned.cc.intern_atom(atom)
+        if atom_id >= len(lexicon.atoms):
+            lexicon.atoms.extend([-1] * (atom_id + 1 - len(lexicon.atoms)))
+        lexicon.atoms[atom_id] = count
+        lexicon._num_atoms += 1
+    interned._corpus_coding = cost._corpus_coding
+    interned._corpus_coding.lexicon_encoding = lexicon
+    interned._corpus_weight_updater = cost._corpus_weight_updater
+    return interned
+
+
+class EditCache(object):
+    """Bounded cache of the edit operations of (src, trg) pairs.
+
+    The least recently used pairs are evicted when the cache is full.
+    If intern is given, the edit operations returned by calling the cache
+    are converted with it (e.g. to edit ids), and lookup returns them as
+    strings without interning. The two are cached separately, but the
+    edit operations of a pair are computed only once while it is in the
+    cache. The cached edits are not pickled.
+
+    """
+    default_capacity = 2 ** 18
+
+    def __init__(self, capacity=None, intern=None):
+        self.capacity = (capacity if capacity is not None
+                         else self.default_capacity)
+        self.intern = intern
+        self._init_cache()
+
+    def _init_cache(self):
+        def compute(src, trg):
+            return tuple(edits(src, trg))
+        self._strings = functools.lru_cache(maxsize=self.capacity)(compute)
+        intern = self.intern
+        if intern is None:
+            self._edits = self._strings
+        else:
+            strings = self._strings
+
+            def convert(src, trg):
+                return tuple(intern(edit) for edit in strings(src, trg))
+            self._edits = functools.lru_cache(maxsize=self.capacity)(convert)
+
+    def __call__(self, src, trg):
+        """Return a tuple of the edit operations from src to trg."""
+        return self._edits(src, trg)
+
+    def lookup(self, src, trg):
+        """Return a tuple of the edit operation strings from src to trg,
+        without interning them."""
+        return self._strings(src, trg)
+
+    def stats(self):
+        """Return the number of hits, misses and cached pairs of the
+        computation of the edit operations."""
+        info = self._strings.cache_info()
+        return info.hits, info.misses, info.currsize
+
+    def clear(self):
+        self._strings.cache_clear()
+        self._edits.cache_clear()
+
+    def __getstate__(self):
+        return {'capacity': self.capacity, 'intern': self.intern}
+
+    def __setstate__(self, state):
+        self.capacity = state['capacity']
+        self.intern = state['intern']
+        self._init_cache()
+
+
 def remove_equal(edits):
     for edit in edits:
         if edit[0] == 'equal':
@@ -330,12 +830,49 @@ def lengthening(src, trg, edits):
         yield op, ib, ie, jb, je
 
 
-def edits(src, trg):
+def edit_spans(src, trg):
+    """Yield the edit operations between src and trg as
+    (op, ib, ie, jb, je) tuples, excluding the equal parts."""
     edits = Levenshtein.opcodes(src, trg)
     edits = remove_equal(edits)
     edits = merge_consecutive_edits(edits)
-    edits = lengthening(src, trg, edits)
-    for op, ib, ie, jb, je in edits:
+    return lengthening(src, trg, edits)
+
+
+def alignment_split_locations(src, trg, band=0):
+    """Return the split locations of the cognate pair (src, trg) that are
+    consistent with the alignment given by edit_spans.
+
+    The alignment follows the diagonal through the equal parts and jumps
+    over each edit operation. Locations at most band positions away from
+    the alignment (on either side) are also included. The locations are
+    returned in the same order as by split_locations.
+
+    """
+    path = []
+    i, j = 0, 0
+    for op, ib, ie, jb, je in edit_spans(src, trg):
+        while i < ib and j < jb:
+            path.append((i, j))
+            i += 1
+            j += 1
+        path.append((ib, jb))
+        i, j = ie, je
+    while i <= len(src) and j <= len(trg):
+        path.append((i, j))
+        i += 1
+        j += 1
+
+    locations = set()
+    for i, j in path:
+        for gi in range(max(1, i - band), min(len(src), i + band + 1)):
+            for pi in range(max(1, j - band), min(len(trg), j + band + 1)):
+                locations.add((gi, pi))
+    return sorted(locations)
+
+
+def edits(src, trg):
+    for op, ib, ie, jb, je in edit_spans(src, trg):
         if op == 'equal':
             continue
         if op == 'delete':
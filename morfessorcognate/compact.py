@@ -0,0 +1,511 @@
+"""Compact binary model format.
+
+A compact model file starts with a magic string, the format version and
+a JSON header, which holds the hyperparameters and the scalar state of
+the model. The header is followed by sections, each of which is a flat
+array of numbers in the byte order given in the header. All construction
+strings are interned into one string table section, and the analyses and
+counts refer to them by index.
+
+The file is read through mmap, so the sections are not copied before
+they are used, and CompactModelFile gives direct access to them. The
+count arrays of the src, trg and edit costs of a cognate model stay in
+the mapped file, so processes that load the same model share their
+pages until they are modified, while the analyses and strings are
+rebuilt as Python objects. Unlike
+a pickle, the format does not store arbitrary objects: corpus weight
+updaters other than FixedCorpusWeight and the segmentation cache are
+not saved.
+
+"""
+from __future__ import unicode_literals
+import array
+import itertools
+import json
+import logging
+import mmap
+import struct
+import sys
+
+from .baseline import BaselineModel, ConstrNode
+from .constructions.base import BaseConstructionMethods
+from .constructions.cognate import CognateConstructionMethods, \
+    CognateConstruction, WILDCARD
+from .corpus import FixedCorpusWeight
+from .cost import Cost
+from .exception import MorfessorException
+from .utils import _is_string
+
+_logger = logging.getLogger(__name__)
+
+MAGIC = b'MORFCOGN'
+FORMAT_VERSION = 2
+
+# magic, format version and header length
+_PREFIX = struct.Struct('<8sII')
+
+# Kinds of split locations in the analyses
+_LOC_NONE, _LOC_EMPTY, _LOC_SCALAR, _LOC_TUPLE = range(4)
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def is_compact_model_file(file_name):
+    """Return True if the file starts with the compact format magic."""
+    try:
+        with open(file_name, 'rb') as fobj:
+            return fobj.read(len(MAGIC)) == MAGIC
+    except (IOError, OSError):
+        return False
+
+
+class _StringTable(object):
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def add(self, string):
+        try:
+            return self.ids[string]
+        except KeyError:
+            pass
+        if not _is_string(string):
+            raise MorfessorException(
+                "the compact model format only supports string "
+                "constructions, not %r" % (string,))
+        self.ids[string] = len(self.strings)
+        self.strings.append(string)
+        return self.ids[string]
+
+
+class _Writer(object):
+    """Collect the sections of a compact model file."""
+    def __init__(self):
+        self.strings = _StringTable()
+        self.sections = {}
+        self.key_arity = {}
+        self._chunks = []
+        self._size = 0
+
+    def add(self, name, typecode, values):
+        data = array.array(typecode, values).tobytes()
+        self.sections[name] = (typecode, self._size,
+                               len(data) // array.array(typecode).itemsize)
+        padding = _align(len(data)) - len(data)
+        self._chunks.append(data + b'\0' * padding)
+        self._size += len(data) + padding
+
+    def add_string_ids(self, name, strings):
+        self.add(name, 'i', (self.strings.add(s) for s in strings))
+
+    def add_keys(self, name, keys):
+        """Add constructions, which are strings or cognate pairs."""
+        ids = array.array('i')
+        arity = 1
+        for key in keys:
+            if isinstance(key, CognateConstruction):
+                arity = 2
+                ids.extend(-1 if field == WILDCARD else self.strings.add(field)
+                           for field in key)
+            else:
+                ids.append(self.strings.add(key))
+        if len(ids) != arity * len(keys):
+            raise MorfessorException("mixed construction types in %s" % name)
+        self.key_arity[name] = arity
+        self.add(name, 'i', ids)
+
+    def add_strings(self, name, strings):
+        """Add a list of strings as the sections name.offsets and
+        name.text."""
+        offsets = array.array('q', [0])
+        for string in strings:
+            offsets.append(offsets[-1] + len(string))
+        self.add(name + '.offsets', 'q', offsets)
+        self.add(name + '.text', 'B', ''.join(strings).encode('utf-8'))
+
+    def add_counter(self, name, counter):
+        self.add_keys(name + '.keys', counter.keys())
+        self.add(name + '.values', 'q', counter.values())
+
+    def write(self, fobj, header):
+        self.add_strings('strings', self.strings.strings)
+
+        header = dict(header, version=FORMAT_VERSION,
+                      byteorder=sys.byteorder, sections=self.sections,
+                      key_arity=self.key_arity)
+        header = json.dumps(header, sort_keys=True).encode('utf-8')
+        fobj.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)))
+        fobj.write(header)
+        fobj.write(b'\0' * (_align(_PREFIX.size + len(header)) -
+                            _PREFIX.size - len(header)))
+        for chunk in self._chunks:
+            fobj.write(chunk)
+
+
+class CompactModelFile(object):
+    """Memory-mapped view of a compact model file.
+
+    The file is mapped copy-on-write: the sections can be modified in
+    place, but the changes are private to the process and never written
+    to the file. Pages that are not modified are shared by all processes
+    that map the file.
+
+    """
+    def __init__(self, file_name):
+        with open(file_name, 'rb') as fobj:
+            self._mmap = mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_COPY)
+        try:
+            magic, version, header_len = _PREFIX.unpack_from(self._mmap)
+            if magic != MAGIC:
+                raise MorfessorException(
+                    "'%s' is not a compact model file" % file_name)
+            if version > FORMAT_VERSION:
+                raise MorfessorException(
+                    "'%s' has unsupported format version %d"
+                    % (file_name, version))
+            self.header = json.loads(
+                self._mmap[_PREFIX.size:_PREFIX.size + header_len]
+                .decode('utf-8'))
+        except (struct.error, ValueError):
+            self._mmap.close()
+            raise MorfessorException(
+                "'%s' is not a valid compact model file" % file_name)
+        except MorfessorException:
+            self._mmap.close()
+            raise
+        self._data = _align(_PREFIX.size + header_len)
+        self._swap = self.header['byteorder'] != sys.byteorder
+
+    def section(self, name):
+        """Return the named section as a sequence of numbers.
+
+        In the native byte order, this is a memoryview of the mapped
+        file. The mapping stays open until all of them are released.
+
+        """
+        typecode, offset, length = self.header['sections'][name]
+        itemsize = array.array(typecode).itemsize
+        start = self._data + offset
+        view = memoryview(self._mmap)[start:start + length * itemsize]
+        if self._swap:
+            values = array.array(typecode, view.tobytes())
+            values.byteswap()
+            return values
+        return view.cast(typecode)
+
+    def strings(self, name='strings'):
+        """Return the list of strings, by default the interned strings."""
+        return _decode_strings(self.section(name + '.text').tobytes(),
+                               self.section(name + '.offsets').tolist())
+
+    def keys(self, name, strings):
+        """Return the list of constructions of a keys section."""
+        ids = self.section(name).tolist()
+        if self.header['key_arity'][name] == 1:
+            return list(map(strings.__getitem__, ids))
+        # the id -1 of WILDCARD indexes the last item
+        fields = list(map((strings + [WILDCARD]).__getitem__, ids))
+        return list(map(tuple.__new__, itertools.repeat(CognateConstruction),
+                        zip(fields[0::2], fields[1::2])))
+
+    def counter(self, name, strings):
+        return dict(zip(self.keys(name + '.keys', strings),
+                        self.section(name + '.values').tolist()))
+
+    def close(self):
+        """Close the file, or leave it to be closed when the sections
+        still in use (e.g. as counts of a model) are released."""
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+
+
+def _decode_strings(data, offsets):
+    text = data.decode('utf-8')
+    return [text[start:end] for start, end in zip(offsets, offsets[1:])]
+
+
+class _LazyEditLexicon(object):
+    """EditLexicon whose tables are built when it is first used.
+
+    Only training uses the edit lexicon, so a model loaded for
+    segmentation never pays for building it. On first use, the object
+    turns into an ordinary EditLexicon.
+
+    """
+    def __init__(self, data, offsets, atoms):
+        self._data = data
+        self._offsets = offsets
+        self._atom_list = atoms
+
+    def _materialize(self):
+        from .cognate import EditLexicon
+        strings = _decode_strings(self._data, self._offsets)
+        atom_ids = {atom: i for i, atom in enumerate(self._atom_list)}
+        del self._data, self._offsets, self._atom_list
+        self.strings = strings
+        self.ids = {edit: i for i, edit in enumerate(strings)}
+        self._atom_ids = atom_ids
+        self._atoms = [tuple(map(atom_ids.__getitem__, edit))
+                       for edit in strings]
+        self.__class__ = EditLexicon
+
+    def __getattr__(self, name):
+        if name.startswith('__') or '_data' not in self.__dict__:
+            raise AttributeError(name)
+        self._materialize()
+        return getattr(self, name)
+
+    def __reduce_ex__(self, protocol):
+        self._materialize()
+        return self.__reduce_ex__(protocol)
+
+
+def _updater_weight(updater, owner):
+    if updater is None:
+        return None
+    if isinstance(updater, FixedCorpusWeight):
+        return updater.weight
+    _logger.warning("The corpus weight updater of the %s is not saved in "
+                    "the compact model format" % owner)
+    return None
+
+
+def _encoding_state(encoding):
+    return {'tokens': encoding.tokens, 'boundaries': encoding.boundaries,
+            'logtokensum': encoding.logtokensum, 'weight': encoding.weight}
+
+
+def _set_encoding_state(encoding, state):
+    for name, value in state.items():
+        setattr(encoding, name, value)
+
+
+def _write_cost(writer, name, cost):
+    writer.add_counter(name + '.counts', cost.counts)
+    writer.add_counter(name + '.atoms', cost._lexicon_coding.atoms)
+    return {'lexicon': _encoding_state(cost._lexicon_coding),
+            'corpus': _encoding_state(cost._corpus_coding),
+            'corpus_weight': _updater_weight(cost._corpus_weight_updater,
+                                             'cost')}
+
+
+def _read_cost(reader, name, cost, state, strings):
+    cost.counts.update(reader.counter(name + '.counts', strings))
+    cost._lexicon_coding.atoms.update(reader.counter(name + '.atoms', strings))
+    _set_encoding_state(cost._lexicon_coding, state['lexicon'])
+    _set_encoding_state(cost._corpus_coding, state['corpus'])
+    if state['corpus_weight'] is not None:
+        cost._corpus_weight_updater = FixedCorpusWeight(state['corpus_weight'])
+
+
+def _write_indexed_cost(writer, name, cost):
+    writer.add(name + '.counts', 'q', cost.counts)
+    writer.add(name + '.atoms', 'q', cost._lexicon_coding.atoms)
+    return {'lexicon': _encoding_state(cost._lexicon_coding),
+            'corpus': _encoding_state(cost._corpus_coding),
+            'num_atoms': cost._lexicon_coding._num_atoms,
+            'corpus_weight': _updater_weight(cost._corpus_weight_updater,
+                                             'cost')}
+
+
+def _read_indexed_cost(reader, name, cost, state):
+    # the counts stay in the mapped file until they grow
+    cost.counts = reader.section(name + '.counts')
+    cost._lexicon_coding.atoms = reader.section(name + '.atoms')
+    cost._lexicon_coding._num_atoms = state['num_atoms']
+    _set_encoding_state(cost._lexicon_coding, state['lexicon'])
+    _set_encoding_state(cost._corpus_coding, state['corpus'])
+    if state.get('corpus_weight') is not None:
+        cost._corpus_weight_updater = FixedCorpusWeight(state['corpus_weight'])
+
+
+def _write_edit_cost(writer, cost):
+    lexicon = cost.cc
+    writer.add_strings('edit.strings', lexicon.strings)
+    # the atoms in the order of their ids
+    writer.add_string_ids('edit.atom_strings', sorted(
+        lexicon._atom_ids, key=lexicon._atom_ids.get))
+    return _write_indexed_cost(writer, 'edit', cost)
+
+
+def _read_edit_cost(reader, cost, state, strings):
+    cost.cc = _LazyEditLexicon(
+        reader.section('edit.strings.text').tobytes(),
+        reader.section('edit.strings.offsets').tolist(),
+        [strings[i] for i in reader.section('edit.atom_strings').tolist()])
+    _read_indexed_cost(reader, 'edit', cost, state)
+
+
+def _write_substrings(writer, substrings):
+    """Write the substring table of a cognate model. The substrings and
+    atoms refer to the shared string table."""
+    writer.add_string_ids('substrings', substrings.strings)
+    writer.add_string_ids('substrings.atoms', substrings.atom_strings())
+
+
+def _read_substrings(reader, substrings, strings):
+    for i in reader.section('substrings.atoms').tolist():
+        substrings.intern_atom(strings[i])
+    for i in reader.section('substrings').tolist():
+        substrings.intern(strings[i])
+
+
+def _write_analyses(writer, analyses, loc_arity):
+    kinds = array.array('b')
+    locs = array.array('q')
+    loc_offsets = array.array('q', [0])
+    for node in analyses.values():
+        splitloc = node.splitloc
+        if splitloc is None:
+            kinds.append(_LOC_NONE)
+        elif isinstance(splitloc, tuple) and not splitloc:
+            kinds.append(_LOC_EMPTY)
+        elif loc_arity == 1 and not isinstance(splitloc, tuple):
+            kinds.append(_LOC_SCALAR)
+            locs.append(splitloc)
+        elif loc_arity > 1 and not isinstance(splitloc[0], tuple):
+            # a single location of several dimensions, e.g. (src, trg)
+            kinds.append(_LOC_SCALAR)
+            locs.extend(splitloc)
+        else:
+            kinds.append(_LOC_TUPLE)
+            for loc in splitloc:
+                if loc_arity == 1:
+                    locs.append(loc)
+                else:
+                    locs.extend(loc)
+        loc_offsets.append(len(locs))
+    writer.add_keys('analyses.keys', analyses.keys())
+    writer.add('analyses.rcounts', 'q', (n.rcount for n in analyses.values()))
+    writer.add('analyses.counts', 'q', (n.count for n in analyses.values()))
+    writer.add('analyses.kinds', 'b', kinds)
+    writer.add('analyses.locs', 'q', locs)
+    writer.add('analyses.loc_offsets', 'q', loc_offsets)
+
+
+def _read_analyses(reader, strings, loc_arity):
+    keys = reader.keys('analyses.keys', strings)
+    rcounts = reader.section('analyses.rcounts').tolist()
+    counts = reader.section('analyses.counts').tolist()
+    kinds = reader.section('analyses.kinds').tolist()
+    locs = reader.section('analyses.locs').tolist()
+    offsets = reader.section('analyses.loc_offsets').tolist()
+    if loc_arity > 1:
+        locs = [tuple(locs[i:i + loc_arity])
+                for i in range(0, len(locs), loc_arity)]
+        offsets = [offset // loc_arity for offset in offsets]
+    analyses = {}
+    for i, key in enumerate(keys):
+        kind = kinds[i]
+        if kind == _LOC_NONE:
+            splitloc = None
+        elif kind == _LOC_EMPTY:
+            splitloc = ()
+        elif kind == _LOC_SCALAR:
+            splitloc = locs[offsets[i]]
+        else:
+            splitloc = tuple(locs[offsets[i]:offsets[i + 1]])
+        analyses[key] = ConstrNode(rcounts[i], counts[i], splitloc)
+    return analyses
+
+
+def write_compact_model(fobj, model):
+    """Write a BaselineModel or CognateModel to a binary file object."""
+    writer = _Writer()
+    header = {'segment_only': model._segment_only,
+              'num_compounds': getattr(model, '_num_compounds', None),
+              'corpus_weight': _updater_weight(model._corpus_weight_updater,
+                                               'model'),
+              'analysis_table': model.analysis_table,
+              'loc_arity': 2 if isinstance(
+                  model.cc, CognateConstructionMethods) else 1}
+    if isinstance(model.cc, CognateConstructionMethods):
+        cost = model.cost
+        header.update(kind='cognate',
+                      align_band=getattr(model, 'align_band', None),
+                      edit_weight=cost.edit_weight,
+                      edit_cache_size=cost.edit_cache.capacity,
+                      costs={'src': _write_indexed_cost(writer, 'src',
+                                                        cost.src_cost),
+                             'trg': _write_indexed_cost(writer, 'trg',
+                                                        cost.trg_cost),
+                             'edit': _write_edit_cost(writer,
+                                                      cost.edit_cost)})
+    elif type(model.cc) is BaseConstructionMethods:
+        nosplit = model.cc._nosplit
+        header.update(kind='baseline',
+                      force_splits=sorted(model.cc._force_splits),
+                      nosplit=nosplit.pattern if nosplit else None,
+                      costs={'cost': _write_cost(writer, 'cost', model.cost)})
+    else:
+        raise MorfessorException(
+            "the compact model format does not support %s"
+            % type(model.cc).__name__)
+    if isinstance(model.cc, CognateConstructionMethods):
+        _write_substrings(writer, model.cost.substrings)
+    _write_analyses(writer, model._analyses, header['loc_arity'])
+    writer.write(fobj, header)
+
+
+def _read_model(reader):
+    header = reader.header
+    strings = reader.strings()
+    costs = header['costs']
+    if header['kind'] == 'cognate':
+        from .cognate import CognateModel, SubstringCost, _intern_cost
+        model = CognateModel(align_band=header['align_band'],
+                             edit_cache_size=header['edit_cache_size'])
+        model.cost.edit_weight = header['edit_weight']
+        if 'substrings' in header['sections']:
+            _read_substrings(reader, model.cost.substrings, strings)
+            _read_indexed_cost(reader, 'src', model.cost.src_cost,
+                               costs['src'])
+            _read_indexed_cost(reader, 'trg', model.cost.trg_cost,
+                               costs['trg'])
+        else:
+            # format version 1, with the src and trg counts by string
+            for name in ('src', 'trg'):
+                cost = Cost(model.cc)
+                _read_cost(reader, name, cost, costs[name], strings)
+                setattr(model.cost, name + '_cost',
+                        _intern_cost(cost,
+                                     SubstringCost(model.cost.substrings)))
+        _read_edit_cost(reader, model.cost.edit_cost, costs['edit'], strings)
+    else:
+        cc = BaseConstructionMethods(header['force_splits'],
+                                     header['nosplit'])
+        model = BaselineModel(constr_class=cc)
+        _read_cost(reader, 'cost', model.cost, costs['cost'], strings)
+    if header['corpus_weight'] is not None:
+        model._corpus_weight_updater = FixedCorpusWeight(
+            header['corpus_weight'])
+    else:
+        model._corpus_weight_updater = None
+    model._analyses = _read_analyses(reader, strings, header['loc_arity'])
+    if header.get('analysis_table', 'dict') != 'dict':
+        model._analyses = model._new_analyses(header['analysis_table'],
+                                              model._analyses.items())
+    model._segment_only = header['segment_only']
+    if header['num_compounds'] is not None:
+        model._num_compounds = header['num_compounds']
+    return model
+
+
+def read_compact_model(file_name):
+    """Read a model from a compact model file.
+
+    A compiled segment-only model is returned as a SegmentOnlyModel.
+
+    """
+    reader = CompactModelFile(file_name)
+    try:
+        if reader.header['kind'] == 'segment-only':
+            from .segmentonly import SegmentOnlyModel
+            return SegmentOnlyModel(file_name)
+        return _read_model(reader)
+    finally:
+        reader.close()
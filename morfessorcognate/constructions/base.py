@@ -28,6 +28,24 @@ class BaseConstructionMethods(object):
                 continue
             yield i
 
+    def split_lattice(self, construction, maxlen):
+        """Return the search lattice of the Viterbi segmentation.
+
+        Returns (locations, predecessors). The locations are those given
+        by split_locations, preceded and followed by None for the start
+        and the end of the construction. predecessors[j] is a list of
+        (lo, hi) index ranges of the locations from which location j can
+        be reached, limited to the last maxlen of them.
+
+        """
+        locations = [None]
+        locations.extend(self.split_locations(construction))
+        locations.append(None)
+        predecessors = [None]
+        predecessors.extend([(max(0, j - maxlen), j)]
+                            for j in range(1, len(locations)))
+        return locations, predecessors
+
     @staticmethod
     def split(construction, loc):
         assert 0 < loc < len(construction)
@@ -80,4 +98,4 @@ class BaseConstructionMethods(object):
 
     @classmethod
     def is_atom(cls, construction):
-        return len(cls.corpus_key(construction) == 1)
+        return len(cls.corpus_key(construction)) == 1
@@ -3,6 +3,8 @@
 import collections
 from functools import total_ordering
 
+from .parallel import grid_lattice
+
 # use a (rare) unicode pipe as delimiter rather than the common slash
 DELIM = '￨'
 
@@ -30,6 +32,8 @@ class Wildcard(object):
         return iter([])
 
 WILDCARD = Wildcard()
+# 5-dot punctuation, appended to the words as the end epsilon
+FIVEDOT = '\u2059'
 CognateConstruction = collections.namedtuple(
     "CognateConstruction", ['src', 'trg'])
 
@@ -60,6 +64,18 @@ class CognateConstructionMethods(object):
             for pi in range(start[1] + 1, end[1]):
                 yield (gi, pi)
 
+    @staticmethod
+    def split_lattice(construction, maxlen):
+        height = len(construction.src)
+        width = len(construction.trg)
+
+        def bounds(loc):
+            # a wildcard side does not limit the preceding locations
+            return (height if construction.src == WILDCARD else loc[0],
+                    width if construction.trg == WILDCARD else loc[1])
+
+        return grid_lattice(height, width, maxlen, bounds)
+
     @classmethod
     def _sub_slice(cls, field, start=None, stop=None):
         if field == WILDCARD:
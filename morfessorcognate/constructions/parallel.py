@@ -1,6 +1,48 @@
 import collections
 
 
+def grid_lattice(height, width, maxlen, bounds=None):
+    """Return the Viterbi search lattice of a two-dimensional grid of split
+    locations, in the order of split_locations.
+
+    The locations preceding (i, j) are those inside the rectangle
+    bounds((i, j)) (by default (i, j) itself), and those preceding the end
+    are inside (height, width). See BaseConstructionMethods.split_lattice
+    for the return value.
+
+    """
+    cols = max(width - 1, 0)
+    locations = [None]
+    locations.extend((gi, pi) for gi in range(1, height)
+                     for pi in range(1, width))
+    locations.append(None)
+    predecessors = [None]
+    for loc in locations[1:]:
+        if loc is None:
+            end = (height, width)
+        elif bounds is None:
+            end = loc
+        else:
+            end = bounds(loc)
+        # collect the rows backwards, keeping only the last maxlen
+        ranges = []
+        remaining = maxlen
+        if end[1] > 1:
+            for gi in range(end[0] - 1, 0, -1):
+                if remaining <= 0:
+                    break
+                lo = (gi - 1) * cols + 1
+                hi = lo + end[1] - 1
+                lo = max(lo, hi - remaining)
+                ranges.append((lo, hi))
+                remaining -= hi - lo
+        if remaining > 0:
+            ranges.append((0, 1))
+        ranges.reverse()
+        predecessors.append(ranges)
+    return locations, predecessors
+
+
 class ParallelConstructionMethods(object):
     type = collections.namedtuple("ParallelConstruction", ['graphemes', 'phonemes'])
 
@@ -20,6 +62,11 @@ class ParallelConstructionMethods(object):
             for pi in range(start[1] + 1, end[1]):
                 yield (gi, pi)
 
+    @staticmethod
+    def split_lattice(construction, maxlen):
+        return grid_lattice(len(construction.graphemes),
+                            len(construction.phonemes), maxlen)
+
     @classmethod
     def split(cls, construction, loc):
         assert 0 < loc[0] < len(construction.graphemes)
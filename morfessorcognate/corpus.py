@@ -1,15 +1,116 @@
 """Implementations for corpus and lexicon encoding and weighting"""
 
+import array
 import collections
 import logging
 import math
 import re
 
-from .utils import _progress
+from .utils import _progress, boundary_mask, boundary_scores, \
+    grow_array, picklable_array
 
 _logger = logging.getLogger(__name__)
 
 
+class LogTables(object):
+    """Tables of log(n!) and n * log(n) for integer n.
+
+    The tables grow on demand up to max_size entries. Values for larger n
+    are calculated directly. The instance log_tables is shared by all
+    encodings in the process.
+
+    """
+    # constant used for speeding up logfactorial calculations with Stirling's
+    # approximation
+    _log2pi = math.log(2 * math.pi)
+
+    def __init__(self, max_size=2 ** 20):
+        self.max_size = max_size
+        self.logfactorial = array.array('d')
+        self.nlogn = array.array('d')
+
+    @classmethod
+    def calc_logfactorial(cls, n):
+        """Calculate logarithm of n!.
+
+        For large n (n > 20), use Stirling's approximation.
+
+        """
+        if n < 2:
+            return 0.0
+        if n < 20:
+            if isinstance(n, int):
+                return math.log(math.factorial(n))
+            return math.lgamma(n + 1)
+        logn = math.log(n)
+        return n * logn - n + 0.5 * (logn + cls._log2pi)
+
+    @staticmethod
+    def calc_nlogn(n):
+        """Calculate n * log(n), defined as 0 for n < 2."""
+        if n > 1:
+            return n * math.log(n)
+        return 0.0
+
+    def _grow(self, n):
+        """Grow the tables to include n, if it is below max_size."""
+        size = min(self.max_size, max(n + 1, 2 * len(self.nlogn), 1024))
+        for i in range(len(self.nlogn), size):
+            self.logfactorial.append(self.calc_logfactorial(i))
+            self.nlogn.append(self.calc_nlogn(i))
+        return n < size
+
+    def get_logfactorial(self, n):
+        if n < len(self.logfactorial) or self._grow(n):
+            return self.logfactorial[n]
+        return self.calc_logfactorial(n)
+
+    def get_nlogn(self, n):
+        if n < len(self.nlogn) or self._grow(n):
+            return self.nlogn[n]
+        return self.calc_nlogn(n)
+
+
+log_tables = LogTables()
+
+
+def _calculate(func, n):
+    """Return func(n) for a count n that is not in the tables."""
+    if n < 0:
+        raise ValueError("negative count %r" % (n,))
+    return func(n)
+
+
+def logfactorial(n):
+    """Return log(n!) for a count n >= 0.
+
+    Integer counts are looked up from the shared tables, and other counts
+    (e.g. weighted ones) are calculated directly.
+
+    """
+    if type(n) is not int or n < 0:
+        return _calculate(LogTables.calc_logfactorial, n)
+    try:
+        return log_tables.logfactorial[n]
+    except IndexError:
+        return log_tables.get_logfactorial(n)
+
+
+def nlogn(n):
+    """Return n * log(n) for a count n >= 0.
+
+    Integer counts are looked up from the shared tables, and other counts
+    (e.g. weighted ones) are calculated directly.
+
+    """
+    if type(n) is not int or n < 0:
+        return _calculate(LogTables.calc_nlogn, n)
+    try:
+        return log_tables.nlogn[n]
+    except IndexError:
+        return log_tables.get_nlogn(n)
+
+
 class Encoding(object):
     """Base class for calculating the entropy (encoding length) of a corpus
     or lexicon.
@@ -17,6 +118,11 @@ class Encoding(object):
     Commonly subclassed to redefine specific methods.
 
     """
+    # State of the encoding when the cost was last calculated, and the cost.
+    # Class attributes, so that also unpickled old encodings have them.
+    _cost_state = None
+    _cost = 0.0
+
     def __init__(self, weight=1.0):
         """Initizalize class
 
@@ -28,10 +134,6 @@ class Encoding(object):
         self.boundaries = 0
         self.weight = weight
 
-    # constant used for speeding up logfactorial calculations with Stirling's
-    # approximation
-    _log2pi = math.log(2 * math.pi)
-
     @property
     def types(self):
         """Define number of types as 0. types is made a property method to
@@ -45,51 +147,82 @@ class Encoding(object):
         """Calculate logarithm of n!.
 
         For large n (n > 20), use Stirling's approximation.
+        The values are looked up from the shared log_tables.
 
         """
         if n < 2:
             return 0.0
-        if n < 20:
-            return math.log(math.factorial(n))
-        logn = math.log(n)
-        return n * logn - n + 0.5 * (logn + cls._log2pi)
+        return logfactorial(n)
+
+    @staticmethod
+    def _nlogn(n):
+        """Return the contribution of count n to logtokensum."""
+        if n > 1:
+            return nlogn(n)
+        return 0.0
 
-    def frequency_distribution_cost(self):
+    def frequency_distribution_cost(self, tokens=None, types=None):
         """Calculate -log[(u - 1)! (v - u)! / (v - 1)!]
 
         v is the number of tokens+boundaries and u the number of types
 
         """
-        if self.types < 2:
+        if types is None:
+            types = self.types
+        if types < 2:
             return 0.0
-        tokens = self.tokens + self.boundaries
+        if tokens is None:
+            tokens = self.tokens + self.boundaries
         return (self._logfactorial(tokens - 1) -
-                self._logfactorial(self.types - 1) -
-                self._logfactorial(tokens - self.types))
+                self._logfactorial(types - 1) -
+                self._logfactorial(tokens - types))
 
-    def permutations_cost(self):
+    def permutations_cost(self, boundaries=None):
         """The permutations cost for the encoding."""
-        return -self._logfactorial(self.boundaries)
+        if boundaries is None:
+            boundaries = self.boundaries
+        return -self._logfactorial(boundaries)
 
     def update_count(self, construction, old_count, new_count):
         """Update the counts in the encoding."""
         self.tokens += new_count - old_count
         if old_count > 1:
-            self.logtokensum -= old_count * math.log(old_count)
+            self.logtokensum -= nlogn(old_count)
         if new_count > 1:
-            self.logtokensum += new_count * math.log(new_count)
+            self.logtokensum += nlogn(new_count)
 
-    def get_cost(self):
-        """Calculate the cost for encoding the corpus/lexicon"""
-        if self.boundaries == 0:
+    def get_cost(self, dtokens=0, dboundaries=0, dlogtokensum=0.0, dtypes=0):
+        """Calculate the cost for encoding the corpus/lexicon.
+
+        The optional arguments give changes to the tokens, boundaries,
+        logtokensum and types of the encoding. The cost is then calculated
+        as if the changes had been applied, without modifying the encoding.
+
+        The cost of the current state is cached, and only recalculated
+        if tokens, boundaries, logtokensum, weight or types have changed.
+
+        """
+        if dtokens or dboundaries or dlogtokensum or dtypes:
+            return self._calc_cost(dtokens, dboundaries, dlogtokensum, dtypes)
+        state = (self.tokens, self.boundaries, self.logtokensum,
+                 self.weight, self.types)
+        if state != self._cost_state:
+            self._cost = self._calc_cost(0, 0, 0.0, 0)
+            self._cost_state = state
+        return self._cost
+
+    def _calc_cost(self, dtokens, dboundaries, dlogtokensum, dtypes):
+        """Calculate the cost after the given changes, see get_cost."""
+        boundaries = self.boundaries + dboundaries
+        if boundaries == 0:
             return 0.0
 
-        n = self.tokens + self.boundaries
-        return ((n * math.log(n)
-                 - self.boundaries * math.log(self.boundaries)
-                 - self.logtokensum
-                 + self.permutations_cost()) * self.weight
-                + self.frequency_distribution_cost())
+        n = self.tokens + dtokens + boundaries
+        return ((nlogn(n)
+                 - nlogn(boundaries)
+                 - (self.logtokensum + dlogtokensum)
+                 + self.permutations_cost(boundaries)) * self.weight
+                + self.frequency_distribution_cost(n, self.types + dtypes))
 
 
 class CorpusEncoding(Encoding):
@@ -111,31 +244,41 @@ class CorpusEncoding(Encoding):
         """
         return self.lexicon_encoding.boundaries + 1
 
-    def frequency_distribution_cost(self):
+    def frequency_distribution_cost(self, tokens=None, types=None):
         """Calculate -log[(M - 1)! (N - M)! / (N - 1)!] for M types and N
         tokens.
 
         """
-        if self.types < 2:
+        if types is None:
+            types = self.types
+        if types < 2:
             return 0.0
-        tokens = self.tokens
+        if tokens is None:
+            tokens = self.tokens
         return (self._logfactorial(tokens - 1) -
-                self._logfactorial(self.types - 2) -
-                self._logfactorial(tokens - self.types + 1))
+                self._logfactorial(types - 2) -
+                self._logfactorial(tokens - types + 1))
 
-    def get_cost(self):
-        """Override for the Encoding get_cost function. A corpus does not
+    def _calc_cost(self, dtokens, dboundaries, dlogtokensum, dtypes):
+        """Override for the Encoding cost calculation. A corpus does not
         have a permutation cost
 
+        The arguments are changes to be applied hypothetically, as in
+        Encoding.get_cost. Here dtypes is the change in the number of
+        lexicon boundaries.
+
         """
-        if self.boundaries == 0:
+        boundaries = self.boundaries + dboundaries
+        if boundaries == 0:
             return 0.0
 
-        n = self.tokens + self.boundaries
-        return ((n * math.log(n)
-                 - self.boundaries * math.log(self.boundaries)
-                 - self.logtokensum) * self.weight
-                + self.frequency_distribution_cost())
+        tokens = self.tokens + dtokens
+        n = tokens + boundaries
+        return ((nlogn(n)
+                 - nlogn(boundaries)
+                 - (self.logtokensum + dlogtokensum)) * self.weight
+                + self.frequency_distribution_cost(tokens,
+                                                   self.types + dtypes))
 
 
 class AnnotatedCorpusEncoding(Encoding):
@@ -264,6 +407,41 @@ class LexiconEncoding(Encoding):
             self.atoms[atom] = c - 1
             self.update_count(atom, c, c - 1)
 
+    def get_deltas(self, added, removed):
+        """Return the changes to (tokens, boundaries, logtokensum, types)
+        caused by adding and removing the given constructions.
+
+        The lexicon itself is not modified. The result can be passed to
+        get_cost to get the cost after the change.
+
+        """
+        atom_deltas = collections.Counter()
+        for construction in added:
+            atom_deltas.update(construction)
+        for construction in removed:
+            atom_deltas.subtract(construction)
+
+        dtokens = 0
+        dlogtokensum = 0.0
+        dtypes = 0
+        for atom, delta in atom_deltas.items():
+            if delta == 0:
+                continue
+            old = self._atom_count(atom)
+            if old is None:
+                # atoms are never deleted by remove, only added
+                dtypes += 1
+                old = 0
+            new = old + delta
+            dtokens += delta
+            dlogtokensum += self._nlogn(new) - self._nlogn(old)
+        return dtokens, len(added) - len(removed), dlogtokensum, dtypes
+
+    def _atom_count(self, atom):
+        """Return the count of the atom, or None if the atom has never
+        been in the lexicon."""
+        return self.atoms.get(atom)
+
     def get_codelength(self, construction):
         """Return an approximate codelength for new construction."""
         l = len(construction) + 1
@@ -278,6 +456,84 @@ class LexiconEncoding(Encoding):
         return cost
 
 
+class IndexedLexiconEncoding(LexiconEncoding):
+    """Lexicon encoding for constructions that are sequences of integer
+    atom ids.
+
+    The atom counts are stored in an array indexed by the atom id, with -1
+    marking ids that have never been in the lexicon. The array may also be
+    a memoryview of a compact model file, which is copied when it grows.
+
+    """
+
+    def __init__(self):
+        super(IndexedLexiconEncoding, self).__init__()
+        self.atoms = array.array('q')
+        self._num_atoms = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['atoms'] = picklable_array(self.atoms)
+        return state
+
+    @property
+    def types(self):
+        """Return the number of different atoms in the lexicon + 1 for the
+        compound-end-token
+
+        """
+        return self._num_atoms + 1
+
+    def add(self, construction):
+        """Add a construction to the lexicon, updating automatically the
+        count for its atoms
+
+        """
+        self.boundaries += 1
+        atoms = self.atoms
+        for atom in construction:
+            if atom >= len(atoms):
+                atoms = self.atoms = grow_array(atoms, atom + 1, -1)
+            c = atoms[atom]
+            if c < 0:
+                self._num_atoms += 1
+                c = 0
+            atoms[atom] = c + 1
+            self.update_count(atom, c, c + 1)
+
+    def remove(self, construction):
+        """Remove construction from the lexicon, updating automatically the
+        count for its atoms
+
+        """
+        self.boundaries -= 1
+        atoms = self.atoms
+        for atom in construction:
+            c = atoms[atom]
+            atoms[atom] = c - 1
+            self.update_count(atom, c, c - 1)
+
+    def _atom_count(self, atom):
+        if 0 <= atom < len(self.atoms) and self.atoms[atom] >= 0:
+            return self.atoms[atom]
+        return None
+
+    def get_codelength(self, construction, length=None):
+        """Return an approximate codelength for new construction.
+
+        If length is given, it is used as the length of the construction
+        (e.g. of the string whose atom ids the construction holds).
+
+        """
+        l = (len(construction) if length is None else length) + 1
+        cost = l * math.log(self.tokens + l)
+        cost -= math.log(self.boundaries + 1)
+        for atom in construction:
+            c = self._atom_count(atom)
+            cost -= math.log(max(1, c) if c is not None else 1)
+        return cost
+
+
 class CorpusWeight(object):
     @classmethod
     def move_direction(cls, model, direction, epoch):
@@ -473,34 +729,32 @@ class AnnotationCorpusWeight(CorpusWeight):
 
         return self.move_direction(model, d, epoch)
 
+    @staticmethod
+    def _boundary_masks(segmentations):
+        """Return the alternative segmentations of each word as lists of
+        boundary masks."""
+        return [[boundary_mask(seg) for seg in alternatives]
+                for alternatives in segmentations]
+
     @classmethod
     def _boundary_recall(cls, prediction, reference):
         """Calculate average boundary recall for given segmentations."""
-        rec_total = 0
-        rec_sum = 0.0
-        for pre_list, ref_list in zip(prediction, reference):
-            best = -1
-            for ref in ref_list:
-                # list of internal boundary positions
-                ref_b = set(segmentation_to_splitloc(ref))
-                if len(ref_b) == 0:
-                    best = 1.0
-                    break
-                for pre in pre_list:
-                    pre_b = set(segmentation_to_splitloc(pre))
-                    r = len(ref_b.intersection(pre_b)) / float(len(ref_b))
-                    if r > best:
-                        best = r
-            if best >= 0:
-                rec_sum += best
-                rec_total += 1
-        return rec_sum, rec_total
+        recalls = boundary_scores(cls._boundary_masks(prediction),
+                                  cls._boundary_masks(reference))[0]
+        return cls._score_sum(recalls)
+
+    @staticmethod
+    def _score_sum(scores):
+        scores = [s for s in scores if s is not None]
+        return sum(scores), len(scores)
 
     @classmethod
     def _bpr_evaluation(cls, prediction, reference):
         """Return boundary precision, recall, and F-score for segmentations."""
-        rec_s, rec_t = cls._boundary_recall(prediction, reference)
-        pre_s, pre_t = cls._boundary_recall(reference, prediction)
+        recalls, precisions = boundary_scores(cls._boundary_masks(prediction),
+                                              cls._boundary_masks(reference))
+        rec_s, rec_t = cls._score_sum(recalls)
+        pre_s, pre_t = cls._score_sum(precisions)
         rec = rec_s / rec_t
         pre = pre_s / pre_t
         f = 2.0 * pre * rec / (pre + rec)
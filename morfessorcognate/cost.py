@@ -41,8 +41,48 @@ class Cost(object):
     def set_corpus_coding_weight(self, weight):
         self._corpus_coding.weight = weight
 
-    def cost(self):
-        return self._lexicon_coding.get_cost() + self._corpus_coding.get_cost()
+    def cost(self, deltas=None):
+        """Return the total cost of the lexicon and corpus.
+
+        If deltas is given, it should be a mapping from constructions to
+        count changes. The cost is then calculated as if the counts had
+        been changed, without modifying the counts or the encodings.
+
+        """
+        if not deltas:
+            return self._lexicon_coding.get_cost() + \
+                self._corpus_coding.get_cost()
+        return self._delta_cost(
+            ((construction, self.counts[construction], delta)
+             for construction, delta in deltas.items() if delta != 0),
+            self.cc.lex_key)
+
+    def _delta_cost(self, changes, lex_key):
+        """Return the cost after the changes, which are (construction,
+        old count, delta) triples. lex_key gives the lexicon keys of
+        constructions that are added or removed."""
+        dtokens = 0
+        dlogtokensum = 0.0
+        added = []
+        removed = []
+        for construction, old_count, delta in changes:
+            new_count = old_count + delta
+            dtokens += delta
+            dlogtokensum += (self._corpus_coding._nlogn(new_count) -
+                             self._corpus_coding._nlogn(old_count))
+            if old_count == 0:
+                added.append(lex_key(construction))
+            elif new_count == 0:
+                removed.append(lex_key(construction))
+
+        if added or removed:
+            lex_deltas = self._lexicon_coding.get_deltas(added, removed)
+        else:
+            # the lexicon is unchanged, and its cached cost can be used
+            lex_deltas = (0, 0, 0.0, 0)
+        return (self._lexicon_coding.get_cost(*lex_deltas) +
+                self._corpus_coding.get_cost(dtokens, 0, dlogtokensum,
+                                             lex_deltas[1]))
 
     def update(self, construction, delta):
         if delta == 0:
@@ -1,5 +1,15 @@
 from collections import Counter, namedtuple
 from random import random
+import collections
+import heapq
+import itertools
+import logging
+import multiprocessing
+import operator
+import pickle
+import tempfile
+
+_logger = logging.getLogger(__name__)
 
 
 DataPoint = namedtuple('DataPoint', ['count', 'compound', 'splitlocs'])
@@ -16,6 +26,144 @@ def merge_counts(data):
     for v in sorted(store.values()):
         yield v
 
+
+def _write_run(items, tmpdir, batch_size=10000):
+    """Write the items to a temporary file in pickled batches."""
+    run = tempfile.TemporaryFile(dir=tmpdir)
+    for i in range(0, len(items), batch_size):
+        pickle.dump(items[i:i + batch_size], run, pickle.HIGHEST_PROTOCOL)
+    run.seek(0)
+    return run
+
+
+def _read_run(run):
+    """Yield the items of a run written by _write_run, and close it."""
+    try:
+        while True:
+            try:
+                batch = pickle.load(run)
+            except EOFError:
+                return
+            for item in batch:
+                yield item
+    finally:
+        run.close()
+
+
+def external_sort(items, max_items=1000000, key=None, tmpdir=None):
+    """Sort items in bounded memory.
+
+    At most max_items items are sorted in memory at a time. Larger
+    inputs are spilled to temporary files in sorted runs, which are then
+    merged. The sort is stable, as sorted is.
+
+    """
+    runs = []
+    items = iter(items)
+    while True:
+        chunk = list(itertools.islice(items, max_items))
+        chunk.sort(key=key)
+        if len(chunk) < max_items and not runs:
+            # fits in memory
+            for item in chunk:
+                yield item
+            return
+        if chunk:
+            runs.append(_write_run(chunk, tmpdir))
+        if len(chunk) < max_items:
+            break
+    _logger.debug("Merging %s sorted runs", len(runs))
+    for item in heapq.merge(*[_read_run(run) for run in runs], key=key):
+        yield item
+
+
+def _count_chunk(chunk):
+    """Return the DataPoints of the chunk with the counts of the same
+    compounds summed, as in merge_counts, in the order of first
+    occurrence."""
+    store = {}
+    for dp in chunk:
+        old = store.get(dp.compound)
+        if old is None:
+            store[dp.compound] = dp
+        else:
+            store[dp.compound] = dp._replace(count=old.count + dp.count)
+    return list(store.values())
+
+
+def _counted_chunks(data, jobs, chunk_size):
+    """Yield the DataPoints of data counted in chunks, in order."""
+    chunks = iter(lambda: list(itertools.islice(data, chunk_size)), [])
+    if jobs <= 1:
+        for chunk in chunks:
+            yield _count_chunk(chunk)
+        return
+    # only a few chunks per worker are read ahead, to bound the memory
+    pool = multiprocessing.Pool(jobs)
+    try:
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(_count_chunk, (chunk,)))
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        pool.terminate()
+
+
+def external_merge_counts(data, max_items=1000000, tmpdir=None, jobs=1,
+                          chunk_size=100000):
+    """Merge the counts of the same compounds in bounded memory.
+
+    Yields the same DataPoints in the same order as merge_counts: the
+    counts are summed, the split locations are those of the last
+    occurrence, and the result is sorted. At most max_items compounds are
+    counted in memory at a time. When there are more, the counts are
+    spilled to temporary files (in tmpdir) in runs sorted by compound,
+    which are then merged and sorted with external_sort.
+
+    With jobs > 1, the data is counted in chunks of chunk_size by a pool
+    of worker processes before it is merged. Up to 2 * jobs chunks are
+    read ahead, so chunk_size is reduced to keep them within max_items
+    in total.
+
+    """
+    data = iter(data)
+    if jobs > 1:
+        chunk_size = min(chunk_size, max(1, max_items // (2 * jobs)))
+    runs = []
+    store = {}
+    for counted in _counted_chunks(data, jobs, chunk_size):
+        for dp in counted:
+            old = store.get(dp.compound)
+            if old is None:
+                store[dp.compound] = dp
+                if len(store) >= max_items:
+                    runs.append(_write_run(
+                        sorted(store.values(), key=operator.itemgetter(1)),
+                        tmpdir))
+                    store = {}
+            else:
+                store[dp.compound] = dp._replace(count=old.count + dp.count)
+    if not runs:
+        for dp in sorted(store.values()):
+            yield dp
+        return
+
+    if store:
+        runs.append(_write_run(sorted(store.values(),
+                                      key=operator.itemgetter(1)), tmpdir))
+    _logger.info("Merging counts from %s runs", len(runs))
+    # the merge is stable, so the last run of a compound comes last
+    merged = heapq.merge(*[_read_run(run) for run in runs],
+                         key=operator.itemgetter(1))
+    totals = (dps[-1]._replace(count=sum(dp.count for dp in dps))
+              for dps in (list(group) for _, group in itertools.groupby(
+                  merged, operator.itemgetter(1))))
+    for dp in external_sort(totals, max_items, tmpdir=tmpdir):
+        yield dp
+
 def freq_threshold(data, threshold, online=False):
     if online:
         counts = Counter()
@@ -6,6 +6,9 @@ from itertools import chain, product
 import math
 import random
 
+from .parallel import segment_many
+from .utils import boundary_mask, boundary_scores
+
 _logger = logging.getLogger(__name__)
 
 EvaluationConfig = collections.namedtuple('EvaluationConfig',
@@ -111,10 +114,13 @@ class MorfessorEvaluation(object):
     """
     def __init__(self, reference_annotations):
         self.reference = {}
+        self._reference_masks = {}
 
         for compound, analyses in reference_annotations.items():
             self.reference[compound] = list(
                 tuple(self._segmentation_indices(a)) for a in analyses)
+            self._reference_masks[compound] = [boundary_mask(a)
+                                               for a in analyses]
 
         self._samples = {}
 
@@ -146,29 +152,22 @@ class MorfessorEvaluation(object):
         return self._samples[configuration]
 
     def _evaluate(self, prediction):
-        """Helper method to get the precision and recall of 1 sample"""
-        def calc_prop_distance(ref, pred):
-            if len(ref) == 0:
-                return 1.0
-            diff = len(set(ref) - set(pred))
-            return (len(ref) - diff) / float(len(ref))
-
-        wordlist = sorted(set(prediction.keys()) & set(self.reference.keys()))
+        """Helper method to get the precision and recall of 1 sample.
 
-        recall_sum = 0.0
-        precis_sum = 0.0
+        The prediction maps each compound to a list of boundary masks.
 
-        for word in wordlist:
-            if len(word) < 2:
-                continue
+        """
+        wordlist = sorted(set(prediction.keys()) &
+                          set(self._reference_masks.keys()))
 
-            recall_sum += max(calc_prop_distance(r, p)
-                              for p, r in product(prediction[word],
-                                                  self.reference[word]))
+        # words shorter than two atoms count as zero in the averages
+        words = [word for word in wordlist if len(word) >= 2]
+        predicted = [prediction[word] for word in words]
+        reference = [self._reference_masks[word] for word in words]
 
-            precis_sum += max(calc_prop_distance(p, r)
-                              for p, r in product(prediction[word],
-                                                  self.reference[word]))
+        recalls, precisions = boundary_scores(predicted, reference)
+        recall_sum = sum(recalls)
+        precis_sum = sum(precisions)
 
         precision = precis_sum / len(wordlist)
         recall = recall_sum / len(wordlist)
@@ -184,29 +183,52 @@ class MorfessorEvaluation(object):
             cur_len += len(a)
             yield cur_len
 
-    def evaluate_model(self, model, configuration=EvaluationConfig(10, 1000),
-                       meta_data=None):
-        """Get the prediction of the test samples from the model and do the
-        evaluation
+    def segment_samples(self, model, configuration=EvaluationConfig(10, 1000),
+                        segmentation=None, jobs=1):
+        """Segment the compounds in the test samples with the model.
 
-        The meta_data object has preferably at least the key 'name'.
+        Returns a dict {compound: constructions} of the union of the
+        samples, in which each compound is segmented only once with
+        model.viterbi_segment, by a pool of jobs worker processes if
+        jobs > 1. The compounds found in the mapping segmentation are not
+        segmented again.
 
         """
-        if meta_data is None:
-            meta_data = {'name': 'UNKNOWN'}
+        if segmentation is None:
+            segmentation = {}
+        compounds = sorted(set(chain.from_iterable(
+            self.get_samples(configuration))))
+        result = {}
+        missing = []
+        for compound in compounds:
+            if compound in segmentation:
+                result[compound] = segmentation[compound]
+            else:
+                missing.append(compound)
+        _logger.debug("Segmenting {} of {} sampled compounds".format(
+            len(missing), len(compounds)))
+        for compound, (constructions, _) in zip(
+                missing, segment_many(model, missing, jobs=jobs)):
+            result[compound] = constructions
+        return result
 
-        mer = MorfessorEvaluationResult(meta_data)
+    def evaluate_model(self, model, configuration=EvaluationConfig(10, 1000),
+                       meta_data=None, segmentation=None, jobs=1):
+        """Get the prediction of the test samples from the model and do the
+        evaluation
 
-        for i, sample in enumerate(self.get_samples(configuration)):
-            _logger.debug("Evaluating sample {}".format(i))
-            prediction = {}
-            for compound in sample:
-                prediction[compound] = [tuple(self._segmentation_indices(
-                    model.viterbi_segment(compound)[0]))]
+        The compounds are segmented with segment_samples, which can reuse
+        the mapping {compound: constructions} given as segmentation, and
+        segments each compound only once even if the samples overlap.
 
-            mer.add_data_point(*self._evaluate(prediction))
+        The meta_data object has preferably at least the key 'name'.
 
-        return mer
+        """
+        segmentation = self.segment_samples(model, configuration,
+                                            segmentation, jobs)
+        predictions = {compound: [boundary_mask(constructions)]
+                       for compound, constructions in segmentation.items()}
+        return self._evaluate_samples(predictions, configuration, meta_data)
 
     def evaluate_segmentation(self, segmentation,
                               configuration=EvaluationConfig(10, 1000),
@@ -219,10 +241,14 @@ class MorfessorEvaluation(object):
                 compound = compound + constructions[i]
             return compound
 
-        segmentation = {merge_constructions(x[1]):
-                        [tuple(self._segmentation_indices(x[1]))]
+        segmentation = {merge_constructions(x[1]): [boundary_mask(x[1])]
                         for x in segmentation}
 
+        return self._evaluate_samples(segmentation, configuration, meta_data)
+
+    def _evaluate_samples(self, predictions, configuration, meta_data):
+        """Evaluate each sample with the predicted boundary masks
+        {compound: [mask]} of its compounds"""
         if meta_data is None:
             meta_data = {'name': 'UNKNOWN'}
 
@@ -231,7 +257,8 @@ class MorfessorEvaluation(object):
         for i, sample in enumerate(self.get_samples(configuration)):
             _logger.debug("Evaluating sample {}".format(i))
 
-            prediction = {k: v for k, v in segmentation.items() if k in sample}
+            prediction = {k: predictions[k] for k in sample
+                          if k in predictions}
             mer.add_data_point(*self._evaluate(prediction))
 
         return mer
@@ -1,24 +1,177 @@
 import bz2
 import codecs
+import collections
 import datetime
+import gc
 import gzip
+import hashlib
+import io
+import itertools
+import json
 import locale
 import logging
+import lzma
+import math
+import multiprocessing
+import os
+import pickle
 import re
 import sys
+import tempfile
 
 from . import get_version
 from . import utils
+from .constructions.cognate import CognateConstructionMethods, FIVEDOT, \
+    WILDCARD
+from .data import DataPoint
+from .exception import MorfessorException
 
-try:
-    # In Python2 import cPickle for better performance
-    import cPickle as pickle
-except ImportError:
-    import pickle
+_logger = logging.getLogger(__name__)
 
-PY3 = sys.version_info[0] == 3
+# Number of bytes from the start of a file used to detect its encoding
+ENCODING_SAMPLE_SIZE = 1 << 20
 
-_logger = logging.getLogger(__name__)
+# Size hint (in characters) of the blocks of lines read at a time
+READ_LINES_HINT = 1 << 16
+
+# Openers of compressed files by file name extension
+COMPRESSED_OPENERS = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open,
+                      '.lzma': lzma.open}
+
+# Largest byte range of an uncompressed file counted by one worker process
+COUNT_PART_SIZE = 1 << 24
+
+# Frequency dampening functions of read_cognate_data_file
+DAMPENINGS = {
+    'none': lambda count: count,
+    'log': lambda count: int(round(math.log(count + 1, 2))),
+    'ones': lambda count: 1,
+}
+
+
+def open_binary_file(file_name, mode='rb'):
+    """Open a file in binary mode, decompressing or compressing it if
+    the file name ends with .gz, .bz2, .xz or .lzma."""
+    for extension, opener in COMPRESSED_OPENERS.items():
+        if file_name.endswith(extension):
+            return opener(file_name, mode)
+    return open(file_name, mode)
+
+
+def _decodes(sample, encoding):
+    """Return True if the sample, which may end in the middle of a
+    character, can be decoded with the encoding."""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    try:
+        decoder.decode(sample, final=False)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def _line_aligned_parts(file_name, parts, max_part_size=None):
+    """Split an uncompressed file into byte ranges that start at lines.
+
+    Returns a list of (start, end) offsets of at least the given number
+    of parts (if the file has enough lines), each of about the same size
+    but at most max_part_size bytes unless a line is longer.
+
+    """
+    size = os.path.getsize(file_name)
+    part_size = max(1, -(-size // parts))
+    if max_part_size is not None:
+        part_size = min(part_size, max_part_size)
+    bounds = [0]
+    with open(file_name, 'rb') as fobj:
+        while size - bounds[-1] > part_size:
+            fobj.seek(bounds[-1] + part_size)
+            fobj.readline()
+            bounds.append(fobj.tell())
+    if bounds[-1] < size:
+        bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _file_digest(file_name):
+    """Return the SHA-1 hex digest of the contents of a file."""
+    digest = hashlib.sha1()
+    with open(file_name, 'rb') as fobj:
+        for block in iter(lambda: fobj.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cognate_cache_file(file_name, options, cache_dir):
+    """Return the name of the cache file of the data file and options."""
+    key = json.dumps([os.path.abspath(file_name), options], sort_keys=True)
+    return os.path.join(cache_dir, '%s.%s.cache' % (
+        os.path.basename(file_name),
+        hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]))
+
+
+def _read_cognate_cache(cache_file, file_name, source, options):
+    """Return the DataPoints in a cache file, or None if the file does
+    not exist or was made from other data or options.
+
+    The data file is hashed (into source['sha1']) only if its size or
+    modification time differ from those recorded in the cache.
+
+    """
+    from . import compact
+    if not os.path.exists(cache_file):
+        return None
+    try:
+        reader = compact.CompactModelFile(cache_file)
+    except MorfessorException:
+        return None
+    try:
+        header = reader.header
+        if header.get('kind') != 'cognate-data' or \
+           header['options'] != options:
+            return None
+        cached = header['source']
+        if (cached['size'], cached['mtime_ns']) != \
+           (source['size'], source['mtime_ns']):
+            if 'sha1' not in source:
+                source['sha1'] = _file_digest(file_name)
+            if source['sha1'] != cached['sha1']:
+                return None
+        # the collector would scan the many new tuples again and again
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            compounds = reader.keys('data.keys', reader.strings())
+            counts = reader.section('data.values').tolist()
+            return list(map(tuple.__new__, itertools.repeat(DataPoint),
+                            zip(counts, compounds, itertools.repeat(()))))
+        finally:
+            if gc_enabled:
+                gc.enable()
+    finally:
+        reader.close()
+
+
+def _write_cognate_cache(cache_file, data, source, options):
+    """Write the DataPoints to a cache file, replacing it atomically."""
+    from . import compact
+    if 'sha1' not in source:
+        source['sha1'] = _file_digest(source['name'])
+    writer = compact._Writer()
+    writer.add_keys('data.keys', [dp.compound for dp in data])
+    writer.add('data.values', 'q', (dp.count for dp in data))
+    cache_dir = os.path.dirname(cache_file)
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    with tempfile.NamedTemporaryFile(dir=cache_dir, delete=False) as fobj:
+        writer.write(fobj, {'kind': 'cognate-data', 'source': source,
+                            'options': options})
+    os.replace(fobj.name, cache_file)
+
+
+def _count_part(task):
+    """Count a part of a text file in a worker process."""
+    mio, file_name, part, count_lines = task
+    return mio._count_text_part(file_name, part, count_lines)
 
 
 class MorfessorIO(object):
@@ -110,6 +263,105 @@ class MorfessorIO(object):
             for item in self.read_corpus_list_file(file_name):
                 yield item
 
+    def count_corpus_files(self, file_names, jobs=1):
+        """Count the compounds in one or more corpus files.
+
+        Returns a Counter of compound_atoms, in the order of their first
+        occurrence. With jobs > 1, the files, and line-aligned byte
+        ranges of the uncompressed files, are read, split into compounds
+        and counted in that many worker processes.
+
+        """
+        return self._count_files(file_names, '_count_corpus_lines', jobs)
+
+    def count_corpus_list_files(self, file_names, jobs=1):
+        """Count the compounds in one or more corpus list files.
+
+        Returns a Counter of compound_atoms with the summed counts, read
+        in parallel as in count_corpus_files.
+
+        """
+        return self._count_files(file_names, '_count_corpus_list_lines',
+                                 jobs)
+
+    def count_cognate_files(self, file_names, jobs=1):
+        """Count the rows of one or more cognate pair files.
+
+        Each line has the format:
+        <count>\t<src>\t<trg>
+        where either side may be empty.
+
+        Returns a Counter of (count, src, trg) with the number of lines of
+        each, in the order of their first occurrence, read in parallel as
+        in count_corpus_files.
+
+        """
+        return self._count_files(file_names, '_count_cognate_lines', jobs)
+
+    def read_cognate_data_file(self, file_name, use_epsilon=True,
+                               dampening='log', cache_dir=None, jobs=1):
+        """Read a cognate pair file as training data.
+
+        Each line has the format:
+        <count>\t<src>\t<trg>
+
+        Returns a list of DataPoints of CognateConstructions. An empty
+        side becomes WILDCARD, and FIVEDOT is appended to the other sides
+        if use_epsilon is True. The counts are dampened with one of
+        DAMPENINGS, and the rows of the same pair are summed in the order
+        of their first occurrence.
+
+        If cache_dir is given, the data is cached there in the compact
+        binary format, and read from the cache on later calls with the
+        same options, reading settings of this object and file
+        contents.
+
+        """
+        if dampening not in DAMPENINGS:
+            raise MorfessorException(
+                "unknown dampening type '%s'" % dampening)
+        options = {'use_epsilon': use_epsilon, 'dampening': dampening,
+                   'lowercase': self.lowercase,
+                   'comment_start': self.comment_start,
+                   'encoding': self.encoding}
+        if cache_dir is not None:
+            cache_file = _cognate_cache_file(file_name, options, cache_dir)
+            stat = os.stat(file_name)
+            source = {'name': os.path.abspath(file_name),
+                      'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+            data = _read_cognate_cache(cache_file, file_name, source,
+                                       options)
+            if data is not None:
+                _logger.info("Read cognate data from cache '%s'" %
+                             cache_file)
+                if 'sha1' in source:
+                    # the file was touched, record its new stat
+                    _write_cognate_cache(cache_file, data, source, options)
+                return data
+
+        dampfunc = DAMPENINGS[dampening]
+        counts = collections.OrderedDict()
+        rows = self.count_cognate_files([file_name], jobs)
+        for (count, src, trg), lines in rows.items():
+            if len(src) == 0:
+                src = WILDCARD
+            elif use_epsilon:
+                src += FIVEDOT
+            if len(trg) == 0:
+                trg = WILDCARD
+            elif use_epsilon:
+                trg += FIVEDOT
+            compound = CognateConstructionMethods.type(src, trg)
+            # repeated rows are dampened separately
+            counts[compound] = counts.get(compound, 0) + \
+                dampfunc(count) * lines
+        data = [DataPoint(count, compound, ())
+                for compound, count in counts.items()]
+        if cache_dir is not None:
+            _write_cognate_cache(cache_file, data, source, options)
+            _logger.info("Cached cognate data in '%s'" % cache_file)
+        return data
+
     def read_corpus_file(self, file_name, retain_newlines=True):
         """Read one corpus file.
 
@@ -183,12 +435,23 @@ class MorfessorIO(object):
         _logger.info("Done.")
 
     def read_binary_model_file(self, file_name):
-        """Read a pickled model from file."""
+        """Read a pickled model or a compact model from file."""
+        from . import compact
+        if compact.is_compact_model_file(file_name):
+            return self.read_compact_model_file(file_name)
         _logger.info("Loading model from '%s'..." % file_name)
         model = self.read_binary_file(file_name)
         _logger.info("Done.")
         return model
 
+    def read_compact_model_file(self, file_name):
+        """Read a model in the compact binary format from file."""
+        from . import compact
+        _logger.info("Loading compact model from '%s'..." % file_name)
+        model = compact.read_compact_model(file_name)
+        _logger.info("Done.")
+        return model
+
     def read_binary_file(self, file_name):
         """Read a pickled object from a file."""
         with open(file_name, 'rb') as fobj:
@@ -201,6 +464,23 @@ class MorfessorIO(object):
         self.write_binary_file(file_name, model)
         _logger.info("Done.")
 
+    def write_compact_model_file(self, file_name, model):
+        """Write a model to a file in the compact binary format."""
+        from . import compact
+        _logger.info("Saving compact model to '%s'..." % file_name)
+        with open(file_name, 'wb') as fobj:
+            compact.write_compact_model(fobj, model)
+        _logger.info("Done.")
+
+    def write_segment_only_model_file(self, file_name, model):
+        """Compile a model into a segment-only model file, which can be
+        read as a SegmentOnlyModel."""
+        from . import segmentonly
+        _logger.info("Saving segment-only model to '%s'..." % file_name)
+        with open(file_name, 'wb') as fobj:
+            segmentonly.write_segment_only_model(fobj, model)
+        _logger.info("Done.")
+
     def write_binary_file(self, file_name, obj):
         """Pickle an object into a file."""
         with open(file_name, 'wb') as fobj:
@@ -236,6 +516,11 @@ class MorfessorIO(object):
         """Read a file that is either a binary model or a Morfessor 1.0 style
         model segmentation. This method can not be used on standard input as
         data might need to be read multiple times"""
+        from . import compact
+        if compact.is_compact_model_file(file_name):
+            model = self.read_compact_model_file(file_name)
+            _logger.info("%s was read as a compact model" % file_name)
+            return model
         try:
             model = self.read_binary_model_file(file_name)
             _logger.info("%s was read as a binary model" % file_name)
@@ -243,7 +528,7 @@ class MorfessorIO(object):
         except BaseException:
             pass
 
-        from morfessor import BaselineModel
+        from .baseline import BaselineModel
         model = BaselineModel()
         model.load_segmentations(self.read_segmentation_file(file_name))
         _logger.info("%s was read as a segmentation" % file_name)
@@ -262,6 +547,101 @@ class MorfessorIO(object):
             # Constructions are not strings (should be tuples of strings)
             return csep.join(map(lambda x: atom_sep.join(x), constructions))
 
+    def _count_files(self, file_names, count_lines, jobs):
+        """Count the text files with the method named count_lines, in
+        worker processes if jobs > 1, and merge the counts in order."""
+        if jobs <= 1 or '-' in file_names:
+            counts = collections.Counter()
+            for file_name in file_names:
+                _logger.info("Counting '%s'..." % file_name)
+                counts.update(
+                    self._count_text_part(file_name, None, count_lines))
+            _logger.info("Done.")
+            return counts
+
+        if self.encoding is None:
+            # The workers must agree on the encoding
+            self.encoding = self._find_encoding(*file_names)
+        tasks = []
+        for file_name in file_names:
+            if any(file_name.endswith(ext) for ext in COMPRESSED_OPENERS):
+                parts = [None]
+            else:
+                parts = _line_aligned_parts(file_name, jobs, COUNT_PART_SIZE)
+            tasks.extend((self, file_name, part, count_lines)
+                         for part in parts)
+        _logger.info("Counting %d files in %d parts with %d jobs..." %
+                     (len(file_names), len(tasks), jobs))
+        counts = collections.Counter()
+        pool = multiprocessing.Pool(jobs)
+        try:
+            for part_counts in pool.imap(_count_part, tasks):
+                counts.update(part_counts)
+        finally:
+            pool.terminate()
+        _logger.info("Done.")
+        return counts
+
+    def _count_text_part(self, file_name, part, count_lines):
+        """Count the lines of a text file, or of its (start, end) byte
+        range part, with the method named count_lines."""
+        if part is None:
+            inp = self._open_text_file_read(file_name)
+        else:
+            start, end = part
+            with open(file_name, 'rb') as fobj:
+                fobj.seek(start)
+                data = fobj.read(end - start)
+            inp = io.StringIO(data.decode(self.encoding), newline=None)
+        try:
+            lines = itertools.chain.from_iterable(
+                iter(lambda: inp.readlines(READ_LINES_HINT), []))
+            if self.lowercase:
+                lines = map(str.lower, lines)
+            return getattr(self, count_lines)(lines)
+        finally:
+            if inp is not sys.stdin:
+                inp.close()
+
+    def _count_corpus_lines(self, lines):
+        """Return a Counter of the compounds on the lines."""
+        counts = collections.Counter(itertools.chain.from_iterable(
+            map(self.compound_sep_re.split, map(str.rstrip, lines))))
+        counts.pop('', None)
+        if self.atom_separator is None:
+            return counts
+        atom_counts = collections.Counter()
+        for compound, count in counts.items():
+            atom_counts[self._split_atoms(compound)] += count
+        return atom_counts
+
+    def _count_corpus_list_lines(self, lines):
+        """Return a Counter of the compounds on the <count> <compound>
+        lines."""
+        counts = collections.Counter()
+        comment_start = self.comment_start
+        for line in map(str.rstrip, lines):
+            if len(line) == 0 or line.startswith(comment_start):
+                continue
+            try:
+                count, compound = line.split(None, 1)
+                counts[self._split_atoms(compound)] += int(count)
+            except ValueError:
+                counts[self._split_atoms(line)] += 1
+        return counts
+
+    def _count_cognate_lines(self, lines):
+        """Return a Counter of the (count, src, trg) rows on the lines."""
+        counts = collections.Counter()
+        comment_start = self.comment_start
+        for line in lines:
+            line = line.rstrip('\n')
+            if len(line) == 0 or line.startswith(comment_start):
+                continue
+            count, src, trg = line.split('\t')
+            counts[int(count), src, trg] += 1
+        return counts
+
     def _split_atoms(self, construction):
         """Split construction to its atoms."""
         if self.atom_separator is None:
@@ -272,54 +652,24 @@ class MorfessorIO(object):
     def _open_text_file_write(self, file_name):
         """Open a file for writing with the appropriate compression/encoding"""
         if file_name == '-':
-            file_obj = sys.stdout
-            if PY3:
-                return file_obj
-        elif file_name.endswith('.gz'):
-            file_obj = gzip.open(file_name, 'wb')
-        elif file_name.endswith('.bz2'):
-            file_obj = bz2.BZ2File(file_name, 'wb')
-        else:
-            file_obj = open(file_name, 'wb')
+            return sys.stdout
         if self.encoding is None:
             # Take encoding from locale if not set so far
             self.encoding = locale.getpreferredencoding()
-        return codecs.getwriter(self.encoding)(file_obj)
+        return io.TextIOWrapper(open_binary_file(file_name, 'wb'),
+                                encoding=self.encoding, newline='')
 
     def _open_text_file_read(self, file_name):
         """Open a file for reading with the appropriate compression/encoding"""
         if file_name == '-':
-            if PY3:
-                inp = sys.stdin
-            else:
-                class StdinUnicodeReader:
-                    def __init__(self, encoding):
-                        self.encoding = encoding
-                        if self.encoding is None:
-                            self.encoding = locale.getpreferredencoding()
-
-                    def __iter__(self):
-                        return self
-
-                    def next(self):
-                        l = sys.stdin.readline()
-                        if not l:
-                            raise StopIteration()
-                        return l.decode(self.encoding)
-
-                inp = StdinUnicodeReader(self.encoding)
-        else:
-            if file_name.endswith('.gz'):
-                file_obj = gzip.open(file_name, 'rb')
-            elif file_name.endswith('.bz2'):
-                file_obj = bz2.BZ2File(file_name, 'rb')
-            else:
-                file_obj = open(file_name, 'rb')
             if self.encoding is None:
-                # Try to determine encoding if not set so far
-                self.encoding = self._find_encoding(file_name)
-            inp = codecs.getreader(self.encoding)(file_obj)
-        return inp
+                return sys.stdin
+            return io.TextIOWrapper(sys.stdin.buffer, encoding=self.encoding)
+        if self.encoding is None:
+            # Try to determine encoding if not set so far
+            self.encoding = self._find_encoding(file_name)
+        return io.TextIOWrapper(open_binary_file(file_name, 'rb'),
+                                encoding=self.encoding)
 
     def _read_text_file(self, file_name, raw=False):
         """Read a text file with the appropriate compression and encoding.
@@ -328,50 +678,49 @@ class MorfessorIO(object):
 
         """
         inp = self._open_text_file_read(file_name)
+        comment_start = self.comment_start
+        lowercase = self.lowercase
         try:
-            for line in inp:
-                line = line.rstrip()
-                if not raw and \
-                   (len(line) == 0 or line.startswith(self.comment_start)):
-                    continue
-                if self.lowercase:
-                    yield line.lower()
-                else:
-                    yield line
+            for lines in iter(lambda: inp.readlines(READ_LINES_HINT), []):
+                for line in lines:
+                    line = line.rstrip()
+                    if not raw and \
+                       (len(line) == 0 or line.startswith(comment_start)):
+                        continue
+                    if lowercase:
+                        yield line.lower()
+                    else:
+                        yield line
         except KeyboardInterrupt:
             if file_name == '-':
                 _logger.info("Finished reading from stdin")
                 return
             else:
                 raise
+        finally:
+            if inp is not sys.stdin:
+                inp.close()
 
     def _find_encoding(self, *files):
         """Test default encodings on reading files.
 
         If no encoding is given, this method can be used to test which
-        of the default encodings would work.
+        of the default encodings would work. Only the first
+        ENCODING_SAMPLE_SIZE bytes of each file are tested, and the
+        preferred encoding of the locale is the fallback for files that
+        are not UTF-8.
 
         """
+        samples = []
+        for f in files:
+            if f == '-':
+                continue
+            with open_binary_file(f, 'rb') as file_obj:
+                samples.append(file_obj.read(ENCODING_SAMPLE_SIZE))
+
         test_encodings = ['utf-8', locale.getpreferredencoding()]
         for encoding in test_encodings:
-            ok = True
-            for f in files:
-                if f == '-':
-                    continue
-                try:
-                    if f.endswith('.gz'):
-                        file_obj = gzip.open(f, 'rb')
-                    elif f.endswith('.bz2'):
-                        file_obj = bz2.BZ2File(f, 'rb')
-                    else:
-                        file_obj = open(f, 'rb')
-
-                    for _ in codecs.getreader(encoding)(file_obj):
-                        pass
-                except UnicodeDecodeError:
-                    ok = False
-                    break
-            if ok:
+            if all(_decodes(sample, encoding) for sample in samples):
                 _logger.info("Detected %s encoding" % encoding)
                 return encoding
 
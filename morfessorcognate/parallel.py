@@ -0,0 +1,277 @@
+from __future__ import unicode_literals
+import collections
+import collections.abc
+import itertools
+import logging
+import multiprocessing
+import pickle
+import random
+
+from .exception import MorfessorException
+from .utils import SegmentationCache
+
+_logger = logging.getLogger(__name__)
+
+SYNC_MODES = ('sync', 'hogwild')
+
+
+def _optimize(model, compound, algorithm, algorithm_params):
+    if algorithm == 'recursive':
+        return model._recursive_optimize(compound, *algorithm_params)
+    elif algorithm == 'viterbi':
+        return model._viterbi_optimize(compound, *algorithm_params)
+    raise MorfessorException("unknown algorithm '%s'" % algorithm)
+
+
+class _AnalysisJournal(collections.abc.MutableMapping):
+    """Record the changes to the analyses of a model.
+
+    Wraps the analyses of a model, and remembers the constructions whose
+    nodes are set or deleted, in the order of their last change.
+
+    """
+    def __init__(self, analyses):
+        self.analyses = analyses
+        self._original = {}
+        self._order = collections.OrderedDict()
+
+    def _touch(self, construction):
+        if construction not in self._original:
+            node = self.analyses.get(construction)
+            self._original[construction] = \
+                node.splitloc if node is not None else None
+        self._order[construction] = None
+        self._order.move_to_end(construction)
+
+    def __setitem__(self, construction, node):
+        self._touch(construction)
+        self.analyses[construction] = node
+
+    def __delitem__(self, construction):
+        self._touch(construction)
+        del self.analyses[construction]
+
+    def __getitem__(self, construction):
+        return self.analyses[construction]
+
+    def __contains__(self, construction):
+        return construction in self.analyses
+
+    def __len__(self):
+        return len(self.analyses)
+
+    def __iter__(self):
+        return iter(self.analyses)
+
+    def get(self, construction, default=None):
+        return self.analyses.get(construction, default)
+
+    def changes(self):
+        """Return the (construction, splitloc) pairs of the constructions
+        whose split locations changed, parents before their children."""
+        changes = []
+        for construction in self._order:
+            node = self.analyses.get(construction)
+            if node is not None and (node.splitloc or None) != \
+                    (self._original[construction] or None):
+                changes.append((construction, node.splitloc))
+        return changes
+
+
+def _apply_changes(model, changes):
+    for construction, splitloc in changes:
+        model._set_construction_analysis(construction, splitloc)
+
+
+def _worker(conn, seed):
+    """Serve optimization requests for one shard of the compounds.
+
+    Messages are tuples whose first item is the command:
+      ('model', data): replace the local model with the pickled data
+      ('optimize', compounds, algorithm, algorithm_params): optimize the
+          compounds and reply with their new segmentations and the
+          changed analyses (see _AnalysisJournal.changes)
+      ('apply', changes): set the changed analyses of other workers
+    None stops the worker.
+
+    """
+    random.seed(seed)
+    model = None
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            break
+        if msg is None:
+            break
+        if msg[0] == 'model':
+            model = pickle.loads(msg[1])
+        elif msg[0] == 'optimize':
+            _, compounds, algorithm, algorithm_params = msg
+            journal = _AnalysisJournal(model._analyses)
+            model._analyses = journal
+            updates = []
+            try:
+                for compound in compounds:
+                    updates.append((compound, _optimize(
+                        model, compound, algorithm, algorithm_params)))
+            finally:
+                model._analyses = journal.analyses
+            conn.send((updates, journal.changes()))
+        elif msg[0] == 'apply':
+            _apply_changes(model, msg[1])
+    conn.close()
+
+
+class ShardedTrainer(object):
+    """Optimize the compounds of a model in parallel worker processes.
+
+    In each epoch, the model is sent to the workers and the compounds are
+    split into one shard per worker. The workers optimize their shards
+    against local copies of the model, and report the analyses they
+    changed (including those of other constructions, such as the
+    wildcard companions of cognate pairs) to the master after every
+    sync_interval compounds (or once per epoch, if sync_interval is
+    None). The master sets the changed analyses in its own model, one
+    worker after the other, which reconciles the construction (and
+    edit) counts and keeps the analysis trees of the workers.
+
+    In 'sync' mode, the workers then apply all the changes in the same
+    order as the master, so they continue from the state of the master
+    model, while in 'hogwild' mode they only apply the changes of the
+    other workers on top of their own local state, which lets the local
+    analyses drift from those of the master until the start of the next
+    epoch.
+
+    """
+    def __init__(self, jobs, sync_mode='sync', sync_interval=None):
+        if sync_mode not in SYNC_MODES:
+            raise MorfessorException("unknown sync mode '%s'" % sync_mode)
+        if sync_interval is not None and sync_interval < 1:
+            raise MorfessorException("sync interval must be positive")
+        self.jobs = jobs
+        self.sync_mode = sync_mode
+        self.sync_interval = sync_interval
+        self._conns = []
+        self._procs = []
+        for _ in range(jobs):
+            conn, child_conn = multiprocessing.Pipe()
+            proc = multiprocessing.Process(
+                target=_worker, args=(child_conn, random.getrandbits(32)))
+            proc.daemon = True
+            proc.start()
+            child_conn.close()
+            self._conns.append(conn)
+            self._procs.append(proc)
+
+    def _send_model(self, model):
+        data = pickle.dumps(model, pickle.HIGHEST_PROTOCOL)
+        for conn in self._conns:
+            conn.send(('model', data))
+
+    def optimize(self, model, compounds, algorithm='recursive',
+                 algorithm_params=()):
+        """Optimize the segmentations of the compounds for one epoch.
+
+        Returns the list of (compound, segments) in the order in which
+        they were applied to the model.
+
+        """
+        if algorithm not in ('recursive', 'viterbi'):
+            raise MorfessorException("unknown algorithm '%s'" % algorithm)
+        shards = [compounds[i::self.jobs] for i in range(self.jobs)]
+        interval = self.sync_interval or max(len(shards[0]), 1)
+        self._send_model(model)
+        applied = []
+        for start in range(0, len(shards[0]), interval):
+            for conn, shard in zip(self._conns, shards):
+                conn.send(('optimize', shard[start:start + interval],
+                           algorithm, algorithm_params))
+            results = [conn.recv() for conn in self._conns]
+            for updates, changes in results:
+                _apply_changes(model, changes)
+                applied.extend(updates)
+            if start + interval >= len(shards[0]):
+                break
+            for i, conn in enumerate(self._conns):
+                conn.send(('apply', [
+                    change for j, (_, changes) in enumerate(results)
+                    if self.sync_mode == 'sync' or j != i
+                    for change in changes]))
+        return applied
+
+    def close(self):
+        """Stop the worker processes."""
+        for conn in self._conns:
+            conn.send(None)
+            conn.close()
+        for proc in self._procs:
+            proc.join()
+        self._conns = []
+        self._procs = []
+
+
+# The model of a segmentation worker process
+_segment_model = None
+
+
+def _init_segment_worker(model):
+    global _segment_model
+    _segment_model = model
+
+
+def _segment_worker(args):
+    compound, addcount, maxlen = args
+    return _segment_model.viterbi_segment(compound, addcount, maxlen)
+
+
+def segment_many(model, compounds, addcount=1.0, maxlen=30, jobs=1,
+                 chunk_size=1000, cache_size=100000):
+    """Segment compounds with model.viterbi_segment.
+
+    Yields the (constructions, logp) of each compound in input order. The
+    input is read in chunks of chunk_size compounds, and only the
+    compounds not found in the current chunk or in a SegmentationCache
+    of the cache_size most recently used compounds are segmented, so the
+    memory use does not grow with the length of the input. With jobs > 1,
+    they are segmented by a pool of worker processes, each of which
+    receives the model once. Each yielded list of constructions is a new
+    copy, which the caller may modify.
+
+    """
+    cache = SegmentationCache(cache_size)
+    pool = None
+    if jobs > 1:
+        pool = multiprocessing.Pool(jobs, _init_segment_worker, (model,))
+    try:
+        compounds = iter(compounds)
+        while True:
+            chunk = list(itertools.islice(compounds, chunk_size))
+            if not chunk:
+                break
+            results = {}
+            new = []
+            for compound in chunk:
+                if compound in results:
+                    continue
+                results[compound] = cache.get(compound)
+                if results[compound] is None:
+                    new.append(compound)
+            if pool is not None:
+                segmentations = pool.map(
+                    _segment_worker,
+                    [(compound, addcount, maxlen) for compound in new],
+                    chunksize=max(1, len(new) // (4 * jobs)))
+            else:
+                segmentations = [model.viterbi_segment(compound, addcount,
+                                                       maxlen)
+                                 for compound in new]
+            results.update(zip(new, segmentations))
+            for compound, result in results.items():
+                cache.put(compound, result)
+            for compound in chunk:
+                constructions, logp = results[compound]
+                yield list(constructions), logp
+    finally:
+        if pool is not None:
+            pool.terminate()
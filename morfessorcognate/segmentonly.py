@@ -0,0 +1,383 @@
+"""Compiled segment-only models for inference.
+
+write_segment_only_model compiles a trained BaselineModel or CognateModel
+into a compact model file (see compact) that holds only what the Viterbi
+segmentation of words needs: for each side, a double-array trie of the
+known morphs with their counts and costs, and the scalar state of the
+encodings. SegmentOnlyModel segments words with such a file, reading the
+tries directly from the memory-mapped file. Unlike a CognateModel, it
+does not need python-Levenshtein.
+
+"""
+from __future__ import unicode_literals
+import array
+import collections
+import math
+
+from .compact import CompactModelFile, _Writer, _encoding_state, \
+    _set_encoding_state
+from .constructions.base import BaseConstructionMethods
+from .constructions.cognate import CognateConstructionMethods, WILDCARD
+from .cost import Cost
+from .exception import MorfessorException
+from .parallel import segment_many
+from .utils import SegmentationCache
+
+SIDES = ('src', 'trg')
+
+
+def _double_array(morphs):
+    """Build a double-array trie of the morphs.
+
+    Returns (alphabet, base, check, value). The atoms of the morphs are
+    coded as their 1-based index in the alphabet. The root is state 0,
+    and the child of state s for code c is state t = base[s] + c if
+    check[t] == s. value[t] is the index of the morph that ends in
+    state t, or -1.
+
+    """
+    alphabet = sorted(set(atom for morph in morphs for atom in morph))
+    codes = {atom: i + 1 for i, atom in enumerate(alphabet)}
+    root = {}
+    for i, morph in enumerate(morphs):
+        node = root
+        for atom in morph:
+            node = node.setdefault(codes[atom], {})
+        node[None] = i
+
+    base = array.array('i', [0])
+    check = array.array('i', [-1])
+    value = array.array('i', [-1])
+    queue = collections.deque([(root, 0)])
+    first_free = 1
+    while queue:
+        node, state = queue.popleft()
+        value[state] = node.get(None, -1)
+        children = sorted(code for code in node if code is not None)
+        if not children:
+            continue
+        while first_free < len(check) and check[first_free] != -1:
+            first_free += 1
+        offset = max(first_free - children[0], 0)
+        while any(offset + code < len(check) and check[offset + code] != -1
+                  for code in children):
+            offset += 1
+        size = offset + children[-1] + 1
+        if size > len(check):
+            base.extend([0] * (size - len(base)))
+            check.extend([-1] * (size - len(check)))
+            value.extend([-1] * (size - len(value)))
+        base[state] = offset
+        for code in children:
+            check[offset + code] = state
+            queue.append((node[code], offset + code))
+    return alphabet, base, check, value
+
+
+def write_segment_only_model(fobj, model):
+    """Compile a BaselineModel or CognateModel into a segment-only model
+    and write it to a binary file object."""
+    if isinstance(model.cc, CognateConstructionMethods):
+        costs = [model.cost.src_cost, model.cost.trg_cost]
+        lexicons = [
+            {morph: count for morph, count in cost.substring_counts().items()
+             if count > 0}
+            for cost in costs]
+        atoms = [cost.atom_counts() for cost in costs]
+        sides = list(SIDES)
+    elif (type(model.cc) is BaseConstructionMethods and
+          model.cc._nosplit is None):
+        costs = [model.cost]
+        lexicons = [{c: node.count for c, node in model._analyses.items()
+                     if not node.splitloc and node.count > 0}]
+        atoms = [model.cost._lexicon_coding.atoms]
+        sides = [None]
+    else:
+        raise MorfessorException(
+            "segment-only models can not be compiled from models with "
+            "%s or a nosplit pattern" % type(model.cc).__name__)
+
+    all_tokens = sum(cost.all_tokens() for cost in costs)
+    logtokens = math.log(all_tokens) if all_tokens > 0 else 0
+    writer = _Writer()
+    states = []
+    for i, (cost, lexicon) in enumerate(zip(costs, lexicons)):
+        name = 'side%d' % i
+        morphs = sorted(lexicon)
+        alphabet, base, check, value = _double_array(morphs)
+        writer.add_strings(name + '.alphabet', alphabet)
+        writer.add(name + '.base', 'i', base)
+        writer.add(name + '.check', 'i', check)
+        writer.add(name + '.value', 'i', value)
+        writer.add(name + '.counts', 'q', (lexicon[m] for m in morphs))
+        # the cost of each morph in the search without smoothing
+        writer.add(name + '.costs', 'd',
+                   (logtokens - math.log(lexicon[m]) for m in morphs))
+        writer.add_counter(name + '.atoms', atoms[i])
+        states.append({'lexicon': _encoding_state(cost._lexicon_coding),
+                       'corpus': _encoding_state(cost._corpus_coding)})
+    writer.write(fobj, {'kind': 'segment-only', 'sides': sides,
+                        'costs': states})
+
+
+class _Side(object):
+    """The tables of one side of a segment-only model."""
+    def __init__(self, reader, name):
+        self.codes = {atom: i + 1 for i, atom in enumerate(
+            reader.strings(name + '.alphabet'))}
+        self.base = reader.section(name + '.base')
+        self.check = reader.section(name + '.check')
+        self.value = reader.section(name + '.value')
+        self.counts = reader.section(name + '.counts')
+        self.costs = reader.section(name + '.costs')
+
+    def release(self):
+        for view in (self.base, self.check, self.value, self.counts,
+                     self.costs):
+            if isinstance(view, memoryview):
+                view.release()
+
+    def count(self, morph):
+        """Return the count of a morph, or 0 if it is not known."""
+        base, check = self.base, self.check
+        state = 0
+        for atom in morph:
+            code = self.codes.get(atom)
+            if code is None:
+                return 0
+            child = base[state] + code
+            if child >= len(check) or check[child] != state:
+                return 0
+            state = child
+        morph_id = self.value[state]
+        return self.counts[morph_id] if morph_id >= 0 else 0
+
+
+class SegmentOnlyModel(object):
+    """Segment words with a compiled segment-only model.
+
+    The segmentations and their costs are the same as those given by
+    viterbi_segment of the model that was compiled. For a cognate model,
+    only compounds with one side (the other being WILDCARD) can be
+    segmented.
+
+    """
+    # Optional SegmentationCache of viterbi_segment results
+    _segmentation_cache = None
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self._reader = CompactModelFile(file_name)
+        header = self._reader.header
+        if header['kind'] != 'segment-only':
+            self._reader.close()
+            raise MorfessorException(
+                "'%s' is not a segment-only model" % file_name)
+        self.sides = header['sides']
+        if self.sides == [None]:
+            self.cc = BaseConstructionMethods()
+        else:
+            self.cc = CognateConstructionMethods()
+        strings = self._reader.strings()
+        self._costs = []
+        self._sides = []
+        for i, state in enumerate(header['costs']):
+            name = 'side%d' % i
+            cost = Cost(self.cc)
+            cost._lexicon_coding.atoms.update(
+                self._reader.counter(name + '.atoms', strings))
+            _set_encoding_state(cost._lexicon_coding, state['lexicon'])
+            _set_encoding_state(cost._corpus_coding, state['corpus'])
+            self._costs.append(cost)
+            self._sides.append(_Side(self._reader, name))
+
+    def __getstate__(self):
+        state = {'file_name': self.file_name}
+        if self._segmentation_cache is not None:
+            state['segmentation_cache'] = self._segmentation_cache
+        return state
+
+    def __setstate__(self, state):
+        self.__init__(state['file_name'])
+        self._segmentation_cache = state.get('segmentation_cache')
+
+    def close(self):
+        """Release the memory-mapped model file."""
+        for side in self._sides:
+            side.release()
+        self._sides = []
+        self._reader.close()
+
+    def get_corpus_coding_weight(self):
+        return self._costs[0]._corpus_coding.weight
+
+    def _sum(self, method, *args):
+        return sum(getattr(cost, method)(*args) for cost in self._costs)
+
+    def _boundary_cost(self):
+        return (math.log(self._sum('tokens') + self._sum('compound_tokens')) -
+                math.log(self._sum('compound_tokens')))
+
+    def _coding_cost(self, side, morph):
+        if self.sides == [None]:
+            return self._costs[0].get_coding_cost(morph)
+        fields = [WILDCARD, WILDCARD]
+        fields[side] = morph
+        return (self._costs[0].get_coding_cost(fields[0]) +
+                self._costs[1].get_coding_cost(fields[1]))
+
+    def _side_of(self, compound):
+        if self.sides == [None]:
+            return 0, compound
+        if compound.src != WILDCARD and compound.trg == WILDCARD:
+            return 0, compound.src
+        if compound.src == WILDCARD and compound.trg != WILDCARD:
+            return 1, compound.trg
+        raise MorfessorException(
+            "segment-only models only segment compounds with one side")
+
+    def _make(self, side, morph):
+        if self.sides == [None]:
+            return morph
+        if side == 0:
+            return self.cc.type(morph, WILDCARD)
+        return self.cc.type(WILDCARD, morph)
+
+    def _search_known(self, word, tables, maxlen, badlikelihood):
+        """Viterbi search without smoothing through the known morphs in
+        the double-array trie, as in baseline._viterbi_known_morphs."""
+        base, check, value = tables.base, tables.check, tables.value
+        morph_costs = tables.costs
+        codes = tables.codes
+        size = len(check)
+        n = len(word)
+        costs = [0.0] + [None] * n
+        paths = [0] * (n + 1)
+        for pt in range(n):
+            if costs[pt] is None:
+                continue
+            state = 0
+            for t in range(pt + 1, min(n, pt + maxlen) + 1):
+                code = codes.get(word[t - 1])
+                if code is not None:
+                    child = base[state] + code
+                    state = child if child < size and \
+                        check[child] == state else -1
+                else:
+                    state = -1
+                morph_id = value[state] if state >= 0 else -1
+                if morph_id >= 0:
+                    cost = costs[pt] + morph_costs[morph_id]
+                elif t == pt + 1:
+                    cost = costs[pt] + badlikelihood
+                else:
+                    cost = None
+                if cost is not None and (costs[t] is None or cost < costs[t]):
+                    costs[t] = cost
+                    paths[t] = pt
+                if state < 0:
+                    break
+        return paths, costs[n]
+
+    def _search_smoothed(self, word, side, tables, addcount, maxlen):
+        """Viterbi search with additive smoothing, as in the side search
+        of CognateModel."""
+        tokens = self._sum('all_tokens') + addcount
+        logtokens = math.log(tokens) if tokens > 0 else 0
+        # unknown morphs are all smoothed, so the bad likelihood of
+        # single atoms is not used
+        newboundcost = self._sum('newbound_cost', addcount)
+        notokens = self._sum('tokens') == 0
+        n = len(word)
+        costs = [0.0] + [None] * n
+        paths = [0] * (n + 1)
+        for t in range(1, n + 1):
+            bestcost = None
+            bestpath = 0
+            for pt in range(max(0, t - maxlen), t):
+                cost = costs[pt]
+                if cost is None:
+                    continue
+                morph = word[pt:t]
+                count = tables.count(morph)
+                if count > 0:
+                    cost += (logtokens - math.log(count + addcount))
+                else:
+                    codingcost = self._coding_cost(side, morph)
+                    if notokens:
+                        cost += (addcount * math.log(addcount) +
+                                 newboundcost + codingcost)
+                    else:
+                        cost += (logtokens - math.log(addcount) +
+                                 newboundcost + codingcost)
+                if bestcost is None or cost < bestcost:
+                    bestcost = cost
+                    bestpath = pt
+            costs[t] = bestcost
+            paths[t] = bestpath
+        return paths, costs[n]
+
+    def viterbi_segment(self, compound, addcount=1.0, maxlen=30):
+        """Find optimal segmentation using the Viterbi algorithm.
+
+        Returns the most probable segmentation and its log-probability,
+        see BaselineModel.viterbi_segment.
+
+        """
+        cache = self._segmentation_cache
+        if cache is None:
+            return self._viterbi_segment(compound, addcount, maxlen)
+        key = (compound, addcount, maxlen)
+        result = cache.get(key)
+        if result is None:
+            result = self._viterbi_segment(compound, addcount, maxlen)
+            cache.put(key, result)
+        constructions, cost = result
+        return list(constructions), cost
+
+    def _viterbi_segment(self, compound, addcount=1.0, maxlen=30):
+        side, word = self._side_of(compound)
+        tables = self._sides[side]
+        badlikelihood = self._costs[side].bad_likelihood(word, addcount)
+        if addcount == 0:
+            paths, cost = self._search_known(word, tables, maxlen,
+                                             badlikelihood)
+        else:
+            paths, cost = self._search_smoothed(word, side, tables, addcount,
+                                                maxlen)
+        bounds = [len(word)]
+        while bounds[-1] > 0:
+            bounds.append(paths[bounds[-1]])
+        bounds.reverse()
+        constructions = [self._make(side, word[bounds[i]:bounds[i + 1]])
+                         for i in range(len(bounds) - 1)]
+        return constructions, cost + self._boundary_cost()
+
+    def segment_many(self, words, side=None, addcount=1.0, maxlen=30,
+                     jobs=1, chunk_size=1000, cache_size=100000):
+        """Segment compounds using the Viterbi algorithm.
+
+        See BaselineModel.segment_many. As in CognateModel.segment_many,
+        if side is 'src' or 'trg', the words are strings of that side.
+
+        """
+        if side is not None:
+            if side not in SIDES or self.sides == [None]:
+                raise MorfessorException("unknown side '%s'" % side)
+            index = SIDES.index(side)
+            words = (self._make(index, word) for word in words)
+        return segment_many(self, words, addcount, maxlen, jobs, chunk_size,
+                            cache_size)
+
+    def set_segmentation_cache(self, capacity, persist=False):
+        """Cache the results of viterbi_segment, see
+        BaselineModel.set_segmentation_cache."""
+        if capacity:
+            self._segmentation_cache = SegmentationCache(capacity, persist)
+        else:
+            self._segmentation_cache = None
+
+    def get_segmentation_cache_stats(self):
+        if self._segmentation_cache is None:
+            return None
+        return self._segmentation_cache.stats()
@@ -0,0 +1,299 @@
+from __future__ import unicode_literals
+import asyncio
+import concurrent.futures
+import json
+import logging
+import socket
+
+from .exception import MorfessorException
+
+_logger = logging.getLogger(__name__)
+
+
+def parse_address(address):
+    """Parse a server address of the form unix:<path> or tcp:<host>:<port>.
+
+    Returns a tuple (family, path) or (family, (host, port)).
+
+    """
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[len('unix:'):]
+    if address.startswith('tcp:'):
+        host, sep, port = address[len('tcp:'):].rpartition(':')
+        if sep and port.isdigit():
+            return socket.AF_INET, (host or 'localhost', int(port))
+    raise MorfessorException("invalid server address '%s'" % address)
+
+
+def is_address(address):
+    """Return True if address looks like a server address."""
+    return address.startswith('unix:') or address.startswith('tcp:')
+
+
+def segment_words(model, words, side=None, addcount=0, maxlen=30,
+                  end_marker=None, **kwargs):
+    """Segment words with model.segment_many and yield lists of morphs.
+
+    For a cognate model, side selects the side ('src' or 'trg') of the
+    words. If end_marker is given, it is appended to each word before
+    segmentation and removed from the morphs. The remaining keyword
+    arguments are passed to segment_many.
+
+    """
+    if end_marker is not None:
+        words = (word + end_marker for word in words)
+    if side is not None:
+        kwargs['side'] = side
+    for constructions, _ in model.segment_many(words, addcount=addcount,
+                                               maxlen=maxlen, **kwargs):
+        if side == 'src':
+            morphs = [cons.src for cons in constructions]
+        elif side == 'trg':
+            morphs = [cons.trg for cons in constructions]
+        else:
+            morphs = list(constructions)
+        if end_marker is not None:
+            morphs = [morph.replace(end_marker, '') for morph in morphs]
+            morphs = [morph for morph in morphs if morph != '']
+        yield morphs
+
+
+class SegmentationServer(object):
+    """Serve segmentations of a loaded model over a socket.
+
+    Each request is one line of UTF-8 text. A plain word is answered with
+    its morphs separated by spaces. A JSON object {"words": [...],
+    "side": ...} is answered with {"segmentations": [[...], ...]}, where
+    the side is optional and defaults to that of the server. Requests are
+    answered in order on each connection, but the client does not need to
+    wait for the response before sending the next request.
+
+    The words of concurrent requests are segmented in batches of at most
+    batch_size words in a single worker thread, and the results are
+    shared between the clients through the segmentation cache of the
+    model. Request lines longer than max_request_size bytes are answered
+    with an error.
+
+    """
+    def __init__(self, model, side=None, addcount=0, maxlen=30,
+                 end_marker=None, batch_size=1000, cache_size=100000,
+                 max_request_size=2 ** 24):
+        self.model = model
+        self.side = side
+        self.addcount = addcount
+        self.maxlen = maxlen
+        self.end_marker = end_marker
+        self.batch_size = batch_size
+        self.max_request_size = max_request_size
+        if cache_size:
+            model.set_segmentation_cache(cache_size)
+        self._queue = None
+        self._batcher = None
+        self._executor = None
+
+    def _segment(self, words, side):
+        return list(segment_words(self.model, words, side, self.addcount,
+                                  self.maxlen, self.end_marker))
+
+    def _segment_batch(self, batch):
+        """Segment the (word, side) pairs of a batch in the worker."""
+        results = [None] * len(batch)
+        for side in set(side for _, side in batch):
+            indices = [i for i, item in enumerate(batch) if item[1] == side]
+            segmentations = self._segment([batch[i][0] for i in indices],
+                                          side)
+            for i, morphs in zip(indices, segmentations):
+                results[i] = morphs
+        return results
+
+    async def _run_batches(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, self._segment_batch,
+                    [(word, side) for word, side, _ in batch])
+            except Exception as e:
+                _logger.exception("Segmentation failed")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, _, future), morphs in zip(batch, results):
+                if not future.done():
+                    future.set_result(morphs)
+
+    async def segment(self, words, side=None):
+        """Segment words and return their lists of morphs."""
+        if side is None:
+            side = self.side
+        loop = asyncio.get_event_loop()
+        futures = []
+        for word in words:
+            future = loop.create_future()
+            self._queue.put_nowait((word, side, future))
+            futures.append(future)
+        return await asyncio.gather(*futures)
+
+    async def _respond(self, line):
+        if not line.startswith('{'):
+            morphs = await self.segment([line])
+            return ' '.join(morphs[0])
+        try:
+            request = json.loads(line)
+            words = request['words']
+            side = request.get('side')
+            if not isinstance(words, list) or \
+                    not all(isinstance(word, str) for word in words):
+                raise ValueError("words must be a list of strings")
+            if side not in (None, 'src', 'trg'):
+                raise ValueError("invalid side '%s'" % side)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            return json.dumps({'error': 'bad request: %s' % e})
+        try:
+            segmentations = await self.segment(words, side)
+        except Exception as e:
+            return json.dumps({'error': str(e)})
+        return json.dumps({'segmentations': segmentations},
+                          ensure_ascii=False)
+
+    async def _read_request(self, reader):
+        """Read a request line from reader.
+
+        Returns a tuple (line, too_long). A line longer than the stream
+        limit is discarded and returned as too long.
+
+        """
+        too_long = False
+        while True:
+            try:
+                return await reader.readuntil(b'\n'), too_long
+            except asyncio.IncompleteReadError as e:
+                return e.partial, too_long
+            except asyncio.LimitOverrunError as e:
+                await reader.readexactly(e.consumed)
+                too_long = True
+
+    async def _handle(self, reader, writer):
+        responses = asyncio.Queue(maxsize=self.batch_size)
+
+        async def write_responses():
+            while True:
+                response = await responses.get()
+                if response is None:
+                    break
+                writer.write((await response + '\n').encode('utf-8'))
+                await writer.drain()
+
+        writing = asyncio.ensure_future(write_responses())
+        try:
+            while True:
+                line, too_long = await self._read_request(reader)
+                if too_long:
+                    response = asyncio.get_event_loop().create_future()
+                    response.set_result(json.dumps(
+                        {'error': 'request longer than %d bytes'
+                                  % self.max_request_size}))
+                    await responses.put(response)
+                    continue
+                if not line:
+                    break
+                line = line.decode('utf-8').rstrip('\r\n')
+                await responses.put(asyncio.ensure_future(
+                    self._respond(line)))
+            await responses.put(None)
+            await writing
+        except (ConnectionError, UnicodeDecodeError) as e:
+            _logger.warning("Closing connection: %s", e)
+            writing.cancel()
+        finally:
+            writer.close()
+
+    async def start(self, address):
+        """Start serving at address and return the asyncio server."""
+        self._queue = asyncio.Queue()
+        self._executor = concurrent.futures.ThreadPoolExecutor(1)
+        self._batcher = asyncio.ensure_future(self._run_batches())
+        family, addr = parse_address(address)
+        if family == socket.AF_UNIX:
+            server = await asyncio.start_unix_server(
+                self._handle, addr, limit=self.max_request_size)
+        else:
+            server = await asyncio.start_server(
+                self._handle, *addr, limit=self.max_request_size)
+        _logger.info("Serving segmentations at %s", address)
+        return server
+
+    async def stop(self, server):
+        """Stop serving and the batch worker."""
+        server.close()
+        await server.wait_closed()
+        self._batcher.cancel()
+        self._executor.shutdown()
+
+    def serve_forever(self, address):
+        """Serve at address until interrupted."""
+        async def serve():
+            server = await self.start(address)
+            try:
+                await server.serve_forever()
+            finally:
+                await self.stop(server)
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            pass
+
+
+def connect(address, timeout=None):
+    """Connect to a segmentation server and return the socket."""
+    family, addr = parse_address(address)
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(addr)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def segment_remote(address, words, side=None, chunk_size=1000,
+                   timeout=None):
+    """Segment words with the server at address.
+
+    The words are sent in JSON requests of chunk_size words. Yields lists
+    of morphs in input order.
+
+    """
+    sock = connect(address, timeout)
+    with sock, sock.makefile('rb') as responses:
+        chunk = []
+        for word in words:
+            chunk.append(word)
+            if len(chunk) >= chunk_size:
+                for morphs in _request(sock, responses, chunk, side):
+                    yield morphs
+                chunk = []
+        if chunk:
+            for morphs in _request(sock, responses, chunk, side):
+                yield morphs
+
+
+def _request(sock, responses, words, side):
+    request = {'words': words}
+    if side is not None:
+        request['side'] = side
+    sock.sendall((json.dumps(request, ensure_ascii=False) + '\n')
+                 .encode('utf-8'))
+    line = responses.readline()
+    if not line:
+        raise MorfessorException("segmentation server closed the connection")
+    response = json.loads(line.decode('utf-8'))
+    if 'error' in response:
+        raise MorfessorException("segmentation server: %s"
+                                 % response['error'])
+    return response['segmentations']
@@ -0,0 +1,320 @@
+import collections
+import multiprocessing
+import pickle
+import random
+import unittest
+
+from morfessorcognate.baseline import AnalysisTable, BaselineModel, \
+    ConstrNode, SegmentationCache
+from morfessorcognate.cognate import CognateModel
+from morfessorcognate.data import DataPoint
+from morfessorcognate.exception import MorfessorException
+from morfessorcognate.parallel import _AnalysisJournal, _apply_changes, \
+    segment_many
+from morfessorcognate.test.test_cost import _cognate_data
+
+
+def _baseline_data():
+    words = [(3, u'talossa'), (2, u'koirassa'), (4, u'talo'), (2, u'koira'),
+             (1, u'kissalla'), (2, u'kissa'), (1, u'talolla')]
+    return [DataPoint(count, word, ()) for count, word in words]
+
+
+class TestActiveSet(unittest.TestCase):
+    def test_no_changes(self):
+        model = BaselineModel()
+        model.load_data(_baseline_data())
+        model.train_batch()
+        old_counts = dict(model._count_items())
+        compounds = list(model.get_compounds())
+        self.assertEqual(
+            model._active_compounds(compounds, old_counts, 0.0), [])
+
+    def test_changed_prefix(self):
+        model = BaselineModel()
+        model.load_data(_baseline_data())
+        model.train_batch()
+        old_counts = dict(model._count_items())
+        old_counts[u'koir'] = 100
+        compounds = list(model.get_compounds())
+        active = model._active_compounds(compounds, old_counts, 0.1)
+        self.assertEqual(sorted(active), [u'koira', u'koirassa'])
+
+    def test_train(self):
+        for model, data in ((BaselineModel(), _baseline_data()),
+                            (CognateModel(corpusweight=1.0),
+                             _cognate_data())):
+            random.seed(0)
+            model.load_data(data)
+            epochs, cost = model.train_batch(active_threshold=0.0,
+                                             full_sweep_interval=2)
+            self.assertGreater(epochs, 0)
+            self.assertAlmostEqual(cost, model.get_cost())
+
+
+class TestIterativeSplit(unittest.TestCase):
+    def test_deep_tree(self):
+        model = BaselineModel()
+        word = u'ab' * 1500
+        model.load_data([DataPoint(1, word, ())])
+        # Replace the analysis with a right-branching chain deeper than
+        # the recursion limit
+        model._modify_construction_count(word, -1)
+        for i in range(len(word) - 1):
+            model._analyses[word[i:]] = ConstrNode(int(i == 0), 0, 1)
+        model._modify_construction_count(word, 1)
+        self.assertEqual(model.segment(word), list(word))
+        self.assertEqual(model.get_constructions(),
+                         [(u'a', 1500), (u'b', 1500)])
+
+        deltas = collections.Counter()
+        model._collect_count_deltas(word, 2, deltas)
+        self.assertEqual(deltas, {u'a': 3000, u'b': 3000})
+        model._modify_construction_count(word, -1)
+        self.assertEqual(model.get_constructions(), [])
+
+    def test_repeated_halves(self):
+        model = BaselineModel()
+        model.load_data([DataPoint(5, u'kalakala', ()),
+                         DataPoint(5, u'kala', ())])
+        self.assertEqual(model._recursive_optimize(u'kalakala'),
+                         model.segment(u'kalakala'))
+
+
+class _LatticeModel(BaselineModel):
+    def _use_lexicon_trie(self, compound):
+        return False
+
+
+class TestLexiconTrie(unittest.TestCase):
+    def _train(self, model):
+        random.seed(0)
+        model.load_data(_baseline_data())
+        model.train_batch()
+        return model
+
+    def test_same_as_lattice(self):
+        model = self._train(BaselineModel())
+        reference = self._train(_LatticeModel())
+        for word in (u'talossa', u'kissakoira', u'xyzzy', u'koirallatalo'):
+            for maxlen in (2, 30):
+                self.assertEqual(
+                    model.viterbi_segment(word, addcount=0, maxlen=maxlen),
+                    reference.viterbi_segment(word, addcount=0,
+                                              maxlen=maxlen))
+
+    def test_no_lattice(self):
+        model = self._train(BaselineModel())
+        expected = model.viterbi_segment(u'kissakoira', addcount=0)
+
+        def split_lattice(compound, maxlen):
+            raise AssertionError('lattice built for %s' % compound)
+
+        model.cc.split_lattice = split_lattice
+        self.assertEqual(model.viterbi_segment(u'kissakoira', addcount=0),
+                         expected)
+        self.assertRaises(AssertionError, model.viterbi_segment,
+                          u'kissakoira', addcount=1.0)
+
+    def test_invalidated(self):
+        model = self._train(BaselineModel())
+        self.assertNotIn(u'x', model._get_lexicon_trie())
+        model._modify_construction_count(u'xyz', 5)
+        self.assertEqual(model.viterbi_segment(u'xyzxyz', addcount=0)[0],
+                         [u'xyz', u'xyz'])
+        model._modify_construction_count(u'xyz', -5)
+        self.assertEqual(model.viterbi_segment(u'xyz', addcount=0)[0],
+                         [u'x', u'y', u'z'])
+
+    def test_not_pickled(self):
+        model = self._train(BaselineModel())
+        model._get_lexicon_trie()
+        model = pickle.loads(pickle.dumps(model))
+        self.assertIsNone(model._lexicon_trie)
+
+
+class TestSegmentMany(unittest.TestCase):
+    def test_order_and_duplicates(self):
+        random.seed(0)
+        model = BaselineModel()
+        model.load_data(_baseline_data())
+        model.train_batch()
+        words = [u'talossa', u'kissa', u'talossa', u'xyz', u'kissa',
+                 u'koiralla', u'talossa']
+        expected = [model.viterbi_segment(w) for w in words]
+        for jobs in (1, 2):
+            self.assertEqual(
+                list(model.segment_many(words, jobs=jobs, chunk_size=3)),
+                expected)
+
+    def test_bounded(self):
+        random.seed(0)
+        model = BaselineModel()
+        model.load_data(_baseline_data())
+        model.train_batch()
+        segmented = []
+        viterbi_segment = model.viterbi_segment
+
+        def counting(compound, *args):
+            segmented.append(compound)
+            return viterbi_segment(compound, *args)
+
+        model.viterbi_segment = counting
+        words = [u'talossa', u'kissa', u'talossa', u'xyz', u'koiralla',
+                 u'kissa', u'talossa']
+        expected = [viterbi_segment(w) for w in words]
+        self.assertEqual(list(model.segment_many(words, chunk_size=2,
+                                                 cache_size=2)), expected)
+        # only the two most recent compounds are kept between chunks
+        self.assertEqual(segmented, [u'talossa', u'kissa', u'xyz',
+                                     u'koiralla', u'kissa', u'talossa'])
+
+    def test_copies(self):
+        random.seed(0)
+        model = BaselineModel()
+        model.load_data(_baseline_data())
+        model.train_batch()
+        words = [u'talossa', u'talossa', u'kissa', u'talossa']
+        expected = [model.viterbi_segment(w) for w in words]
+        results = []
+        for constructions, logp in segment_many(model, words, chunk_size=2):
+            results.append((list(constructions), logp))
+            constructions.append(u'xyz')
+        self.assertEqual(results, expected)
+
+
+class TestSegmentationCache(unittest.TestCase):
+    def test_lru(self):
+        cache = SegmentationCache(2)
+        cache.put(u'a', 1)
+        cache.put(u'b', 2)
+        self.assertEqual(cache.get(u'a'), 1)
+        cache.put(u'c', 3)
+        self.assertIsNone(cache.get(u'b'))
+        self.assertEqual(cache.stats(), (1, 1, 1, 2))
+
+    def test_invalidated(self):
+        model = BaselineModel()
+        model.load_data(_baseline_data())
+        model.train_batch()
+        model.set_segmentation_cache(10)
+        first = model.viterbi_segment(u'talokissa')
+        self.assertEqual(model.viterbi_segment(u'talokissa'), first)
+        self.assertEqual(model.get_segmentation_cache_stats(), (1, 1, 0, 1))
+        model._modify_construction_count(u'talokissa', 5)
+        self.assertEqual(model.get_segmentation_cache_stats()[3], 0)
+        self.assertEqual(model.viterbi_segment(u'talokissa'),
+                         model._viterbi_segment(u'talokissa'))
+
+    def test_persist(self):
+        for persist, size in ((False, 0), (True, 1)):
+            model = BaselineModel()
+            model.load_data(_baseline_data())
+            model.train_batch()
+            model.set_segmentation_cache(10, persist=persist)
+            model.viterbi_segment(u'talokissa', addcount=0)
+            model.make_segment_only()
+            model = pickle.loads(pickle.dumps(model))
+            self.assertEqual(model.get_segmentation_cache_stats(),
+                             (0, 0, 0, size))
+
+
+class TestAnalysisTable(unittest.TestCase):
+    def test_mapping(self):
+        table = AnalysisTable()
+        table[u'a'] = ConstrNode(1, 2, None)
+        table[u'b'] = ConstrNode(0, 3, (1,))
+        del table[u'a']
+        table[u'c'] = ConstrNode(0, 1, ())
+        self.assertEqual(list(table), [u'b', u'c'])
+        self.assertEqual(table[u'c'], ConstrNode(0, 1, ()))
+        self.assertIsNone(table.get(u'a'))
+        self.assertEqual(table.add_count(u'c', -1), (1, 0, ()))
+        self.assertNotIn(u'c', table)
+        self.assertEqual(table.add_count(u'd', 2), (0, 2, None))
+        self.assertEqual(table, {u'b': ConstrNode(0, 3, (1,)),
+                                 u'd': ConstrNode(0, 2, None)})
+        self.assertEqual(pickle.loads(pickle.dumps(table)), table)
+
+    def test_same_as_dict(self):
+        for model_class, data in ((BaselineModel, _baseline_data()),
+                                  (CognateModel, _cognate_data())):
+            models = []
+            for name in ('dict', 'array'):
+                random.seed(0)
+                model = model_class(corpusweight=1.0, analysis_table=name)
+                model.load_data(data)
+                model.train_batch()
+                models.append(model)
+            self.assertIsInstance(models[1]._analyses, AnalysisTable)
+            self.assertEqual(list(models[1]._analyses.items()),
+                             list(models[0]._analyses.items()))
+            self.assertEqual(models[1].get_cost(), models[0].get_cost())
+            models[1].make_segment_only()
+            self.assertIsInstance(models[1]._analyses, AnalysisTable)
+
+    def test_unknown(self):
+        self.assertRaises(MorfessorException, BaselineModel,
+                          analysis_table='list')
+
+
+class TestParallelTraining(unittest.TestCase):
+    def _check(self, model, data, **kwargs):
+        random.seed(0)
+        model.load_data(data)
+        epochs, cost = model.train_batch(jobs=2, **kwargs)
+        self.assertAlmostEqual(cost, model.get_cost())
+        for compound in model.get_compounds():
+            parts = model.segment(compound)
+            locs = list(model.cc.parts_to_splitlocs(parts))
+            self.assertEqual(list(model.cc.splitn(compound, locs)), parts)
+
+    def test_sync(self):
+        self._check(BaselineModel(), _baseline_data(), sync_interval=2)
+
+    def test_hogwild(self):
+        self._check(CognateModel(corpusweight=1.0), _cognate_data(),
+                    sync_mode='hogwild', sync_interval=1)
+
+    def test_sync_cognate(self):
+        self._check(CognateModel(corpusweight=1.0), _cognate_data(),
+                    sync_interval=2)
+
+    def test_changes(self):
+        # the changes of a worker give the master the same analyses
+        for model in (BaselineModel(), CognateModel(corpusweight=1.0)):
+            random.seed(0)
+            model.load_data(_cognate_data()
+                            if isinstance(model, CognateModel)
+                            else _baseline_data())
+            worker = pickle.loads(pickle.dumps(model))
+            journal = _AnalysisJournal(worker._analyses)
+            worker._analyses = journal
+            for compound in worker.get_compounds():
+                worker._recursive_optimize(compound)
+            worker._analyses = journal.analyses
+            _apply_changes(model, journal.changes())
+            # real constructions may have splitloc None or ()
+            self.assertEqual(
+                {c: node._replace(splitloc=node.splitloc or None)
+                 for c, node in model._analyses.items()},
+                {c: node._replace(splitloc=node.splitloc or None)
+                 for c, node in worker._analyses.items()})
+            self.assertAlmostEqual(model.get_cost(), worker.get_cost())
+
+    def test_workers_stopped(self):
+        model = BaselineModel()
+        model.load_data(_baseline_data())
+        self.assertRaises(MorfessorException, model.train_batch,
+                          algorithm='x', jobs=2)
+        self.assertEqual(multiprocessing.active_children(), [])
+
+    def test_unknown_mode(self):
+        model = BaselineModel()
+        model.load_data(_baseline_data())
+        self.assertRaises(MorfessorException, model.train_batch,
+                          jobs=2, sync_mode='async')
+
+
+if __name__ == '__main__':
+    unittest.main()
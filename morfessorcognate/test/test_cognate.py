@@ -0,0 +1,106 @@
+import random
+import unittest
+
+from morfessorcognate.baseline import BaselineModel
+from morfessorcognate.cognate import CognateModel, \
+    alignment_split_locations
+from morfessorcognate.constructions.cognate import \
+    CognateConstructionMethods, WILDCARD
+from morfessorcognate.test.test_cost import _cognate_data
+
+
+class TestWildcardViterbi(unittest.TestCase):
+    def setUp(self):
+        random.seed(0)
+        self.model = CognateModel(corpusweight=1.0)
+        self.model.load_data(_cognate_data())
+        self.model.train_batch()
+
+    def test_same_as_generic(self):
+        cc = CognateConstructionMethods
+        words = [u'talossa', u'koirassa', u'kissalla', u'gissala', u'xyz',
+                 u'talokoira', u'a']
+        params = [dict(addcount=0), dict(addcount=1.0),
+                  dict(addcount=0, maxlen=3, allow_longer_unk_splits=True),
+                  dict(addcount=0.5, maxlen=4)]
+        for word in words:
+            for compound in (cc.type(word, WILDCARD), cc.type(WILDCARD, word)):
+                for kwargs in params:
+                    self.assertEqual(
+                        self.model.viterbi_segment(compound, **kwargs),
+                        BaselineModel._viterbi_segment(
+                            self.model, compound, **kwargs))
+
+    def test_pair(self):
+        compound = CognateConstructionMethods.type(u'talossa', u'talosa')
+        self.assertEqual(
+            self.model.viterbi_segment(compound, addcount=0),
+            BaselineModel._viterbi_segment(self.model, compound, addcount=0))
+
+
+class TestAlignmentSplitLocations(unittest.TestCase):
+    pairs = [(u'talossa', u'talosa'), (u'kissalla', u'gissala'),
+             (u'talo', u'talo'), (u'koira', u'hund'), (u'a', u'ab')]
+
+    def test_subset(self):
+        cc = CognateConstructionMethods
+        for src, trg in self.pairs:
+            full = list(cc.split_locations(cc.type(src, trg)))
+            for band in range(4):
+                locations = alignment_split_locations(src, trg, band)
+                self.assertTrue(set(locations) <= set(full))
+                # in the order of split_locations
+                self.assertEqual(locations,
+                                 [loc for loc in full if loc in locations])
+            self.assertEqual(alignment_split_locations(src, trg, 10), full)
+
+    def test_band_edges(self):
+        # the alignment of talossa and talosa jumps over ss/s
+        path = [(i, i) for i in range(5)] + [(6, 5), (7, 6)]
+        self.assertEqual(alignment_split_locations(u'talossa', u'talosa'),
+                         [(1, 1), (2, 2), (3, 3), (4, 4), (6, 5)])
+        for band in (1, 2):
+            expected = [(i, j) for i in range(1, 7) for j in range(1, 6)
+                        if any(abs(i - pi) <= band and abs(j - pj) <= band
+                               for pi, pj in path)]
+            self.assertEqual(
+                alignment_split_locations(u'talossa', u'talosa', band),
+                expected)
+        self.assertNotIn((1, 4), alignment_split_locations(
+            u'talossa', u'talosa', 1))
+        self.assertIn((1, 4), alignment_split_locations(
+            u'talossa', u'talosa', 2))
+
+    def test_no_band(self):
+        cc = CognateConstructionMethods
+        model = CognateModel(corpusweight=1.0)
+        banded = CognateModel(corpusweight=1.0, align_band=0)
+        for src, trg in self.pairs:
+            for compound in (cc.type(src, trg), cc.type(src, WILDCARD),
+                             cc.type(WILDCARD, trg)):
+                full = list(cc.split_locations(compound))
+                self.assertEqual(list(model._split_locations(compound)),
+                                 full)
+                if WILDCARD in compound:
+                    self.assertEqual(
+                        list(banded._split_locations(compound)), full)
+
+
+class TestSegmentMany(unittest.TestCase):
+    def test_side(self):
+        random.seed(0)
+        model = CognateModel(corpusweight=1.0)
+        model.load_data(_cognate_data())
+        model.train_batch()
+        cc = CognateConstructionMethods
+        words = [u'talossa', u'gissa', u'talossa', u'koira']
+        for side, make in (('src', lambda w: cc.type(w, WILDCARD)),
+                           ('trg', lambda w: cc.type(WILDCARD, w))):
+            expected = [model.viterbi_segment(make(w), addcount=0)
+                        for w in words]
+            self.assertEqual(list(model.segment_many(
+                words, side=side, addcount=0, jobs=2)), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
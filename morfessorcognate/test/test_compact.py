@@ -0,0 +1,149 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from morfessorcognate import compact
+from morfessorcognate.baseline import BaselineModel
+from morfessorcognate.cognate import CognateModel
+from morfessorcognate.constructions.cognate import CognateConstructionMethods
+from morfessorcognate.data import DataPoint
+from morfessorcognate.exception import MorfessorException
+from morfessorcognate.io import MorfessorIO
+from morfessorcognate.test.test_baseline import _baseline_data
+from morfessorcognate.test.test_cost import _cognate_data
+
+
+class TestCompactModel(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.tmpdir, 'model.bin')
+        self.io = MorfessorIO()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _round_trip(self, model):
+        self.io.write_compact_model_file(self.file_name, model)
+        self.assertTrue(compact.is_compact_model_file(self.file_name))
+        loaded = self.io.read_binary_model_file(self.file_name)
+        self.assertIs(type(loaded), type(model))
+        self.assertEqual(loaded._analyses, model._analyses)
+        self.assertEqual(loaded.get_cost(), model.get_cost())
+        return loaded
+
+    def test_baseline(self):
+        model = BaselineModel(corpusweight=0.5)
+        model.load_data(_baseline_data())
+        model.train_batch()
+        loaded = self._round_trip(model)
+        self.assertEqual(loaded.cost.counts, model.cost.counts)
+        self.assertEqual(loaded.get_corpus_coding_weight(), 0.5)
+        for word in (u'talossa', u'kissalla', u'koiratalo'):
+            self.assertEqual(loaded.viterbi_segment(word),
+                             model.viterbi_segment(word))
+        # the loaded model can be trained further
+        loaded.train_batch()
+
+    def test_cognate(self):
+        model = CognateModel(corpusweight=1.0, edit_cache_size=10)
+        model.load_data(_cognate_data())
+        model.train_batch()
+        model.cost.set_edit_weight(0.5)
+        loaded = self._round_trip(model)
+        self.assertEqual(loaded.cost.edit_weight, 0.5)
+        self.assertEqual(loaded.cost.edit_cache.capacity, 10)
+        for compound in model.get_compounds():
+            self.assertEqual(loaded.viterbi_segment(compound),
+                             model.viterbi_segment(compound))
+        # the edit lexicon is built on first use, also when pickled
+        loaded = pickle.loads(pickle.dumps(loaded))
+        self.assertEqual(loaded.cost.edit_cost.most_common(),
+                         model.cost.edit_cost.most_common())
+        self.assertEqual(loaded.cost.edit_cost.cc._atoms,
+                         model.cost.edit_cost.cc._atoms)
+        loaded.train_batch()
+
+    def test_mapped_counts(self):
+        model = CognateModel(corpusweight=1.0)
+        model.load_data(_cognate_data())
+        model.train_batch()
+        self.io.write_compact_model_file(self.file_name, model)
+        with open(self.file_name, 'rb') as fobj:
+            data = fobj.read()
+        loaded = self.io.read_binary_model_file(self.file_name)
+        for cost in (loaded.cost.src_cost, loaded.cost.trg_cost,
+                     loaded.cost.edit_cost):
+            self.assertIsInstance(cost.counts, memoryview)
+            self.assertIsInstance(cost._lexicon_coding.atoms, memoryview)
+        self.assertEqual(list(loaded.cost.src_cost.counts),
+                         list(model.cost.src_cost.counts))
+        # pickled as arrays
+        copied = pickle.loads(pickle.dumps(loaded))
+        self.assertEqual(copied.get_cost(), loaded.get_cost())
+        # training modifies and grows the counts, but not the file
+        loaded.load_data(_cognate_data() + [DataPoint(
+            2, CognateConstructionMethods.type(u'xyz', u'xyw'), ())])
+        loaded.train_batch()
+        self.assertGreater(len(loaded.cost.src_cost.counts),
+                           len(model.cost.src_cost.counts))
+        with open(self.file_name, 'rb') as fobj:
+            self.assertEqual(fobj.read(), data)
+
+    def test_grown_counts(self):
+        model = CognateModel(corpusweight=1.0)
+        model.load_data(_cognate_data())
+        talo = model.cost.substrings.lookup(u'talo')
+        # a count that does not fit in 32 bits
+        model.cost.src_cost.counts[talo] = 1 << 40
+        model.cost.src_cost._lexicon_coding.atoms[0] = 1 << 40
+        self.io.write_compact_model_file(self.file_name, model)
+        loaded = self.io.read_binary_model_file(self.file_name)
+        cost = loaded.cost.src_cost
+        self.assertIsInstance(cost.counts, memoryview)
+        self.assertEqual(cost.counts[talo], 1 << 40)
+        new = cost.intern(u'xyzzy')
+        cost.counts[new] = 1 << 40
+        self.assertEqual(cost.counts.typecode, 'q')
+        self.assertEqual(cost.counts[talo], 1 << 40)
+        self.assertEqual(cost.counts[new], 1 << 40)
+        self.assertEqual(cost._lexicon_coding.atoms[0], 1 << 40)
+
+    def test_analysis_table(self):
+        model = BaselineModel(analysis_table='array')
+        model.load_data(_baseline_data())
+        model.train_batch()
+        loaded = self._round_trip(model)
+        self.assertEqual(loaded.analysis_table, 'array')
+        loaded.train_batch()
+
+    def test_segment_only(self):
+        model = CognateModel(corpusweight=1.0)
+        model.load_data(_cognate_data())
+        model.train_batch()
+        model.make_segment_only()
+        loaded = self._round_trip(model)
+        self.assertTrue(loaded._segment_only)
+        self.assertEqual(loaded._num_compounds, model._num_compounds)
+
+    def test_read_any_model(self):
+        model = BaselineModel()
+        model.load_data(_baseline_data())
+        model.train_batch()
+        self.io.write_compact_model_file(self.file_name, model)
+        loaded = self.io.read_any_model(self.file_name)
+        self.assertEqual(loaded._analyses, model._analyses)
+
+    def test_not_compact(self):
+        with open(self.file_name, 'wb') as fobj:
+            fobj.write(b'MORFCOGN')
+        self.assertTrue(compact.is_compact_model_file(self.file_name))
+        self.assertRaises(MorfessorException, compact.read_compact_model,
+                          self.file_name)
+        self.assertFalse(compact.is_compact_model_file(
+            os.path.join(self.tmpdir, 'missing')))
+
+
+if __name__ == '__main__':
+    unittest.main()
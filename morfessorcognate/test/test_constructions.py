@@ -0,0 +1,48 @@
+import itertools
+import unittest
+
+from morfessorcognate.constructions.base import BaseConstructionMethods
+from morfessorcognate.constructions.cognate import \
+    CognateConstructionMethods, WILDCARD
+from morfessorcognate.constructions.parallel import \
+    ParallelConstructionMethods
+from morfessorcognate.utils import tail
+
+
+class TestSplitLattice(unittest.TestCase):
+    def _check(self, cc, construction):
+        for maxlen in (1, 2, 3, 5, 30):
+            locations, predecessors = cc.split_lattice(construction, maxlen)
+            expected = list(itertools.chain(
+                [None], cc.split_locations(construction), [None]))
+            self.assertEqual(locations, expected)
+            for i in range(1, len(locations)):
+                preceding = tail(maxlen, itertools.chain(
+                    [None], cc.split_locations(construction,
+                                               stop=locations[i])))
+                self.assertEqual(
+                    [locations[j] for lo, hi in predecessors[i]
+                     for j in range(lo, hi)],
+                    list(preceding))
+
+    def test_base(self):
+        cc = BaseConstructionMethods()
+        for construction in (u'a', u'ab', u'abcdefghij'):
+            self._check(cc, construction)
+        cc = BaseConstructionMethods(nosplit_re=u'[bd].')
+        self._check(cc, u'abcdbdbe')
+
+    def test_parallel(self):
+        cc = ParallelConstructionMethods()
+        for g, p in ((u'hi!', u'hello'), (u'a', u'xyz'), (u'abcdefg', u'xyzw')):
+            self._check(cc, cc.type(g, p))
+
+    def test_cognate(self):
+        cc = CognateConstructionMethods()
+        for src, trg in ((u'abcdef', u'xyz'), (u'abcdefgh', WILDCARD),
+                         (WILDCARD, u'abcdefgh'), (u'a', u'b')):
+            self._check(cc, cc.type(src, trg))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import math
+import unittest
+
+from morfessorcognate import corpus
+from morfessorcognate.corpus import LexiconEncoding, CorpusEncoding, \
+    LogTables
+
+
+class TestLogTables(unittest.TestCase):
+    def setUp(self):
+        self.tables = LogTables(max_size=100)
+
+    def test_values(self):
+        for n in list(range(0, 150)) + [1000, 123456]:
+            self.assertAlmostEqual(self.tables.get_logfactorial(n),
+                                   LogTables.calc_logfactorial(n))
+            self.assertAlmostEqual(self.tables.get_nlogn(n),
+                                   LogTables.calc_nlogn(n))
+        self.assertEqual(len(self.tables.nlogn), 100)
+
+    def test_stirling(self):
+        for n in (20, 50, 500):
+            exact = sum(math.log(i) for i in range(2, n + 1))
+            self.assertAlmostEqual(self.tables.get_logfactorial(n), exact,
+                                   delta=1.0 / (10 * n))
+
+    def test_negative(self):
+        self.assertRaises(ValueError, corpus.nlogn, -1)
+        self.assertRaises(ValueError, corpus.logfactorial, -3)
+        self.assertRaises(ValueError, corpus.nlogn, -2.5)
+
+    def test_float(self):
+        for n in (0.5, 2.0, 7.25, 30.5, 1e7 + 0.5):
+            self.assertAlmostEqual(corpus.nlogn(n), n * math.log(n)
+                                   if n > 1 else 0.0)
+            self.assertAlmostEqual(corpus.logfactorial(n),
+                                   LogTables.calc_logfactorial(n))
+        self.assertAlmostEqual(corpus.logfactorial(4.0),
+                               math.log(24), places=9)
+        self.assertAlmostEqual(corpus.logfactorial(2.5),
+                               math.lgamma(3.5), places=9)
+
+
+class TestEncodingCost(unittest.TestCase):
+    def _encodings(self):
+        lexicon = LexiconEncoding()
+        corpus_coding = CorpusEncoding(lexicon, weight=0.7)
+        for i, (construction, count) in enumerate([
+                (u'talo', 31), (u'ssa', 3), (u'koira', 1200),
+                (u'n', 5), (u'kissa', 2)]):
+            lexicon.add(construction)
+            corpus_coding.update_count(construction, 0, count)
+        corpus_coding.boundaries += 900
+        return lexicon, corpus_coding
+
+    def test_tables_agree_with_direct(self):
+        lexicon, corpus_coding = self._encodings()
+        with_tables = (lexicon.get_cost(), corpus_coding.get_cost())
+
+        old_tables = corpus.log_tables
+        corpus.log_tables = LogTables(max_size=0)
+        try:
+            lexicon, corpus_coding = self._encodings()
+            direct = (lexicon.get_cost(), corpus_coding.get_cost())
+        finally:
+            corpus.log_tables = old_tables
+
+        for a, b in zip(with_tables, direct):
+            self.assertAlmostEqual(a, b, places=9)
+
+    def test_cached_cost(self):
+        lexicon, corpus_coding = self._encodings()
+        for change in (lambda: corpus_coding.update_count(u'n', 5, 7),
+                       lambda: setattr(corpus_coding, 'weight', 2.0),
+                       lambda: lexicon.add(u'kala'),
+                       lambda: lexicon.remove(u'kala')):
+            corpus_coding.get_cost()
+            lexicon.get_cost()
+            change()
+            self.assertEqual(corpus_coding.get_cost(),
+                             corpus_coding._calc_cost(0, 0, 0.0, 0))
+            self.assertEqual(lexicon.get_cost(),
+                             lexicon._calc_cost(0, 0, 0.0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,236 @@
+import collections
+import os
+import pickle
+import unittest
+
+from morfessorcognate.baseline import BaselineModel
+from morfessorcognate.cognate import CognateCost, CognateModel, EditCache, \
+    EditCost, SubstringCost, edits
+from morfessorcognate.cost import Cost
+from morfessorcognate.constructions.cognate import \
+    CognateConstructionMethods, WILDCARD
+from morfessorcognate.data import DataPoint
+
+
+def _cognate_data():
+    cc = CognateConstructionMethods
+    pairs = [(3, u'talossa', u'talosa'), (2, u'koirassa', u'koirasa'),
+             (1, u'talo', u'talo'), (4, u'koira', WILDCARD),
+             (2, WILDCARD, u'gissa'), (1, u'kissalla', u'gissala')]
+    return [DataPoint(count, cc.type(src, trg), ())
+            for count, src, trg in pairs]
+
+
+class TestDeltaCost(unittest.TestCase):
+    def _check_deltas(self, model, changes):
+        deltas = collections.Counter()
+        for construction, dcount in changes:
+            model._collect_count_deltas(construction, dcount, deltas)
+        predicted = model.get_cost(deltas)
+
+        for construction, dcount in changes:
+            model._modify_construction_count(construction, dcount)
+        actual = model.get_cost()
+        for construction, dcount in changes:
+            model._modify_construction_count(construction, -dcount)
+
+        self.assertAlmostEqual(predicted, actual, places=6)
+
+    def test_baseline(self):
+        model = BaselineModel()
+        model.load_data([DataPoint(2, u'talossa', ()),
+                         DataPoint(1, u'koirassa', ()),
+                         DataPoint(3, u'talo', ())])
+        model.train_batch()
+        self._check_deltas(model, [(u'talo', 2), (u'ssa', 2)])
+        self._check_deltas(model, [(u'koi', 1), (u'rassa', 1)])
+        self._check_deltas(model, [(u'xyz', 1), (u'talo', -3)])
+
+    def test_cognate(self):
+        cc = CognateConstructionMethods
+        model = CognateModel(corpusweight=1.0)
+        model.load_data(_cognate_data())
+        model.train_batch()
+        self._check_deltas(model, [(cc.type(u'talo', u'talo'), 2),
+                                   (cc.type(u'ssa', u'sa'), 2)])
+        self._check_deltas(model, [(cc.type(u'kis', u'gis'), 1),
+                                   (cc.type(u'salla', u'sala'), 1),
+                                   (cc.type(u'kis', WILDCARD), 3)])
+        self._check_deltas(model, [(cc.type(WILDCARD, u'öö'), 1)])
+
+    def test_no_mutation(self):
+        cc = CognateConstructionMethods
+        model = CognateModel(corpusweight=1.0)
+        model.load_data(_cognate_data())
+        before = model.get_cost()
+        analyses = dict(model._analyses)
+        deltas = collections.Counter({cc.type(u'tal', u'tal'): 5,
+                                      cc.type(u'q', WILDCARD): 1})
+        model.get_cost(deltas)
+        self.assertEqual(model.get_cost(), before)
+        self.assertEqual(model._analyses, analyses)
+
+
+class TestEditCache(unittest.TestCase):
+    def test_lru(self):
+        cache = EditCache(2)
+        self.assertEqual(cache(u'talo', u'dalo'),
+                         tuple(edits(u'talo', u'dalo')))
+        cache(u'talo', u'dalo')
+        cache(u'kala', u'gala')
+        cache(u'vesi', u'vesi')
+        self.assertEqual(cache.stats(), (1, 3, 2))
+
+    def test_not_pickled(self):
+        model = CognateModel(corpusweight=1.0, edit_cache_size=10)
+        model.load_data(_cognate_data())
+        self.assertGreater(model.cost.edit_cache.stats()[2], 0)
+        model = pickle.loads(pickle.dumps(model))
+        self.assertEqual(model.cost.edit_cache.stats(), (0, 0, 0))
+        self.assertEqual(model.cost.edit_cache.capacity, 10)
+
+    def test_pickled_without_cache(self):
+        model = CognateModel(corpusweight=1.0)
+        model.load_data(_cognate_data())
+        state = dict(model.cost.__dict__)
+        del state['edit_cache']
+        model.cost = CognateCost.__new__(CognateCost)
+        model.cost.__setstate__(state)
+        self.assertEqual(model.cost.edit_cache.capacity,
+                         EditCache.default_capacity)
+        model.train_batch()
+
+    def test_lookup(self):
+        interned = []
+        cache = EditCache(10, lambda edit: interned.append(edit) or edit)
+        self.assertEqual(cache.lookup(u'talo', u'dalo'),
+                         tuple(edits(u'talo', u'dalo')))
+        self.assertEqual(interned, [])
+        self.assertEqual(cache(u'talo', u'dalo'),
+                         tuple(edits(u'talo', u'dalo')))
+        self.assertEqual(interned, list(edits(u'talo', u'dalo')))
+        # the edit operations were computed once
+        self.assertEqual(cache.stats(), (1, 1, 1))
+
+
+class TestEditCost(unittest.TestCase):
+    changes = [(u'ä/a', 3), (u'k/g', 1), (u'ss/s', 2), (u'/h', 1),
+               (u'k/g', 2), (u'ä/a', -3), (u'ss/s', 1), (u'/h', 2)]
+
+    def _costs(self):
+        """Return an EditCost and a string keyed Cost after the changes."""
+        interned = EditCost()
+        cost = Cost(CognateConstructionMethods())
+        for edit, delta in self.changes:
+            interned.update(interned.intern(edit), delta)
+            cost.update(edit, delta)
+        return interned, cost
+
+    def test_ids(self):
+        cost = EditCost()
+        ids = [cost.intern(edit) for edit, _ in self.changes]
+        self.assertEqual(sorted(set(ids)), list(range(4)))
+        for (edit, _), edit_id in zip(self.changes, ids):
+            self.assertEqual(cost.intern(edit), edit_id)
+            self.assertEqual(cost.cc.to_string(edit_id), edit)
+        self.assertEqual(len(cost.counts), 4)
+
+    def test_most_common(self):
+        interned, cost = self._costs()
+        self.assertEqual(interned.most_common(), cost.counts.most_common())
+        self.assertEqual([edit for edit, _ in interned.most_common()],
+                         [u'k/g', u'ss/s', u'/h', u'ä/a'])
+
+    def test_cost(self):
+        interned, cost = self._costs()
+        self.assertAlmostEqual(interned.cost(), cost.cost())
+        deltas = {u'k/g': -3, u'ö/o': 2, u'ä/a': 1}
+        self.assertAlmostEqual(interned.cost(deltas), cost.cost(deltas))
+
+    def test_deltas_not_interned(self):
+        model = CognateModel(corpusweight=1.0)
+        model.load_data(_cognate_data())
+        edit_cost = model.cost.edit_cost
+        strings = list(edit_cost.cc.strings)
+        cc = model.cc
+        model.get_cost(collections.Counter({cc.type(u'kissa', u'xyz'): 1,
+                                            cc.type(u'tal', u'dal'): 2}))
+        self.assertEqual(edit_cost.cc.strings, strings)
+        self.assertEqual(len(edit_cost.counts), len(strings))
+
+
+class TestSubstringTable(unittest.TestCase):
+    def _trained(self):
+        model = CognateModel(corpusweight=1.0)
+        model.load_data(_cognate_data())
+        model.train_batch()
+        return model
+
+    def test_shared(self):
+        model = self._trained()
+        cost = model.cost
+        substrings = cost.substrings
+        self.assertIs(cost.src_cost.cc, substrings)
+        self.assertIs(cost.trg_cost.cc, substrings)
+        # talo is seen on both sides, but interned once
+        talo = substrings.lookup(u'talo')
+        self.assertEqual(substrings.strings.count(u'talo'), 1)
+        self.assertEqual(cost.src_cost.counts[talo],
+                         cost.src_cost.count(u'talo'))
+        self.assertEqual(cost.src_cost.count(u'xyz'), 0)
+        self.assertIsNone(substrings.lookup(u'xyz'))
+        self.assertEqual(
+            model.get_construction_count(model.cc.type(WILDCARD, u'gissa')),
+            cost.trg_cost.count(u'gissa'))
+
+    def test_old_pickle(self):
+        model = self._trained()
+        # the state of a CognateCost with string keyed src and trg costs
+        state = dict(model.cost.__dict__)
+        del state['substrings']
+        for name in ('src_cost', 'trg_cost'):
+            interned = state[name]
+            cost = Cost(model.cc)
+            cost.counts.update(interned.substring_counts())
+            cost._lexicon_coding.atoms.update(interned.atom_counts())
+            for attr in ('tokens', 'boundaries', 'logtokensum'):
+                setattr(cost._lexicon_coding, attr,
+                        getattr(interned._lexicon_coding, attr))
+            cost._corpus_coding = pickle.loads(
+                pickle.dumps(interned._corpus_coding))
+            state[name] = cost
+        converted = CognateCost.__new__(CognateCost)
+        converted.__setstate__(state)
+        self.assertAlmostEqual(converted.cost(), model.cost.cost())
+        for name in ('src_cost', 'trg_cost'):
+            self.assertEqual(getattr(converted, name).substring_counts(),
+                             getattr(model.cost, name).substring_counts())
+
+    def test_baseline_pickle(self):
+        # a model trained on _cognate_data and pickled before the costs
+        # were interned or the edit operations cached
+        path = os.path.join(os.path.dirname(__file__), 'data',
+                            'baseline_cognate_model.pickle')
+        with open(path, 'rb') as fobj:
+            model = pickle.load(fobj)
+        cost = model.cost
+        self.assertIsInstance(cost.src_cost, SubstringCost)
+        self.assertIsInstance(cost.trg_cost, SubstringCost)
+        self.assertIsInstance(cost.edit_cost, EditCost)
+        # the costs of the model when it was pickled
+        self.assertAlmostEqual(cost.src_cost.cost(), 110.18346797081767)
+        self.assertAlmostEqual(cost.trg_cost.cost(), 102.02570582831166)
+        self.assertAlmostEqual(cost.edit_cost.cost(), 40.13323512560558)
+        self.assertEqual(
+            [pair for pair in cost.edit_cost.most_common() if pair[1]],
+            [(u'ss/s', 5), (u'k/g', 1), (u'l/', 1)])
+        self.assertEqual(cost.src_cost.count(u'talo'), 4)
+        model.train_batch()
+        self.assertGreater(cost.edit_cache.stats()[2], 0)
+        self.assertEqual(
+            model.viterbi_segment(model.cc.type(u'talossa', u'talosa'))[0],
+            [model.cc.type(u'talo', u'talo'), model.cc.type(u'ssa', u'sa')])
+
+
+if __name__ == '__main__':
+    unittest.main()
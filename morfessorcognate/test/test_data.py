@@ -0,0 +1,69 @@
+import random
+import unittest
+from unittest import mock
+
+from morfessorcognate.constructions.cognate import CognateConstruction, \
+    WILDCARD
+from morfessorcognate.data import DataPoint, _write_run, \
+    external_merge_counts, external_sort, merge_counts
+
+
+def _random_data(n, types=200, seed=0):
+    rng = random.Random(seed)
+    return [DataPoint(rng.randint(1, 5), u'w%d' % rng.randrange(types),
+                      (rng.randint(0, 3),))
+            for _ in range(n)]
+
+
+class TestExternalCounting(unittest.TestCase):
+    def test_sort(self):
+        rng = random.Random(0)
+        items = [rng.random() for _ in range(100)]
+        self.assertEqual(list(external_sort(items, 7)), sorted(items))
+        self.assertEqual(list(external_sort(items, 10)), sorted(items))
+        self.assertEqual(list(external_sort([], 10)), [])
+
+    def test_same_as_merge_counts(self):
+        data = _random_data(2000)
+        expected = list(merge_counts(data))
+        for max_items in (10, 199, 1000):
+            self.assertEqual(
+                list(external_merge_counts(iter(data), max_items,
+                                           chunk_size=33)),
+                expected)
+
+    def test_cognate(self):
+        rng = random.Random(1)
+        data = [DataPoint(1, CognateConstruction(
+                    rng.choice([u'talo', u'kissa', WILDCARD]),
+                    rng.choice([u'talo', u'gissa', WILDCARD])), ())
+                for _ in range(100)]
+        self.assertEqual(list(external_merge_counts(data, 2)),
+                         list(merge_counts(data)))
+
+    def test_jobs(self):
+        data = _random_data(1000)
+        self.assertEqual(
+            list(external_merge_counts(data, 50, jobs=2, chunk_size=100)),
+            list(merge_counts(data)))
+
+    def test_bounded_runs(self):
+        data = _random_data(2000)
+        sizes = []
+
+        def write_run(items, tmpdir):
+            sizes.append(len(items))
+            return _write_run(items, tmpdir)
+
+        with mock.patch('morfessorcognate.data._write_run', write_run):
+            for jobs in (1, 2):
+                self.assertEqual(
+                    list(external_merge_counts(data, 50, jobs=jobs,
+                                               chunk_size=1000)),
+                    list(merge_counts(data)))
+        self.assertGreater(len(sizes), 2)
+        self.assertLessEqual(max(sizes), 50)
+
+
+if __name__ == '__main__':
+    unittest.main()
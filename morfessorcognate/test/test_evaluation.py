@@ -0,0 +1,158 @@
+import random
+import unittest
+
+from morfessorcognate.baseline import BaselineModel
+from morfessorcognate.corpus import AnnotationCorpusWeight
+from morfessorcognate.evaluation import EvaluationConfig, \
+    MorfessorEvaluation, boundary_mask, boundary_scores
+from morfessorcognate.test.test_baseline import _baseline_data
+
+
+def _annotations():
+    rng = random.Random(0)
+    stems = [u'talo', u'koira', u'kissa', u'järvi']
+    suffixes = [u'ssa', u'lla', u'n', u'a']
+    annotations = {}
+    for stem in stems:
+        for suffix in suffixes:
+            annotations[stem + suffix] = [[stem, suffix]]
+            if rng.random() < 0.5:
+                annotations[stem + suffix].append([stem + suffix])
+        annotations[stem] = [[stem]]
+    return annotations
+
+
+def _splits(segmentation):
+    return set(MorfessorEvaluation._segmentation_indices(segmentation))
+
+
+def _set_recall(prediction, reference):
+    """Best recall of a word computed with sets of split indices."""
+    best = None
+    for ref in map(_splits, reference):
+        if len(ref) == 0:
+            return 1.0
+        for pre in map(_splits, prediction):
+            recall = len(ref & pre) / float(len(ref))
+            if best is None or recall > best:
+                best = recall
+    return best
+
+
+def _random_segmentation(rng, word):
+    splits = sorted(rng.sample(range(1, len(word)),
+                               rng.randint(0, len(word) - 1)))
+    return [word[i:j] for i, j in zip([0] + splits, splits + [len(word)])]
+
+
+class CountingModel(BaselineModel):
+    def __init__(self):
+        super(CountingModel, self).__init__()
+        self.segmented = []
+
+    def viterbi_segment(self, compound, addcount=1.0, maxlen=30):
+        self.segmented.append(compound)
+        return super(CountingModel, self).viterbi_segment(
+            compound, addcount, maxlen)
+
+
+class TestEvaluateModel(unittest.TestCase):
+    def setUp(self):
+        random.seed(0)
+        self.model = CountingModel()
+        self.model.load_data(_baseline_data())
+        self.model.train_batch()
+        self.evaluation = MorfessorEvaluation(_annotations())
+        self.config = EvaluationConfig(5, 12)
+
+    def _expected(self):
+        """Evaluate each sample separately with sets of split indices."""
+        result = []
+        for sample in self.evaluation.get_samples(self.config):
+            words = sorted(sample)
+            recall = precision = 0.0
+            for word in words:
+                if len(word) < 2:
+                    continue
+                prediction = [self.model.viterbi_segment(word)[0]]
+                reference = _annotations()[word]
+                recall += _set_recall(prediction, reference)
+                precision += _set_recall(reference, prediction)
+            precision /= len(words)
+            recall /= len(words)
+            result.append((precision, recall,
+                           2.0 / (1.0 / precision + 1.0 / recall),
+                           len(words)))
+        return result
+
+    def test_segment_once(self):
+        expected = self._expected()
+        self.model.segmented = []
+        result = self.evaluation.evaluate_model(self.model, self.config)
+        self.assertEqual(list(zip(result.precision, result.recall,
+                                  result.fscore, result.samplesize)),
+                         expected)
+        self.assertEqual(sorted(self.model.segmented),
+                         sorted(set(self.model.segmented)))
+
+    def test_precomputed(self):
+        segmentation = self.evaluation.segment_samples(self.model,
+                                                       self.config)
+        self.model.segmented = []
+        first = self.evaluation.evaluate_model(
+            self.model, self.config, segmentation=segmentation)
+        self.assertEqual(self.model.segmented, [])
+        del segmentation[sorted(segmentation)[0]]
+        second = self.evaluation.evaluate_model(
+            self.model, self.config, segmentation=segmentation)
+        self.assertEqual(len(self.model.segmented), 1)
+        self.assertEqual(first.fscore, second.fscore)
+
+    def test_jobs(self):
+        result = self.evaluation.evaluate_model(self.model, self.config,
+                                                jobs=2)
+        expected = self.evaluation.evaluate_model(self.model, self.config)
+        self.assertEqual(result.fscore, expected.fscore)
+
+
+class TestBoundaryScores(unittest.TestCase):
+    def test_mask(self):
+        self.assertEqual(boundary_mask([u'talo', u'ssa']), 1 << 4)
+        self.assertEqual(boundary_mask([u'ta', u'lo', u'ssa']),
+                         (1 << 2) | (1 << 4))
+        self.assertEqual(boundary_mask([u'talossa']), 0)
+        self.assertEqual(boundary_mask([(u'ta', u'lo'), (u'ssa',)]), 1 << 2)
+
+    def test_same_as_sets(self):
+        rng = random.Random(0)
+        words = [u''.join(rng.choice(u'abc')
+                          for _ in range(rng.randint(1, 9)))
+                 for _ in range(300)]
+        predictions = [[_random_segmentation(rng, word)
+                        for _ in range(rng.randint(0, 3))] for word in words]
+        references = [[_random_segmentation(rng, word)
+                       for _ in range(rng.randint(0, 3))] for word in words]
+        masks = lambda segs: [[boundary_mask(s) for s in alternatives]
+                              for alternatives in segs]
+        recalls, precisions = boundary_scores(masks(predictions),
+                                              masks(references))
+        self.assertEqual(
+            recalls,
+            [_set_recall(p, r) for p, r in zip(predictions, references)])
+        self.assertEqual(
+            precisions,
+            [_set_recall(r, p) for p, r in zip(predictions, references)])
+
+    def test_annotation_corpus_weight(self):
+        prediction = [[[u'talo', u'ssa']], [[u'ko', u'ira']], [[u'kissa']]]
+        reference = [[[u'talo', u'ssa']], [[u'koira'], [u'koi', u'ra']],
+                     [[u'ki', u'ssa']]]
+        pre, rec, f = AnnotationCorpusWeight._bpr_evaluation(prediction,
+                                                             reference)
+        self.assertAlmostEqual(pre, (1.0 + 0.0 + 1.0) / 3)
+        self.assertAlmostEqual(rec, (1.0 + 1.0 + 0.0) / 3)
+        self.assertAlmostEqual(f, 2.0 / 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,205 @@
+import collections
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from morfessorcognate import io as morfessor_io
+from morfessorcognate.constructions.cognate import CognateConstruction, \
+    FIVEDOT, WILDCARD
+from morfessorcognate.data import DataPoint
+from morfessorcognate.exception import MorfessorException
+from morfessorcognate.io import MorfessorIO, open_binary_file
+
+
+class TestTextFiles(unittest.TestCase):
+    lines = [u'# comment', u'talossa kissa', u'', u'järvellä  koira']
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, name, encoding='utf-8'):
+        file_name = os.path.join(self.tmpdir, name)
+        with open_binary_file(file_name, 'wb') as fobj:
+            fobj.write(u'\n'.join(self.lines).encode(encoding) + b'\n')
+        return file_name
+
+    def test_compressed(self):
+        expected = [(1, u'talossa'), (1, u'kissa'), (1, u'järvellä'),
+                    (1, u'koira')]
+        for name in ('corpus.txt', 'corpus.gz', 'corpus.bz2', 'corpus.xz'):
+            file_name = self._write(name)
+            self.assertEqual(
+                list(MorfessorIO().read_corpus_file(
+                    file_name, retain_newlines=False))[2:],
+                expected)
+
+    def test_write_read(self):
+        file_name = os.path.join(self.tmpdir, 'lexicon.xz')
+        mio = MorfessorIO(encoding='utf-8')
+        mio.write_lexicon_file(file_name, [(u'järvi', 2), (u'talo', 1)])
+        self.assertEqual(list(mio._read_text_file(file_name)),
+                         [u'2 järvi', u'1 talo'])
+
+    def test_encoding_sample(self):
+        file_name = self._write('corpus.txt')
+        old_size = morfessor_io.ENCODING_SAMPLE_SIZE
+        # the sample ends in the middle of a two-byte character
+        morfessor_io.ENCODING_SAMPLE_SIZE = len(
+            (u'\n'.join(self.lines[:3]) + u'\nj').encode('utf-8')) + 1
+        try:
+            self.assertEqual(MorfessorIO()._find_encoding(file_name),
+                             'utf-8')
+        finally:
+            morfessor_io.ENCODING_SAMPLE_SIZE = old_size
+
+
+class TestCounting(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        rng = random.Random(0)
+        words = [u'talo', u'kissa', u'järvi', u'koira', u'Talo']
+        self.lines = [u' '.join(rng.choice(words)
+                                for _ in range(rng.randint(0, 6)))
+                      for _ in range(300)]
+        self.old_part_size = morfessor_io.COUNT_PART_SIZE
+        morfessor_io.COUNT_PART_SIZE = 97
+
+    def tearDown(self):
+        morfessor_io.COUNT_PART_SIZE = self.old_part_size
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, name, lines):
+        file_name = os.path.join(self.tmpdir, name)
+        with open_binary_file(file_name, 'wb') as fobj:
+            fobj.write(u''.join(line + u'\n' for line in lines)
+                       .encode('utf-8'))
+        return file_name
+
+    def test_parts(self):
+        file_name = self._write('corpus.txt', self.lines)
+        with open(file_name, 'rb') as fobj:
+            data = fobj.read()
+        parts = morfessor_io._line_aligned_parts(file_name, 3, 97)
+        self.assertEqual(parts[0][0], 0)
+        self.assertEqual(parts[-1][1], len(data))
+        for (_, end), (start, _) in zip(parts, parts[1:]):
+            self.assertEqual(end, start)
+            self.assertEqual(data[start - 1:start], b'\n')
+
+    def test_corpus_files(self):
+        file_names = [self._write('a.txt', self.lines[:200]),
+                      self._write('b.gz', self.lines[200:])]
+        for lowercase in (False, True):
+            mio = MorfessorIO(lowercase=lowercase)
+            expected = collections.Counter()
+            for count, compound in mio.read_corpus_files(
+                    file_names, retain_newlines=False):
+                expected[compound] += count
+            for jobs in (1, 2):
+                counts = MorfessorIO(lowercase=lowercase).count_corpus_files(
+                    file_names, jobs)
+                self.assertEqual(counts, expected)
+                self.assertEqual(list(counts), list(expected))
+
+    def test_corpus_list_files(self):
+        lines = [u'%d %s' % (i % 4, line)
+                 for i, line in enumerate(self.lines) if line]
+        file_name = self._write('list.txt', [u'# comment'] + lines)
+        mio = MorfessorIO(atom_separator=u' ')
+        expected = collections.Counter()
+        for count, compound in mio.read_corpus_list_files([file_name]):
+            expected[compound] += count
+        self.assertEqual(mio.count_corpus_list_files([file_name], 2),
+                         expected)
+
+    def test_cognate_files(self):
+        rows = [(i % 3, u'', u'kissa') if i % 5 == 0 else
+                (i % 3, line.split(u' ')[0], u'gissa')
+                for i, line in enumerate(self.lines)]
+        file_name = self._write(
+            'pairs.txt', [u'%d\t%s\t%s' % row for row in rows])
+        for jobs in (1, 2):
+            counts = MorfessorIO().count_cognate_files([file_name], jobs)
+            self.assertEqual(counts, collections.Counter(rows))
+            self.assertEqual(list(counts), list(collections.Counter(rows)))
+
+
+class TestCognateData(unittest.TestCase):
+    rows = [u'3\ttalo\ttalo', u'1\tkissa\t', u'0\t\tgissa',
+            u'3\ttalo\ttalo', u'7\tkissa\t']
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.tmpdir, 'pairs.tsv')
+        self._write(self.rows)
+        self.cache_dir = os.path.join(self.tmpdir, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, rows):
+        with open(self.file_name, 'wb') as fobj:
+            fobj.write(u''.join(row + u'\n' for row in rows)
+                       .encode('utf-8'))
+
+    def _read(self, mio=None, **kwargs):
+        if mio is None:
+            mio = MorfessorIO(encoding='utf-8')
+        return mio.read_cognate_data_file(
+            self.file_name, cache_dir=self.cache_dir, **kwargs)
+
+    def test_preprocessing(self):
+        talo = u'talo' + FIVEDOT
+        kissa = u'kissa' + FIVEDOT
+        self.assertEqual(self._read(), [
+            DataPoint(4, CognateConstruction(talo, talo), ()),
+            DataPoint(4, CognateConstruction(kissa, WILDCARD), ()),
+            DataPoint(0, CognateConstruction(WILDCARD, u'gissa' + FIVEDOT),
+                      ())])
+        self.assertEqual(
+            [dp.count for dp in self._read(use_epsilon=False,
+                                           dampening='none')],
+            [6, 8, 0])
+        self.assertRaises(MorfessorException, self._read, dampening='x')
+
+    def test_cache(self):
+        expected = self._read()
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        os.remove(self.file_name)
+        self._write(self.rows)
+        # the cache is used without parsing the file again
+        old_count = MorfessorIO.count_cognate_files
+        MorfessorIO.count_cognate_files = None
+        try:
+            data = self._read()
+        finally:
+            MorfessorIO.count_cognate_files = old_count
+        self.assertEqual(data, expected)
+        self.assertEqual(data[0].compound.src, u'talo' + FIVEDOT)
+        self.assertEqual(data[2].compound.src, WILDCARD)
+
+        self._read(use_epsilon=False)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+        self._write(self.rows[:2])
+        self.assertEqual(len(self._read()), 2)
+
+    def test_cache_io_settings(self):
+        self._write([u'1\tTalo\tTalo', u'2\tkissa\tgissa'])
+        lowercased = self._read(MorfessorIO(encoding='utf-8',
+                                            lowercase=True))
+        self.assertEqual(lowercased[0].compound.src, u'talo' + FIVEDOT)
+        data = self._read()
+        self.assertEqual(data[0].compound.src, u'Talo' + FIVEDOT)
+        self.assertEqual(len(data), 2)
+        data = self._read(MorfessorIO(encoding='utf-8', comment_start='2'))
+        self.assertEqual(len(data), 1)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
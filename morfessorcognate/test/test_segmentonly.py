@@ -0,0 +1,127 @@
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from morfessorcognate.baseline import BaselineModel
+from morfessorcognate.cognate import CognateModel
+from morfessorcognate.constructions.cognate import WILDCARD
+from morfessorcognate.exception import MorfessorException
+from morfessorcognate.io import MorfessorIO
+from morfessorcognate.segmentonly import SegmentOnlyModel, _double_array
+from morfessorcognate.test.test_baseline import _baseline_data
+from morfessorcognate.test.test_cost import _cognate_data
+
+
+class TestDoubleArray(unittest.TestCase):
+    def test_lookup(self):
+        morphs = [u'ta', u'talo', u'ssa', u'sa', u'kissa', u'a']
+        alphabet, base, check, value = _double_array(morphs)
+        codes = {atom: i + 1 for i, atom in enumerate(alphabet)}
+        for i, morph in enumerate(morphs):
+            state = 0
+            for atom in morph:
+                child = base[state] + codes[atom]
+                self.assertEqual(check[child], state)
+                state = child
+            self.assertEqual(value[state], i)
+
+
+class TestSegmentOnlyModel(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.tmpdir, 'model.bin')
+        self.io = MorfessorIO()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _compile(self, model):
+        self.io.write_segment_only_model_file(self.file_name, model)
+        compiled = self.io.read_binary_model_file(self.file_name)
+        self.assertIsInstance(compiled, SegmentOnlyModel)
+        self.addCleanup(compiled.close)
+        return compiled
+
+    def _check_same(self, model, compiled, compounds):
+        for addcount in (0, 1.0):
+            for compound in compounds:
+                self.assertEqual(
+                    compiled.viterbi_segment(compound, addcount),
+                    model.viterbi_segment(compound, addcount))
+
+    def test_baseline(self):
+        model = BaselineModel()
+        model.load_data(_baseline_data())
+        model.train_batch()
+        compiled = self._compile(model)
+        self._check_same(model, compiled,
+                         [u'talossa', u'koiratalolla', u'xyz', u'a'])
+        self.assertRaises(MorfessorException, compiled.segment_many,
+                          [u'talo'], side='src')
+
+    def test_cognate(self):
+        model = CognateModel(corpusweight=1.0)
+        model.load_data(_cognate_data())
+        model.train_batch()
+        compiled = self._compile(model)
+        words = [u'talossa', u'kissalla', u'gissa', u'koirat', u'xyz']
+        self._check_same(
+            model, compiled,
+            [model.cc.type(w, WILDCARD) for w in words] +
+            [model.cc.type(WILDCARD, w) for w in words])
+        self.assertEqual(
+            list(compiled.segment_many(words, side='trg', addcount=0)),
+            list(model.segment_many(words, side='trg', addcount=0)))
+        self.assertEqual(list(compiled.segment_many(words, 'src', 0)),
+                         list(model.segment_many(words, 'src', 0)))
+        self.assertRaises(MorfessorException, compiled.viterbi_segment,
+                          model.cc.type(u'talo', u'talo'))
+
+    def test_pickle(self):
+        model = CognateModel(corpusweight=1.0)
+        model.load_data(_cognate_data())
+        model.train_batch()
+        compiled = self._compile(model)
+        compiled.set_segmentation_cache(10)
+        compound = model.cc.type(u'talossa', WILDCARD)
+        expected = compiled.viterbi_segment(compound, 0)
+        loaded = pickle.loads(pickle.dumps(compiled))
+        self.addCleanup(loaded.close)
+        self.assertEqual(loaded.viterbi_segment(compound, 0), expected)
+        self.assertEqual(loaded.get_segmentation_cache_stats(), (0, 1, 0, 1))
+
+    def test_without_levenshtein(self):
+        model = CognateModel(corpusweight=1.0)
+        model.load_data(_cognate_data())
+        model.train_batch()
+        self.io.write_segment_only_model_file(self.file_name, model)
+        expected = [' '.join(c.src for c in cs)
+                    for cs, _ in model.segment_many([u'talossa', u'talo'],
+                                                    side='src', addcount=0)]
+        code = ("import sys\n"
+                "sys.modules['Levenshtein'] = None\n"
+                "from morfessorcognate.segmentonly import SegmentOnlyModel\n"
+                "model = SegmentOnlyModel(sys.argv[1])\n"
+                "for cs, _ in model.segment_many(['talossa', 'talo'],\n"
+                "                                side='src', addcount=0):\n"
+                "    print(' '.join(c.src for c in cs))\n"
+                "assert 'morfessorcognate.cognate' not in sys.modules\n")
+        output = subprocess.check_output(
+            [sys.executable, '-c', code, self.file_name],
+            stderr=subprocess.STDOUT)
+        self.assertEqual(output.decode('utf-8').splitlines()[-2:], expected)
+
+    def test_levenshtein_not_imported(self):
+        code = ("import sys\n"
+                "from morfessorcognate.segmentonly import SegmentOnlyModel\n"
+                "assert 'Levenshtein' not in sys.modules\n"
+                "assert 'morfessorcognate.cognate' not in sys.modules\n")
+        subprocess.check_call([sys.executable, '-c', code])
+
+
+if __name__ == '__main__':
+    unittest.main()
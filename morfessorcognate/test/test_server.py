@@ -0,0 +1,177 @@
+import asyncio
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+
+from morfessorcognate.baseline import BaselineModel
+from morfessorcognate.cognate import CognateModel
+from morfessorcognate.exception import MorfessorException
+from morfessorcognate.server import SegmentationServer, connect, \
+    parse_address, segment_remote, segment_words
+from morfessorcognate.test.test_baseline import _baseline_data
+from morfessorcognate.test.test_cost import _cognate_data
+
+
+class _ServerThread(object):
+    """Run a segmentation server in an event loop of a local thread."""
+    def __init__(self, server, address):
+        self.server = server
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.aserver = self.loop.run_until_complete(
+                server.start(address))
+            started.set()
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=run)
+        self.thread.daemon = True
+        self.thread.start()
+        started.wait(10)
+        family, _ = parse_address(address)
+        if family == socket.AF_UNIX:
+            self.address = address
+        else:
+            host, port = self.aserver.sockets[0].getsockname()[:2]
+            self.address = 'tcp:%s:%d' % (host, port)
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(
+            self.server.stop(self.aserver), self.loop).result(10)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(10)
+        self.loop.close()
+
+
+class TestSegmentationServer(unittest.TestCase):
+    def setUp(self):
+        self.model = CognateModel(corpusweight=1.0)
+        self.model.load_data(_cognate_data())
+        self.model.train_batch()
+        self.words = [u'talossa', u'koirassa', u'talossa', u'kissa', u'']
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _serve(self, address='tcp:127.0.0.1:0', **kwargs):
+        server = SegmentationServer(self.model, side='src', cache_size=100,
+                                    **kwargs)
+        thread = _ServerThread(server, address)
+        self.addCleanup(thread.close)
+        return thread.address
+
+    def test_json(self):
+        address = self._serve(
+            'unix:' + os.path.join(self.tmpdir, 'segment.sock'))
+        for side in ('src', 'trg'):
+            expected = list(segment_words(self.model, self.words, side))
+            self.assertEqual(list(segment_remote(address, self.words, side,
+                                                 chunk_size=2)),
+                             expected)
+        hits, misses = self.model.get_segmentation_cache_stats()[:2]
+        self.assertEqual(misses, 8)
+
+    def test_lines(self):
+        address = self._serve()
+        expected = list(segment_words(self.model, self.words, 'src'))
+        sock = connect(address, timeout=10)
+        with sock, sock.makefile('rb') as responses:
+            # all requests are sent before reading the responses
+            sock.sendall(''.join(word + '\n' for word in self.words)
+                         .encode('utf-8'))
+            sock.sendall(b'{"words": 1}\n')
+            for morphs in expected:
+                self.assertEqual(responses.readline().decode('utf-8'),
+                                 ' '.join(morphs) + '\n')
+            self.assertIn('error', json.loads(responses.readline()))
+
+    def test_long_request(self):
+        address = self._serve()
+        words = [u'talossa', u'koirassa'] * 5000
+        self.assertGreater(len(json.dumps({'words': words})), 2 ** 16)
+        expected = list(segment_words(self.model, words, 'src'))
+        self.assertEqual(list(segment_remote(address, words,
+                                             chunk_size=len(words),
+                                             timeout=10)),
+                         expected)
+
+    def test_too_long_request(self):
+        address = self._serve(max_request_size=2 ** 16)
+        words = [u'talossa'] * 10000
+        sock = connect(address, timeout=10)
+        with sock, sock.makefile('rb') as responses:
+            sock.sendall((json.dumps({'words': words}) + '\n')
+                         .encode('utf-8'))
+            sock.sendall(b'kissa\n')
+            self.assertIn('error', json.loads(responses.readline()))
+            # the connection is still usable after the error
+            self.assertEqual(
+                responses.readline().decode('utf-8'),
+                ' '.join(next(segment_words(self.model, [u'kissa'],
+                                            'src'))) + '\n')
+
+    def test_bad_words(self):
+        address = self._serve()
+        sock = connect(address, timeout=10)
+        with sock, sock.makefile('rb') as responses:
+            for request in (b'{"words": "talo"}\n',
+                            b'{"words": ["talo", 1]}\n'):
+                sock.sendall(request)
+                self.assertIn('error', json.loads(responses.readline()))
+
+    def test_bad_words_concurrent(self):
+        # a bad request does not fail the other requests of its batch
+        address = self._serve()
+        expected = list(segment_words(self.model, self.words, 'src'))
+        sock = connect(address, timeout=10)
+        with sock, sock.makefile('rb') as responses:
+            sock.sendall(b'{"words": ["talo", null]}\n' +
+                         (json.dumps({'words': self.words}) + '\n')
+                         .encode('utf-8'))
+            self.assertIn('error', json.loads(responses.readline()))
+            self.assertEqual(
+                json.loads(responses.readline())['segmentations'],
+                expected)
+
+    def test_concurrent_clients(self):
+        address = self._serve()
+        words = [u'talo' * (i % 3 + 1) for i in range(50)]
+        expected = list(segment_words(self.model, words, 'trg'))
+        results = [None] * 4
+
+        def client(i):
+            results[i] = list(segment_remote(address, words, 'trg',
+                                             chunk_size=7, timeout=10))
+
+        threads = [threading.Thread(target=client, args=(i,))
+                   for i in range(len(results))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        self.assertEqual(results, [expected] * len(results))
+
+    def test_baseline_model(self):
+        self.model = BaselineModel()
+        self.model.load_data(_baseline_data())
+        self.model.train_batch()
+        server = SegmentationServer(self.model)
+        thread = _ServerThread(server, 'tcp:127.0.0.1:0')
+        self.addCleanup(thread.close)
+        self.assertEqual(list(segment_remote(thread.address, self.words)),
+                         list(segment_words(self.model, self.words)))
+
+    def test_bad_address(self):
+        self.assertRaises(MorfessorException, parse_address, u'localhost')
+        self.assertRaises(MorfessorException, parse_address, u'tcp:host:x')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,7 @@
 shared between different modules and variants of the software.
 """
 
+import array
 import logging
 import math
 import random
@@ -10,6 +11,8 @@ import types
 
 import collections
 
+from .exception import MorfessorException
+
 LOGPROB_ZERO = 1000000
 
 def zlog(x):
@@ -227,4 +230,151 @@ def _is_string(obj):
 def tail(n, iterable):
     "Return an iterator over the last n items"
     # tail(3, 'ABCDEFG') --> E F G
-    return iter(collections.deque(iterable, maxlen=n))
\ No newline at end of file
+    return iter(collections.deque(iterable, maxlen=n))
+
+
+def make_trie(words):
+    """Return a prefix trie of the words.
+
+    Each node is a dict from an atom to the child node. The key None is
+    present in the nodes that end a word.
+
+    """
+    root = {}
+    for word in words:
+        node = root
+        for atom in word:
+            node = node.setdefault(atom, {})
+        node[None] = True
+    return root
+
+
+def grow_array(values, size, fill):
+    """Return the integer array values extended with fill to size items.
+
+    An array of 64-bit integers is extended in place. A memoryview (e.g. a
+    section of a memory-mapped model file) cannot grow, so it is first
+    copied to such an array, as is an array of another type.
+
+    """
+    if not isinstance(values, array.array) or values.typecode != 'q':
+        values = array.array('q', values)
+    values.extend([fill] * (size - len(values)))
+    return values
+
+
+def picklable_array(values):
+    """Return values, copying a memoryview to an array for pickling."""
+    if isinstance(values, memoryview):
+        return array.array('q', values)
+    return values
+
+
+try:
+    _popcount = int.bit_count
+except AttributeError:
+    def _popcount(mask):
+        return bin(mask).count('1')
+
+
+def boundary_mask(constructions):
+    """Return the boundaries between the constructions as a bitmask, in
+    which bit i is set if there is a boundary after the first i atoms."""
+    mask = 0
+    index = 0
+    for construction in constructions[:-1]:
+        index += len(construction)
+        mask |= 1 << index
+    return mask
+
+
+def boundary_scores(predictions, references):
+    """Return the best boundary recall and precision of each word.
+
+    The predictions and references are lists of the alternative analyses
+    of each word as boundary masks. The recall of a word is the largest
+    fraction of the boundaries of a reference analysis that are found in
+    a predicted analysis, over all pairs of alternatives, and 1.0 if a
+    reference analysis has no boundaries. The precision is the same with
+    the roles swapped. A score is None if there is nothing to compare.
+
+    """
+    recalls = []
+    precisions = []
+    popcount = _popcount
+    for predicted, reference in zip(predictions, references):
+        if not predicted or not reference:
+            recalls.append(1.0 if 0 in reference else None)
+            precisions.append(1.0 if 0 in predicted else None)
+            continue
+        best_rec = best_pre = -1.0
+        for pre in predicted:
+            pre_total = popcount(pre)
+            for ref in reference:
+                # the boundaries found in both count for both scores
+                hits = popcount(ref & pre)
+                ref_total = popcount(ref)
+                rec = hits / float(ref_total) if ref_total else 1.0
+                if rec > best_rec:
+                    best_rec = rec
+                pre_score = hits / float(pre_total) if pre_total else 1.0
+                if pre_score > best_pre:
+                    best_pre = pre_score
+        recalls.append(best_rec)
+        precisions.append(best_pre)
+    return recalls, precisions
+
+
+class SegmentationCache(object):
+    """Bounded LRU cache of Viterbi segmentations.
+
+    The results are keyed by (compound, addcount, maxlen). The contents
+    are pickled with the model only if persist is true, so that a warm
+    cache can be shipped with a segment-only model.
+
+    """
+    def __init__(self, capacity, persist=False):
+        if capacity < 1:
+            raise MorfessorException("cache capacity must be positive")
+        self.capacity = capacity
+        self.persist = persist
+        self._entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached result for key, or None."""
+        result = self._entries.get(key)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return result
+
+    def put(self, key, result):
+        self._entries[key] = result
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        """Return (hits, misses, evictions, current size)."""
+        return self.hits, self.misses, self.evictions, len(self._entries)
+
+    def clear(self):
+        if self._entries:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getstate__(self):
+        entries = list(self._entries.items()) if self.persist else []
+        return {'capacity': self.capacity, 'persist': self.persist,
+                'entries': entries}
+
+    def __setstate__(self, state):
+        self.__init__(state['capacity'], state['persist'])
+        self._entries.update(state['entries'])
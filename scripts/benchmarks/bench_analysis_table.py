@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""Benchmark the dict and array storage backends of the analyses.
+
+Trains a cognate model on synthetic pairs with each analysis table, and
+reports the memory taken by the analyses (measured with tracemalloc
+while building the table from the trained analyses), the time per count
+update through _modify_construction_count, and the training time.
+
+  python scripts/benchmarks/bench_analysis_table.py --pairs 2000
+"""
+from __future__ import print_function
+
+import argparse
+import random
+import time
+import tracemalloc
+
+from morfessorcognate import utils
+from morfessorcognate.baseline import ANALYSIS_TABLES, ConstrNode
+from morfessorcognate.cognate import CognateModel
+
+import synthetic
+
+
+def table_size(name, items):
+    """Return the bytes allocated for building the table of items."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    table = ANALYSIS_TABLES[name](
+        (c, ConstrNode(*node)) for c, node in items)
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del table
+    return size
+
+
+def time_updates(model, compounds, repeat):
+    """Return the seconds per call of _modify_construction_count when
+    adding and removing one occurrence of each compound."""
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        for compound in compounds:
+            model._modify_construction_count(compound, 1)
+        for compound in compounds:
+            model._modify_construction_count(compound, -1)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / (2 * len(compounds))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--pairs', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    utils.show_progress_bar = False
+
+    data = synthetic.to_datapoints(synthetic.cognate_pairs(args.pairs))
+    results = {}
+    for name in sorted(ANALYSIS_TABLES):
+        random.seed(args.seed)
+        model = CognateModel(corpusweight=1.0, analysis_table=name)
+        model.load_data(data)
+        start = time.time()
+        model.train_batch()
+        train_time = time.time() - start
+
+        items = [(c, tuple(node)) for c, node in model._analyses.items()]
+        size = table_size(name, items)
+        per_update = time_updates(model, model.get_compounds(), args.repeat)
+        results[name] = sorted(items)
+        print('{:6} {} analyses  {:8.0f} kB ({:.0f} B each)  '
+              'update {:.2f} us  train {:.2f} s'.format(
+                  name, len(items), size / 1024.0, size / float(len(items)),
+                  per_update * 1e6, train_time))
+    if len(set(map(tuple, results.values()))) != 1:
+        print('WARNING: the trained analyses differ')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""Benchmark reading cognate training data with and without the cache.
+
+Writes synthetic count, src and trg rows to a file, and times
+read_cognate_data_file parsing the file, writing the cache, and reading
+the data from the cache.
+
+  python scripts/benchmarks/bench_cognate_data.py --pairs 500000
+"""
+from __future__ import print_function
+
+import argparse
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from morfessorcognate.io import MorfessorIO
+
+import synthetic
+
+
+def time_read(file_name, cache_dir, repeat=1):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        data = MorfessorIO(encoding='utf-8').read_cognate_data_file(
+            file_name, cache_dir=cache_dir)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--pairs', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        file_name = os.path.join(tmpdir, 'pairs.tsv')
+        with io.open(file_name, 'w', encoding='utf-8') as fobj:
+            for count, src, trg in synthetic.cognate_pairs(args.pairs):
+                fobj.write(u'%d\t%s\t%s\n' % (count, src, trg))
+        cache_dir = os.path.join(tmpdir, 'cache')
+
+        parse_time, expected = time_read(file_name, None, args.repeat)
+        print('parse        {:8.1f} ms'.format(parse_time * 1000))
+        write_time, data = time_read(file_name, cache_dir)
+        assert data == expected
+        print('parse+cache  {:8.1f} ms'.format(write_time * 1000))
+        read_time, data = time_read(file_name, cache_dir, args.repeat)
+        assert data == expected
+        print('from cache   {:8.1f} ms  ({:.1f}x)'.format(
+            read_time * 1000, parse_time / read_time))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
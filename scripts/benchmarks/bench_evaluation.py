@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""Benchmark boundary precision and recall scoring of evaluation samples.
+
+Builds a synthetic gold standard with alternative analyses and random
+predicted segmentations, and times MorfessorEvaluation._evaluate on
+boundary masks against the earlier scoring with sets of split indices
+and the product of the alternatives.
+
+  python scripts/benchmarks/bench_evaluation.py --words 100000
+"""
+from __future__ import print_function
+
+import argparse
+import random
+import time
+from itertools import product
+
+from morfessorcognate.evaluation import MorfessorEvaluation, boundary_mask
+
+import synthetic
+
+
+class SetEvaluation(MorfessorEvaluation):
+    """The scoring with sets before boundary masks."""
+
+    def _evaluate(self, prediction):
+        def calc_prop_distance(ref, pred):
+            if len(ref) == 0:
+                return 1.0
+            diff = len(set(ref) - set(pred))
+            return (len(ref) - diff) / float(len(ref))
+
+        wordlist = sorted(set(prediction.keys()) & set(self.reference.keys()))
+
+        recall_sum = 0.0
+        precis_sum = 0.0
+
+        for word in wordlist:
+            if len(word) < 2:
+                continue
+
+            recall_sum += max(calc_prop_distance(r, p)
+                              for p, r in product(prediction[word],
+                                                  self.reference[word]))
+
+            precis_sum += max(calc_prop_distance(p, r)
+                              for p, r in product(prediction[word],
+                                                  self.reference[word]))
+
+        precision = precis_sum / len(wordlist)
+        recall = recall_sum / len(wordlist)
+        f_score = 2.0 / (1.0 / precision + 1.0 / recall)
+
+        return precision, recall, f_score, len(wordlist)
+
+
+def random_segmentation(rng, word):
+    splits = sorted(rng.sample(range(1, len(word)),
+                               rng.randint(0, min(3, len(word) - 1))))
+    return [word[i:j] for i, j in zip([0] + splits, splits + [len(word)])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--words', type=int, default=50000)
+    parser.add_argument('--alternatives', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    words = sorted(set(src for _, src, _ in
+                       synthetic.cognate_pairs(args.words) if src))
+    annotations = {word: [random_segmentation(rng, word) for _ in
+                          range(rng.randint(1, args.alternatives))]
+                   for word in words}
+    segmentation = {word: random_segmentation(rng, word) for word in words}
+
+    results = []
+    for name, evaluation_class, encode in (
+            ('sets', SetEvaluation,
+             lambda s: tuple(MorfessorEvaluation._segmentation_indices(s))),
+            ('masks', MorfessorEvaluation, boundary_mask)):
+        evaluation = evaluation_class(annotations)
+        prediction = {word: [encode(segmentation[word])] for word in words}
+        start = time.time()
+        result = evaluation._evaluate(prediction)
+        elapsed = time.time() - start
+        results.append((elapsed, result))
+        print('{:6} {} words  {:8.1f} ms  precision {:.4f} recall {:.4f}'
+              .format(name, len(words), elapsed * 1000, *result[:2]))
+    assert results[0][1] == results[1][1]
+    print('speedup {:.1f}x'.format(results[0][0] / results[1][0]))
+
+
+if __name__ == '__main__':
+    main()
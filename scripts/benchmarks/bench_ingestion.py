@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""Benchmark counting the compounds of corpus files in parallel.
+
+Writes a synthetic corpus split into several plain and gzip files, and
+times counting its compounds with read_corpus_files and a Counter, and
+with count_corpus_files using one or more worker processes.
+
+  python scripts/benchmarks/bench_ingestion.py --megabytes 50 --jobs 4
+"""
+from __future__ import print_function
+
+import argparse
+import collections
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from morfessorcognate.io import MorfessorIO, open_binary_file
+
+import synthetic
+
+
+def write_corpus(file_names, megabytes, seed):
+    rng = random.Random(seed)
+    words = [src for _, src, _ in synthetic.cognate_pairs(2000) if src]
+    for file_name in file_names:
+        size = 0
+        with open_binary_file(file_name, 'wb') as fobj:
+            while size < megabytes * 1000000 / len(file_names):
+                line = (' '.join(rng.choice(words) for _ in range(12)) +
+                        '\n').encode('utf-8')
+                fobj.write(line)
+                size += len(line)
+
+
+def time_read(file_names):
+    start = time.time()
+    counts = collections.Counter()
+    for count, compound in MorfessorIO().read_corpus_files(
+            file_names, retain_newlines=False):
+        counts[compound] += count
+    return time.time() - start, counts
+
+
+def time_count(file_names, jobs):
+    start = time.time()
+    counts = MorfessorIO().count_corpus_files(file_names, jobs)
+    return time.time() - start, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--megabytes', type=float, default=20)
+    parser.add_argument('--files', type=int, default=4)
+    parser.add_argument('--jobs', type=int, default=os.cpu_count())
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for extension in ('.txt', '.gz'):
+            file_names = [os.path.join(tmpdir, 'corpus%d%s' % (i, extension))
+                          for i in range(args.files)]
+            write_corpus(file_names, args.megabytes, args.seed)
+            read_time, expected = time_read(file_names)
+            print('{:4} {} files  read_corpus_files {:6.2f} s'.format(
+                extension, args.files, read_time))
+            for jobs in sorted({1, args.jobs}):
+                count_time, counts = time_count(file_names, jobs)
+                assert counts == expected
+                print('{:4} {} files  count_corpus_files -j {:<2} {:6.2f} s  '
+                      '({:.1f}x)'.format(extension, args.files, jobs,
+                                         count_time, read_time / count_time))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""Benchmark the explicit-stack recursive splitting on long compounds.
+
+Trains a cognate model on synthetic pairs with many stems for one epoch,
+and times re-optimizing the longest third of them with the iterative
+_recursive_split and _modify_construction_count, and with the
+equivalent Python recursion.
+
+  python scripts/benchmarks/bench_iterative_split.py --pairs 300 \\
+      --max-stems 6
+"""
+from __future__ import print_function
+
+import argparse
+import pickle
+import random
+import time
+
+from morfessorcognate import utils
+from morfessorcognate.baseline import ConstrNode
+from morfessorcognate.cognate import CognateModel
+
+import synthetic
+
+
+class RecursiveModel(CognateModel):
+    """Reference implementation using Python recursion."""
+
+    def _recursive_split(self, construction):
+        split = self._split_once(construction)
+        if split is None:
+            return [construction]
+        prefix, suffix = split
+        lp = self._recursive_split(prefix)
+        if suffix != prefix:
+            return lp + self._recursive_split(suffix)
+        return lp + lp
+
+    def _modify_construction_count(self, construction, dcount):
+        if dcount == 0 or construction is None:
+            return
+        if construction in self._analyses:
+            rcount, count, splitloc = self._analyses[construction]
+        else:
+            rcount, count, splitloc = 0, 0, None
+        newcount = count + dcount
+        if newcount == 0:
+            if construction in self._analyses:
+                del self._analyses[construction]
+        else:
+            self._analyses[construction] = ConstrNode(rcount, newcount,
+                                                      splitloc)
+        if splitloc:
+            for child in self.cc.splitn(construction, splitloc):
+                self._modify_construction_count(child, dcount)
+        else:
+            self.cost.update(construction, newcount - count)
+
+
+def time_epoch(model, compounds):
+    start = time.time()
+    segments = [model._recursive_optimize(w) for w in compounds]
+    return time.time() - start, segments
+
+
+def best_time(model_class, state, compounds, repeats):
+    """Return the fastest time of re-optimizing the compounds of a
+    model restored from state, and the resulting segments."""
+    best = None
+    for _ in range(repeats):
+        model = model_class.__new__(model_class)
+        model.__dict__ = pickle.loads(state)
+        t, segments = time_epoch(model, compounds)
+        if best is None or t < best:
+            best = t
+    return best, segments
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--pairs', type=int, default=300)
+    parser.add_argument('--max-stems', type=int, default=6)
+    parser.add_argument('--corpusweight', type=float, default=0.01)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    utils.show_progress_bar = False
+
+    data = synthetic.to_datapoints(
+        synthetic.cognate_pairs(args.pairs, args.max_stems))
+    random.seed(args.seed)
+    model = CognateModel(corpusweight=args.corpusweight)
+    model.load_data(data)
+    model.train_batch(max_epochs=1)
+    state = pickle.dumps(model.__dict__)
+    compounds = sorted(model.get_compounds(),
+                       key=lambda c: len(c.src) + len(c.trg), reverse=True)
+    compounds = compounds[:len(compounds) // 3]
+    segments = sum(len(model.segment(w)) for w in compounds)
+
+    rec_t, rec_segments = best_time(RecursiveModel, state, compounds,
+                                    args.repeats)
+    it_t, it_segments = best_time(CognateModel, state, compounds,
+                                  args.repeats)
+    assert rec_segments == it_segments
+
+    print('{} longest compounds (mean length {:.1f}, {:.1f} segments)'.format(
+        len(compounds),
+        float(sum(len(c.src) + len(c.trg) for c in compounds)) /
+        len(compounds),
+        float(segments) / len(compounds)))
+    print('recursive: {:.3f} ms/compound'.format(
+        1000 * rec_t / len(compounds)))
+    print('iterative: {:.3f} ms/compound (speedup {:.2f})'.format(
+        1000 * it_t / len(compounds), rec_t / it_t))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""Micro-benchmark of the log-factorial and n*log(n) tables.
+
+Compares the table lookups against direct calculation, both for the
+functions themselves and for Encoding.update_count / get_cost.
+
+  python scripts/benchmarks/bench_log_tables.py
+"""
+from __future__ import print_function
+
+import argparse
+import random
+import timeit
+
+from morfessorcognate import corpus
+from morfessorcognate.corpus import LexiconEncoding, CorpusEncoding, \
+    LogTables
+
+
+def encoding_workload(counts):
+    lexicon = LexiconEncoding()
+    corpus_coding = CorpusEncoding(lexicon)
+    corpus_coding.boundaries = len(counts)
+    old = [0] * len(counts)
+    total = 0.0
+    for i, count in enumerate(counts):
+        corpus_coding.update_count(i, old[i], count)
+        old[i] = count
+        total += corpus_coding.get_cost() + lexicon.get_cost()
+    return total
+
+
+def time_with_tables(max_size, stmt, number, repeat):
+    corpus.log_tables = LogTables(max_size=max_size)
+    # warm up the tables
+    stmt()
+    return min(timeit.repeat(stmt, number=number, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--updates', type=int, default=100000)
+    parser.add_argument('--max-count', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    values = [rng.randint(0, args.max_count) for _ in range(args.updates)]
+    counts = [rng.randint(1, args.max_count) for _ in range(args.updates)]
+
+    def functions():
+        for n in values:
+            corpus.logfactorial(n)
+            corpus.nlogn(n)
+
+    def direct():
+        for n in values:
+            LogTables.calc_logfactorial(n)
+            LogTables.calc_nlogn(n)
+
+    def encodings():
+        encoding_workload(counts)
+
+    t_direct = min(timeit.repeat(direct, number=1, repeat=args.repeat))
+    t_table = time_with_tables(10 * args.max_count, functions, 1,
+                               args.repeat)
+    print('logfactorial+nlogn x {}: direct {:.3f}s table {:.3f}s'.format(
+        len(values), t_direct, t_table))
+
+    t_direct = time_with_tables(0, encodings, 1, args.repeat)
+    t_table = time_with_tables(10 * args.max_count, encodings, 1,
+                               args.repeat)
+    print('update_count+get_cost x {}: direct {:.3f}s table {:.3f}s'.format(
+        len(counts), t_direct, t_table))
+
+    corpus.log_tables = LogTables(max_size=0)
+    reference = encoding_workload(counts)
+    corpus.log_tables = LogTables()
+    print('relative difference of summed costs: {:.2e}'.format(
+        abs(encoding_workload(counts) - reference) / abs(reference)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""Benchmark loading pickled, compact and segment-only binary models.
+
+Trains a cognate model on synthetic pairs, saves it as a pickle, in the
+compact format and compiled into a segment-only model, and loads each
+file in fresh processes. Reports the file sizes, the median load times
+and the growth of the resident memory of the loading process.
+
+  python scripts/benchmarks/bench_model_format.py --pairs 2000 \\
+      --segment-only
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from morfessorcognate import utils
+from morfessorcognate.cognate import CognateModel
+from morfessorcognate.io import MorfessorIO
+
+import synthetic
+
+
+def resident_kb():
+    """Return the current resident memory of the process in kB, or the
+    maximum if the current one is not available."""
+    try:
+        with open('/proc/self/statm') as fobj:
+            pages = int(fobj.read().split()[1])
+        return pages * resource.getpagesize() // 1024
+    except (IOError, OSError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def load(file_name):
+    """Load a model and print the load time and the growth of the
+    resident memory (in kB)."""
+    before = resident_kb()
+    start = time.time()
+    model = MorfessorIO().read_binary_model_file(file_name)
+    elapsed = time.time() - start
+    print(elapsed, resident_kb() - before)
+    del model
+
+
+def measure(file_name, repeats):
+    times = []
+    memory = []
+    for _ in range(repeats):
+        output = subprocess.check_output(
+            [sys.executable, __file__, '--load', file_name])
+        elapsed, rss = output.split()
+        times.append(float(elapsed))
+        memory.append(int(rss))
+    return sorted(times)[len(times) // 2], max(memory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--pairs', type=int, default=2000)
+    parser.add_argument('--segment-only', action='store_true')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--load', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.load:
+        load(args.load)
+        return
+    utils.show_progress_bar = False
+
+    random.seed(args.seed)
+    model = CognateModel(corpusweight=1.0)
+    model.load_data(synthetic.to_datapoints(
+        synthetic.cognate_pairs(args.pairs)))
+    model.train_batch()
+    if args.segment_only:
+        model.make_segment_only()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        mio = MorfessorIO()
+        files = [('pickle', os.path.join(tmpdir, 'model.pickle')),
+                 ('compact', os.path.join(tmpdir, 'model.compact')),
+                 ('segment-only', os.path.join(tmpdir, 'model.segment'))]
+        mio.write_binary_model_file(files[0][1], model)
+        mio.write_compact_model_file(files[1][1], model)
+        mio.write_segment_only_model_file(files[2][1], model)
+
+        print('{} analyses, {} edit types'.format(
+            len(model._analyses), len(model.cost.edit_cost.counts)))
+        for name, file_name in files:
+            elapsed, rss = measure(file_name, args.repeats)
+            print('{:12} {:8.0f} kB  load {:.3f} s  rss +{} kB'.format(
+                name, os.path.getsize(file_name) / 1024.0, elapsed, rss))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
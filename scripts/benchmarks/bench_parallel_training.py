@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+"""Benchmark multi-process sharded batch training.
+
+Trains a cognate model serially (one core) and with 2, 4, ..., N worker
+processes, and reports the training time, speedup and the gap of the
+final cost to serial training.
+
+  python scripts/benchmarks/bench_parallel_training.py --pairs 2000 \\
+      --max-jobs 8 --sync-interval 200
+"""
+from __future__ import print_function
+
+import argparse
+import multiprocessing
+import random
+import time
+
+from morfessorcognate import utils
+from morfessorcognate.cognate import CognateModel
+from morfessorcognate.parallel import SYNC_MODES
+
+import synthetic
+
+
+def train(data, seed, **kwargs):
+    random.seed(seed)
+    model = CognateModel(corpusweight=1.0)
+    model.load_data(data)
+    start = time.time()
+    epochs, cost = model.train_batch(**kwargs)
+    return time.time() - start, epochs, cost
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--pairs', type=int, default=1000)
+    parser.add_argument('--max-stems', type=int, default=3)
+    parser.add_argument('--max-jobs', type=int,
+                        default=multiprocessing.cpu_count())
+    parser.add_argument('--sync-mode', choices=SYNC_MODES, default='sync')
+    parser.add_argument('--sync-interval', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    utils.show_progress_bar = False
+
+    data = synthetic.to_datapoints(
+        synthetic.cognate_pairs(args.pairs, args.max_stems))
+    base_t, epochs, base_cost = train(data, args.seed)
+    print('1 job (serial): {:.2f}s, {} epochs, final cost {:.2f}'.format(
+        base_t, epochs, base_cost))
+
+    jobs = 2
+    while jobs <= args.max_jobs:
+        t, epochs, cost = train(data, args.seed, jobs=jobs,
+                                sync_mode=args.sync_mode,
+                                sync_interval=args.sync_interval)
+        print('{} jobs: {:.2f}s (speedup {:.2f}), {} epochs, final cost '
+              '{:.2f} (gap {:+.3%})'.format(
+                  jobs, t, base_t / t, epochs, cost,
+                  (cost - base_cost) / base_cost))
+        jobs *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""Benchmark alignment-guided pruning of the cognate split grid.
+
+Reports the number of split candidates of the full grid and of the
+pruned grid, and the training time and final cost with and without
+pruning.
+
+  python scripts/benchmarks/bench_split_pruning.py --pairs 300 --band 1
+"""
+from __future__ import print_function
+
+import argparse
+import random
+import time
+
+from morfessorcognate import CognateConstructionMethods, WILDCARD, utils
+from morfessorcognate.cognate import CognateModel, alignment_split_locations
+
+import synthetic
+
+
+def count_candidates(data, band):
+    full = 0
+    pruned = 0
+    for dp in data:
+        src, trg = dp.compound
+        if src == WILDCARD or trg == WILDCARD:
+            continue
+        full += len(list(CognateConstructionMethods.split_locations(
+            dp.compound)))
+        pruned += len(alignment_split_locations(src, trg, band))
+    return full, pruned
+
+
+def train(data, band, seed):
+    random.seed(seed)
+    model = CognateModel(corpusweight=1.0, align_band=band)
+    model.load_data(data)
+    start = time.time()
+    epochs, cost = model.train_batch()
+    return time.time() - start, epochs, cost
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--pairs', type=int, default=300)
+    parser.add_argument('--max-stems', type=int, default=4)
+    parser.add_argument('--band', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    utils.show_progress_bar = False
+
+    data = synthetic.to_datapoints(
+        synthetic.cognate_pairs(args.pairs, args.max_stems))
+    full, pruned = count_candidates(data, args.band)
+    print('top-level split candidates: full {} pruned {} ({:.1%})'.format(
+        full, pruned, float(pruned) / full))
+    longest = max((dp.compound for dp in data
+                   if WILDCARD not in dp.compound),
+                  key=lambda c: len(c.src) * len(c.trg))
+    print('longest pair {}/{}: full {} pruned {}'.format(
+        len(longest.src), len(longest.trg),
+        len(list(CognateConstructionMethods.split_locations(longest))),
+        len(alignment_split_locations(longest.src, longest.trg,
+                                      args.band))))
+
+    for band in (None, args.band):
+        t, epochs, cost = train(data, band, args.seed)
+        print('band {}: {:.2f}s, {} epochs, final cost {:.2f}'.format(
+            band, t, epochs, cost))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""Benchmark the throughput of reading corpus files.
+
+Writes a synthetic corpus as plain text and compressed with gzip, bz2
+and xz, and times MorfessorIO.read_corpus_file on each with the
+buffered text reader, and with the earlier reader that used codecs
+stream readers after decoding the whole file to detect its encoding.
+
+  python scripts/benchmarks/bench_text_io.py --megabytes 50
+"""
+from __future__ import print_function
+
+import argparse
+import bz2
+import codecs
+import gzip
+import locale
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from morfessorcognate.io import MorfessorIO, open_binary_file
+
+import synthetic
+
+
+class CodecsIO(MorfessorIO):
+    """The reader stack before the buffered text wrappers."""
+
+    def _open_file(self, file_name):
+        if file_name.endswith('.gz'):
+            return gzip.open(file_name, 'rb')
+        elif file_name.endswith('.bz2'):
+            return bz2.BZ2File(file_name, 'rb')
+        return open(file_name, 'rb')
+
+    def _open_text_file_read(self, file_name):
+        if self.encoding is None:
+            self.encoding = self._find_encoding(file_name)
+        return codecs.getreader(self.encoding)(self._open_file(file_name))
+
+    def _read_text_file(self, file_name, raw=False):
+        for line in self._open_text_file_read(file_name):
+            line = line.rstrip()
+            if not raw and \
+               (len(line) == 0 or line.startswith(self.comment_start)):
+                continue
+            yield line.lower() if self.lowercase else line
+
+    def _find_encoding(self, *files):
+        for encoding in ['utf-8', locale.getpreferredencoding()]:
+            try:
+                for f in files:
+                    for _ in codecs.getreader(encoding)(self._open_file(f)):
+                        pass
+            except UnicodeDecodeError:
+                continue
+            return encoding
+        raise UnicodeError("Can not determine encoding of input files")
+
+
+def write_corpus(file_name, megabytes, seed):
+    rng = random.Random(seed)
+    words = [src for _, src, _ in synthetic.cognate_pairs(2000) if src]
+    size = 0
+    with open_binary_file(file_name, 'wb') as fobj:
+        while size < megabytes * 1000000:
+            line = (' '.join(rng.choice(words) for _ in range(12)) +
+                    '\n').encode('utf-8')
+            fobj.write(line)
+            size += len(line)
+
+
+def time_read(io_class, file_name):
+    start = time.time()
+    compounds = sum(1 for _ in io_class().read_corpus_file(
+        file_name, retain_newlines=False))
+    return time.time() - start, compounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--megabytes', type=float, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for extension in ('', '.gz', '.bz2', '.xz'):
+            file_name = os.path.join(tmpdir, 'corpus.txt' + extension)
+            write_corpus(file_name, args.megabytes, args.seed)
+            new_time, compounds = time_read(MorfessorIO, file_name)
+            line = '{:12} {:8} compounds  new {:6.2f} s'.format(
+                'corpus.txt' + extension, compounds, new_time)
+            if extension != '.xz':
+                old_time, old_compounds = time_read(CodecsIO, file_name)
+                assert old_compounds == compounds
+                line += '  old {:6.2f} s  ({:.1f}x)'.format(
+                    old_time, old_time / new_time)
+            print(line)
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
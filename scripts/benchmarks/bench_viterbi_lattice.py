@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+"""Benchmark the materialized split lattice of the Viterbi segmentation.
+
+Trains a cognate model on synthetic pairs, then segments long cognate
+pairs with the generic BaselineModel._viterbi_segment, once using the
+materialized lattice and once with the previous implementation that
+regenerates the split locations for each position.
+
+  python scripts/benchmarks/bench_viterbi_lattice.py --pairs 300 \\
+      --max-stems 6
+"""
+from __future__ import print_function
+
+import argparse
+import itertools
+import math
+import random
+import time
+
+from morfessorcognate import WILDCARD, utils
+from morfessorcognate.baseline import BaselineModel
+from morfessorcognate.cognate import CognateModel
+from morfessorcognate.utils import tail
+
+import synthetic
+
+
+def reference_viterbi_segment(self, compound, addcount=1.0, maxlen=30,
+                              allow_longer_unk_splits=False):
+    """The Viterbi search before the split lattice was materialized."""
+    grid = {None: (0.0, None)}
+    tokens = self.cost.all_tokens() + addcount
+    logtokens = math.log(tokens) if tokens > 0 else 0
+    newboundcost = self.cost.newbound_cost(addcount) if addcount > 0 else 0
+    badlikelihood = self.cost.bad_likelihood(compound, addcount)
+
+    for t in itertools.chain(self.cc.split_locations(compound), [None]):
+        bestpath = None
+        bestcost = None
+        for pt in tail(maxlen, itertools.chain(
+                [None], self.cc.split_locations(compound, stop=t))):
+            if grid[pt][0] is None:
+                continue
+            cost = grid[pt][0]
+            construction = self.cc.slice(compound, pt, t)
+            count = self.get_construction_count(construction)
+            if count > 0:
+                cost += (logtokens - math.log(count + addcount))
+            elif addcount > 0:
+                if self.cost.tokens() == 0:
+                    cost += (addcount * math.log(addcount) +
+                             newboundcost +
+                             self.cost.get_coding_cost(construction))
+                else:
+                    cost += (logtokens - math.log(addcount) +
+                             newboundcost +
+                             self.cost.get_coding_cost(construction))
+            elif self.cc.is_atom(construction):
+                cost += badlikelihood
+            elif allow_longer_unk_splits:
+                cost += len(self.cc.corpus_key(construction)) * badlikelihood
+            else:
+                continue
+            if bestcost is None or cost < bestcost:
+                bestcost = cost
+                bestpath = pt
+        grid[t] = (bestcost, bestpath)
+
+    splitlocs = []
+    cost, path = grid[None]
+    while path is not None:
+        splitlocs.append(path)
+        path = grid[path][1]
+    constructions = list(self.cc.splitn(compound, list(reversed(splitlocs))))
+    cost += (math.log(self.cost.tokens() + self.cost.compound_tokens()) -
+             math.log(self.cost.compound_tokens()))
+    return constructions, cost
+
+
+def segment_all(segment, model, compounds, **kwargs):
+    start = time.time()
+    result = [segment(model, c, **kwargs) for c in compounds]
+    return time.time() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--pairs', type=int, default=300)
+    parser.add_argument('--words', type=int, default=100)
+    parser.add_argument('--max-stems', type=int, default=6)
+    parser.add_argument('--maxlen', type=int, default=30)
+    parser.add_argument('--addcount', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    utils.show_progress_bar = False
+
+    random.seed(args.seed)
+    model = CognateModel(corpusweight=1.0)
+    model.load_data(synthetic.to_datapoints(
+        synthetic.cognate_pairs(args.pairs)))
+    model.train_batch()
+
+    compounds = [dp.compound for dp in synthetic.to_datapoints(
+        synthetic.cognate_pairs(args.words * 3, args.max_stems,
+                                seed=args.seed + 2))
+                 if WILDCARD not in dp.compound]
+    compounds = sorted(compounds, key=lambda c: len(c.src) * len(c.trg),
+                       reverse=True)[:args.words]
+    kwargs = dict(addcount=args.addcount, maxlen=args.maxlen)
+
+    ref_t, ref = segment_all(reference_viterbi_segment, model, compounds,
+                             **kwargs)
+    new_t, new = segment_all(BaselineModel._viterbi_segment, model,
+                             compounds, **kwargs)
+    assert ref == new
+
+    print('{} longest pairs (mean {:.1f} x {:.1f} atoms)'.format(
+        len(compounds),
+        float(sum(len(c.src) for c in compounds)) / len(compounds),
+        float(sum(len(c.trg) for c in compounds)) / len(compounds)))
+    print('regenerated: {:.2f} ms/pair'.format(
+        1000 * ref_t / len(compounds)))
+    print('lattice:     {:.2f} ms/pair (speedup {:.1f})'.format(
+        1000 * new_t / len(compounds), ref_t / new_t))
+
+
+if __name__ == '__main__':
+    main()
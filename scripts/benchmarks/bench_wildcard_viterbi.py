@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""Benchmark Viterbi segmentation of single-side (wildcard) words.
+
+Trains a cognate model on synthetic pairs, then segments the words of
+one side with the dedicated one-dimensional search and with the
+generic two-dimensional search, and reports the throughputs.
+
+  python scripts/benchmarks/bench_wildcard_viterbi.py --pairs 300 \\
+      --words 2000
+"""
+from __future__ import print_function
+
+import argparse
+import random
+import time
+
+from morfessorcognate import WILDCARD, utils
+from morfessorcognate.baseline import BaselineModel
+from morfessorcognate.cognate import CognateModel
+
+import synthetic
+
+
+def segment_all(segment, model, compounds):
+    start = time.time()
+    result = [segment(model, c, addcount=0) for c in compounds]
+    return time.time() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--pairs', type=int, default=300)
+    parser.add_argument('--words', type=int, default=2000)
+    parser.add_argument('--max-stems', type=int, default=4)
+    parser.add_argument('--side', choices=('src', 'trg'), default='src')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    utils.show_progress_bar = False
+
+    random.seed(args.seed)
+    model = CognateModel(corpusweight=1.0)
+    model.load_data(synthetic.to_datapoints(
+        synthetic.cognate_pairs(args.pairs)))
+    model.train_batch()
+
+    compounds = []
+    for _, src, trg in synthetic.cognate_pairs(
+            args.words, args.max_stems, seed=args.seed + 2):
+        word = src if args.side == 'src' else trg
+        if not word:
+            continue
+        word += synthetic.FIVEDOT
+        compounds.append(model.cc.type(word, WILDCARD) if args.side == 'src'
+                         else model.cc.type(WILDCARD, word))
+
+    generic_t, generic = segment_all(BaselineModel._viterbi_segment, model,
+                                     compounds)
+    fast_t, fast = segment_all(CognateModel._viterbi_segment, model,
+                               compounds)
+    assert generic == fast
+
+    print('{} {} words'.format(len(compounds), args.side))
+    print('generic: {:.0f} words/s'.format(len(compounds) / generic_t))
+    print('1D:      {:.0f} words/s (speedup {:.1f})'.format(
+        len(compounds) / fast_t, generic_t / fast_t))
+
+
+if __name__ == '__main__':
+    main()
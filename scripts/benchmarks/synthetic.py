@@ -0,0 +1,74 @@
+"""Deterministic synthetic cognate data for the benchmark scripts.
+
+The pairs are built by concatenating Finnish-like stems and suffixes on
+the source side and applying a few regular sound changes on the target
+side. Some pairs have only one side, as in real cognate lists.
+"""
+from __future__ import unicode_literals
+
+import math
+import random
+
+from morfessorcognate import CognateConstructionMethods, WILDCARD
+from morfessorcognate.constructions.cognate import FIVEDOT
+from morfessorcognate.data import DataPoint
+
+STEMS = ['talo', 'koira', 'kissa', 'auto', 'metsä', 'järvi', 'kirja',
+         'poika', 'tyttö', 'sana', 'kaupunki', 'ikkuna', 'pöytä', 'tuoli',
+         'vesi', 'kivi', 'puu', 'maa', 'lintu', 'kala']
+SUFFIXES = ['', 'ssa', 'sta', 'lla', 'lle', 'ja', 't', 'n', 'ksi', 'na',
+            'kin', 'ni', 'si', 'mme']
+
+
+def _sound_change(rng, word):
+    word = word.replace('ä', 'a').replace('ö', 'o')
+    if rng.random() < 0.5:
+        word = word.replace('k', 'g', 1)
+    if rng.random() < 0.3:
+        word += 'a'
+    if rng.random() < 0.2:
+        word = word.replace('t', 'd')
+    return word
+
+
+def cognate_pairs(num_pairs, max_stems=3, seed=1):
+    """Return a list of unique (count, src, trg) triples.
+
+    Missing sides are empty strings."""
+    rng = random.Random(seed)
+    seen = set()
+    pairs = []
+    while len(pairs) < num_pairs:
+        src = ''.join(rng.choice(STEMS)
+                      for _ in range(rng.randint(1, max_stems)))
+        src += rng.choice(SUFFIXES)
+        r = rng.random()
+        if r < 0.6:
+            trg = _sound_change(rng, src)
+        elif r < 0.8:
+            trg = ''
+        else:
+            src, trg = '', _sound_change(rng, src)
+        if (src, trg) in seen:
+            continue
+        seen.add((src, trg))
+        pairs.append((rng.randint(1, 50), src, trg))
+    return pairs
+
+
+def to_datapoints(pairs):
+    """Convert triples to DataPoints, as morfessorcognate-train does."""
+    data = []
+    for count, src, trg in pairs:
+        src = src + FIVEDOT if src else WILDCARD
+        trg = trg + FIVEDOT if trg else WILDCARD
+        compound = CognateConstructionMethods.type(src, trg)
+        count = int(round(math.log(count + 1, 2)))
+        data.append(DataPoint(count=count, compound=compound, splitlocs=()))
+    return data
+
+
+def write_tsv(pairs, file_name):
+    with open(file_name, 'w') as fobj:
+        for count, src, trg in pairs:
+            fobj.write('{}\t{}\t{}\n'.format(count, src, trg))
@@ -39,6 +39,7 @@ setup(name='Morfessor-cognate',
                #'scripts/tune_tokensync_pseudocounts.py',
                'scripts/morfessorcognate-train',
                'scripts/morfessorcognate-segment',
+               'scripts/morfessorcognate-serve',
                ],
       install_requires=requires,
       extras_require={